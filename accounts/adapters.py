@@ -1,5 +1,10 @@
+from . import capabilities, identity
 from .flyweight import ServiceFlyweight
 from datetime import datetime
+from decimal import Decimal
+
+# Comisión del cobro con tarjeta (también la descuenta la nómina, ver accounts.payroll)
+CARD_FEE_RATE = Decimal('0.02')
 
 # Adaptador para el procesamiento de pagos
 class PaymentAdapter:
@@ -40,7 +45,7 @@ class ServicePaymentAdapter:
             'method': 'card',
             'service': service_data['name'],
             'amount': service_data['price'],
-            'fee': service_data['price'] * 0.02  # 2% de comisión
+            'fee': service_data['price'] * float(CARD_FEE_RATE)  # 2% de comisión
         }
 # Adaptador para la validación de tarjetas
 class CardValidationAdapter:
@@ -68,10 +73,12 @@ class PaymentProcessingAdapter:
         if payment_data.get('save_card'):
             self._save_card(payment_data)
         
-        return PaymentFactory.create_payment(
-            payment_data,
-            payment_data['reservation'].id_service.price
-        )
+        # El servicio pasa por el mapa de identidad: la reserva se validó sin él
+        reservation = payment_data['reservation']
+        service = identity.related(reservation, 'id_service')
+        # Precio propio del barbero si lo tiene (ver accounts.capabilities)
+        terms = capabilities.terms(reservation.id_barber_id, service.id) if reservation.id_barber_id else None
+        return PaymentFactory.create_payment(payment_data, terms.price if terms else service.price)
     
     def _save_card(self, data):
         """Lógica para guardar tarjeta"""
@@ -1,13 +1,44 @@
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, BarberSchedule, Service, Reservation, Payment, UserCard
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from .audit import AuditedAdminMixin
+from .importer import ShopImporter
+from .models import Shop, CustomUser, BarberSchedule, Service, BarberService, Reservation, Payment, UserCard, PayrollRun, PayrollLine, RecurringReservation, AuditEntry
+
+
+class ImportShopForm(forms.Form):
+    services = forms.FileField(required=False, label='CSV de servicios')
+    users = forms.FileField(required=False, label='CSV de usuarios')
+    schedules = forms.FileField(required=False, label='CSV de horarios')
+    dry_run = forms.BooleanField(required=False, label='Solo validar')
+
+@admin.register(Shop)
+class ShopAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'slug', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    ordering = ('name',)
+
+# Servicios que hace el barbero, editables desde su ficha
+class BarberServiceInline(admin.TabularInline):
+    model = BarberService
+    fk_name = 'barber'
+    fields = ('service', 'duration', 'price', 'is_active')
+    autocomplete_fields = ('service',)
+    extra = 0
 
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(AuditedAdminMixin, UserAdmin):
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Información personal', {'fields': ('first_name', 'last_name', 'phone_number')}),
-        ('Rol y permisos', {'fields': ('role', 'is_staff', 'is_superuser', 'is_active')}),
+        ('Rol y permisos', {'fields': ('shop', 'role', 'is_staff', 'is_superuser', 'is_active')}),
         ('Otros datos', {'fields': ('reward_points', 'salary')}),
     )
 
@@ -15,6 +46,10 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('role', 'is_staff', 'is_active')
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)  # Cambiamos username por email
+
+    def get_inlines(self, request, obj):
+        # Solo los barberos tienen servicios
+        return [BarberServiceInline] if obj is not None and obj.role == 1 else []
     
 @admin.register(BarberSchedule)
 class BarberScheduleAdmin(admin.ModelAdmin):
@@ -30,7 +65,7 @@ class BarberScheduleAdmin(admin.ModelAdmin):
     get_barber_id.short_description = 'Barber ID'  # Nombre en la columna del admin
     
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
+class ReservationAdmin(AuditedAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'get_client_email', 'person_name', 'get_barber_name', 'id_service', 'date', 'status', 'pay')  # Mostrar nombre del barbero y el correo del cliente
     list_filter = ('status', 'pay', 'id_barber', 'id_client')  # Filtros
     search_fields = ('id_client__email', 'id_barber__email', 'id_service__name')  # Permite buscar por email o nombre de servicio
@@ -50,6 +85,15 @@ class ReservationAdmin(admin.ModelAdmin):
 
 
 
+@admin.register(BarberService)
+class BarberServiceAdmin(admin.ModelAdmin):
+    list_display = ('barber', 'service', 'duration', 'price', 'is_active', 'updated_at')
+    list_filter = ('is_active', 'service')
+    search_fields = ('barber__email', 'service__name')
+    list_select_related = ('barber', 'service')
+    autocomplete_fields = ('service',)
+    ordering = ('barber', 'service')
+
 # Registrar Servicios en el Admin
 # Registrar Servicios en el Admin
 @admin.register(Service)
@@ -58,12 +102,96 @@ class ServiceAdmin(admin.ModelAdmin):
     list_filter = ('active_service', 'category')  # Filtro para ver solo servicios activos
     search_fields = ('category', 'name', 'description')  # Permite buscar por nombre y descripción del servicio
     ordering = ('id',)
+    change_list_template = 'admin/accounts/service/change_list.html'  # Añade el botón "Importar CSV"
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='accounts_import_shop'),
+        ]
+        return urls + super().get_urls()
+
+    # Importación masiva (misma lógica que manage.py import_shop)
+    def import_view(self, request):
+        if not request.user.has_perm('accounts.add_service'):
+            raise PermissionDenied
+        form = ImportShopForm(request.POST or None, request.FILES or None)
+        importer = None
+        if request.method == 'POST' and form.is_valid():
+            with ShopImporter(dry_run=form.cleaned_data['dry_run'], shop_id=request.user.shop_id) as importer:
+                for kind, method in (('services', 'import_services'), ('users', 'import_users'),
+                                     ('schedules', 'import_schedules')):
+                    upload = form.cleaned_data[kind]
+                    if upload:
+                        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+                        getattr(importer, method)(stream, source=upload.name)
+            created = importer.created
+            level = messages.WARNING if importer.errors else messages.SUCCESS
+            self.message_user(request, (
+                f"Importados {created['services']} servicios, {created['users']} usuarios y "
+                f"{created['schedules']} horarios; {len(importer.errors)} filas con error."
+            ), level)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar CSV',
+            'form': form,
+            'errors': importer.errors if importer else [],
+        }
+        return TemplateResponse(request, 'admin/accounts/import_shop.html', context)
     
     
+@admin.register(RecurringReservation)
+class RecurringReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'id_client', 'id_barber', 'id_service', 'start_date', 'start_time', 'interval_weeks', 'until', 'is_active', 'materialized_until', 'skipped')
+    list_filter = ('is_active', 'interval_weeks')
+    search_fields = ('id_client__email', 'id_barber__email', 'person_name')
+    readonly_fields = ('materialized_until', 'skipped', 'created_at')
+    ordering = ('-created_at',)
+
 # Registrar Pagos en el Admin
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(AuditedAdminMixin, admin.ModelAdmin):
     list_display = ('reservation', 'amount', 'method', 'created_at', 'updated_at')  # Campos visibles
     list_filter = ('method', 'created_at')  # Filtros
     search_fields = ('reservation__id', 'amount', 'method')  # Permite buscar por reserva y método de pago
     ordering = ('created_at',)
+
+
+# Nómina: solo lectura, se calcula con manage.py payroll_run
+class PayrollLineInline(admin.TabularInline):
+    model = PayrollLine
+    fields = ('barber_email', 'base_salary', 'reservations', 'gross_sales', 'card_fees', 'commission', 'total')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = ('period', 'shop', 'status', 'commission_rate', 'total', 'computed_at', 'closed_at')
+    list_filter = ('status', 'shop')
+    ordering = ('-period',)
+    readonly_fields = ('shop', 'period', 'status', 'commission_rate', 'card_fee_rate', 'total', 'computed_at', 'closed_at')
+    inlines = [PayrollLineInline]
+
+    def has_add_permission(self, request):
+        return False
+
+
+# Historial de cambios: solo lectura, lo escribe accounts.audit
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'entity_type', 'entity_id', 'action', 'actor', 'source')
+    list_filter = ('entity_type', 'action', 'source')
+    search_fields = ('=entity_id', '=actor__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('shop', 'entity_type', 'entity_id', 'action', 'actor', 'source', 'changes', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
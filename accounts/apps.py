@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # noqa: F401  Registra los receptores de señales
+        from . import checks  # noqa: F401  Registra los checks de despliegue
+
+        post_migrate.connect(_setup_search_backend, sender=self)
+
+
+def _setup_search_backend(sender, using=None, **kwargs):
+    # Índice de trigramas (PostgreSQL) o tabla FTS5 (SQLite) para /search/
+    from .search import ensure_backend
+    ensure_backend(using)
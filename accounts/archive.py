@@ -0,0 +1,83 @@
+"""
+Archivo frío de reservas y pagos.
+
+Las reservas ``completed``/``canceled`` más viejas que el horizonte se mueven
+por lotes a ``reservation_archive`` / ``payment_archive``. Las lecturas solo
+consultan el archivo cuando el rango de fechas pedido llega a datos
+archivados (la marca de agua es la fecha más reciente archivada de la
+barbería). La marca se lee de la BD en cada consulta, no de la caché: sin
+Redis cada worker tendría la suya y seguiría sin ver lo recién archivado.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import search
+from .models import Reservation, Payment, ArchivedReservation, ArchivedPayment
+
+ARCHIVABLE_STATUSES = ('completed', 'canceled')
+
+
+def default_horizon():
+    days = getattr(settings, 'RESERVATION_ARCHIVE_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(horizon):
+    return Reservation.objects.filter(status__in=ARCHIVABLE_STATUSES, date__lt=horizon)
+
+
+def archive_batch(horizon, batch_size):
+    """
+    Mueve un lote al archivo en una sola transacción. Devuelve
+    ``(reservas, pagos)`` movidos; 0 reservas significa que no queda nada.
+    """
+    with transaction.atomic():
+        ids = list(
+            archivable(horizon)
+            .order_by('id')
+            .select_for_update()
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+
+        reservations = Reservation.objects.filter(id__in=ids).values(
+            'id', 'shop_id', 'id_client_id', 'id_barber_id', 'id_service_id',
+            'date', 'status', 'pay', 'person_name',
+        )
+        payments = Payment.objects.filter(reservation_id__in=ids).values(
+            'id', 'reservation_id', 'amount', 'method', 'created_at', 'updated_at',
+        )
+        # ignore_conflicts: si un lote anterior se cortó a medias se puede repetir
+        ArchivedReservation.objects.bulk_create(
+            [ArchivedReservation(**row) for row in reservations], ignore_conflicts=True,
+        )
+        archived_payments = [ArchivedPayment(**row) for row in payments]
+        ArchivedPayment.objects.bulk_create(archived_payments, ignore_conflicts=True)
+
+        # Borrado directo: archivar no es cancelar, no deben dispararse las
+        # señales de reservas (feeds, eventos en tiempo real). La búsqueda sí
+        # debe olvidarlas: una reserva archivada ya no se puede abrir
+        Payment.objects.filter(reservation_id__in=ids)._raw_delete(Payment.objects.db)
+        Reservation.objects.filter(id__in=ids)._raw_delete(Reservation.objects.db)
+        search.remove_many('reservation', ids)
+
+    return len(ids), len(archived_payments)
+
+
+def watermark(shop_id=None):
+    """Fecha de la reserva archivada más reciente (None si no hay); por barbería, un MAX sobre res_archive_date_idx."""
+    archived = ArchivedReservation.objects.all()
+    if shop_id is not None:
+        archived = archived.filter(shop_id=shop_id)
+    return archived.aggregate(latest=Max('date'))['latest']
+
+
+def needs_archive(date_from, shop_id=None):
+    """True si un rango que empieza en ``date_from`` incluye datos archivados de la barbería."""
+    latest = watermark(shop_id)
+    return latest is not None and (date_from is None or date_from <= latest)
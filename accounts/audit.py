@@ -0,0 +1,243 @@
+"""
+Historial de cambios (``AuditEntry``) de reservas, pagos y usuarios.
+
+Los cambios se capturan donde se conoce al autor: ``AuditedViewMixin`` en los
+viewsets y ``AuditedAdminMixin`` en el admin. El diff se calcula con el estado
+que ya está en memoria (``snapshot`` antes y después de guardar), sin volver a
+leer la fila, y solo guarda los campos que cambiaron; la contraseña se
+enmascara.
+
+Nada se inserta durante la petición: la entrada pasa a un buffer del proceso
+cuando la transacción confirma (si se revierte, se descarta) y un hilo la
+escribe con ``bulk_create`` al llegar a ``AUDIT_BATCH_SIZE`` entradas o cada
+``AUDIT_FLUSH_SECONDS``. Al salir el proceso se vuelca lo pendiente; un kill -9
+pierde como mucho ese intervalo. Con ``AUDIT_ASYNC = False`` el volcado se
+hace en el mismo hilo al cruzar los umbrales (comandos, tests).
+
+Consultas: ``for_entity`` y ``by_actor``, siempre dentro de una barbería
+(índices ``audit_entity_idx`` y ``audit_actor_idx``, que empiezan por
+``shop``), también en ``GET /audit/``.
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+
+from . import identity
+from .models import AuditEntry, CustomUser, Payment, Reservation
+
+ENTITY_TYPES = {
+    Reservation: 'reservation',
+    Payment: 'payment',
+    CustomUser: 'user',
+}
+MASKED_FIELDS = frozenset({'password'})
+IGNORED_FIELDS = frozenset({'updated_at', 'last_login'})
+MASK = '***'
+
+_encoder = DjangoJSONEncoder()
+_buffer = []
+_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+_last_flush = time.monotonic()
+
+
+def batch_size():
+    return getattr(settings, 'AUDIT_BATCH_SIZE', 100)
+
+
+def flush_seconds():
+    return getattr(settings, 'AUDIT_FLUSH_SECONDS', 2.0)
+
+
+# Diff en memoria
+def snapshot(instance):
+    """``{attname: valor}`` de los campos de la fila (las FK como id), sin consultas."""
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def _plain(value):
+    if value is None or isinstance(value, (bool, int, float, str, list, dict)):
+        return value
+    return _encoder.default(value)  # Decimal, fechas, UUID...
+
+
+def diff(before, after):
+    """
+    ``{campo: [antes, después]}`` de lo que cambió. Sin ``before`` (alta) van
+    todos los campos con valor; con ``before`` solo se comparan sus campos.
+    """
+    changes = {}
+    names = after if before is None else before
+    for name in names:
+        if name in IGNORED_FIELDS:
+            continue
+        old = None if before is None else before[name]
+        new = after.get(name)
+        if old == new or (before is None and new in (None, '')):
+            continue
+        if name in MASKED_FIELDS:
+            changes[name] = [None if old is None else MASK, MASK]
+        else:
+            changes[name] = [_plain(old), _plain(new)]
+    return changes
+
+
+def _shop_id(instance):
+    if isinstance(instance, Payment):
+        reservation = identity.related(instance, 'reservation')
+        return reservation.shop_id if reservation else None
+    return instance.shop_id
+
+
+def record(instance, action, before=None, actor=None, source='api'):
+    """
+    Encola el cambio de ``instance``. ``before`` es el ``snapshot`` previo (en
+    ``update``) o el de la fila borrada (en ``delete``, tomado antes de borrar).
+    """
+    if action == 'delete':
+        changes = {name: [None if name in MASKED_FIELDS else _plain(value), None]
+                   for name, value in before.items() if name not in IGNORED_FIELDS}
+        entity_id = before[instance._meta.pk.attname]
+    else:
+        changes = diff(before if action == 'update' else None, snapshot(instance))
+        if not changes:
+            return None
+        entity_id = instance.pk
+    entry = AuditEntry(
+        shop_id=_shop_id(instance), entity_type=ENTITY_TYPES[type(instance)], entity_id=entity_id,
+        action=action, actor_id=actor.pk if actor is not None and actor.is_authenticated else None,
+        source=source, changes=changes,
+    )
+    # Dentro de una transacción la entrada espera al commit; si se revierte no existió
+    transaction.on_commit(lambda: _push(entry))
+    return entry
+
+
+# Buffer y volcado
+def _push(entry):
+    with _lock:
+        _buffer.append(entry)
+        due = len(_buffer) >= batch_size() or time.monotonic() - _last_flush >= flush_seconds()
+    if not getattr(settings, 'AUDIT_ASYNC', True):
+        if due:
+            flush()
+        return
+    _ensure_worker()
+    if due:
+        _wake.set()
+
+
+def flush():
+    """Escribe lo pendiente con ``bulk_create``; devuelve cuántas entradas."""
+    global _last_flush
+    with _lock:
+        entries = _buffer[:]
+        del _buffer[:]
+        _last_flush = time.monotonic()
+    if not entries:
+        return 0
+    try:
+        AuditEntry.objects.bulk_create(entries, batch_size=500)
+    except Exception:
+        with _lock:
+            _buffer[:0] = entries  # Se reintenta en el siguiente volcado
+        raise
+    return len(entries)
+
+
+def _run():
+    while True:
+        _wake.wait(flush_seconds())
+        _wake.clear()
+        try:
+            if flush():
+                close_old_connections()  # Respeta CONN_MAX_AGE igual que una petición
+        except Exception:
+            close_old_connections()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _lock:
+            if _worker is None or not _worker.is_alive():
+                _worker = threading.Thread(target=_run, name='audit-flush', daemon=True)
+                _worker.start()
+
+
+atexit.register(flush)
+
+
+# Consultas
+def for_entity(shop_id, entity_type, entity_id):
+    """
+    Historial de una reserva, pago o usuario de la barbería, del más reciente
+    al más antiguo. ``shop_id`` None: las entradas sin barbería.
+    """
+    return (
+        AuditEntry.objects.filter(shop_id=shop_id, entity_type=entity_type, entity_id=entity_id)
+        .order_by('-created_at', '-id')
+    )
+
+
+def by_actor(shop_id, actor_id, since=None):
+    """Cambios hechos por un usuario en la barbería (opcionalmente desde ``since``)."""
+    entries = AuditEntry.objects.filter(shop_id=shop_id, actor_id=actor_id)
+    if since is not None:
+        entries = entries.filter(created_at__gte=since)
+    return entries.order_by('-created_at', '-id')
+
+
+# Captura en viewsets y admin
+class AuditedViewMixin:
+    """
+    Registra altas, cambios y borrados de los viewsets. Un ``perform_*``
+    propio debe guardar con ``self.audited_save(serializer)``.
+    """
+
+    def audited_save(self, serializer, **kwargs):
+        before = snapshot(serializer.instance) if serializer.instance is not None else None
+        instance = serializer.save(**kwargs)
+        record(instance, 'create' if before is None else 'update', before, actor=self.request.user)
+        return instance
+
+    def perform_create(self, serializer):
+        self.audited_save(serializer)
+
+    def perform_update(self, serializer):
+        self.audited_save(serializer)
+
+    def perform_destroy(self, instance):
+        before = snapshot(instance)
+        super().perform_destroy(instance)
+        record(instance, 'delete', before, actor=self.request.user)
+
+
+class AuditedAdminMixin:
+    """Lo mismo para el admin; el estado previo sale de ``form.initial`` (sin consultas)."""
+
+    def save_model(self, request, obj, form, change):
+        before = None
+        if change:
+            before = {
+                field.attname: form.initial.get(field.name)
+                for field in obj._meta.concrete_fields if field.name in form.initial
+            }
+        super().save_model(request, obj, form, change)
+        record(obj, 'update' if change else 'create', before, actor=request.user, source='admin')
+
+    def delete_model(self, request, obj):
+        before = snapshot(obj)
+        super().delete_model(request, obj)
+        record(obj, 'delete', before, actor=request.user, source='admin')
+
+    def delete_queryset(self, request, queryset):
+        deleted = [(obj, snapshot(obj)) for obj in queryset]
+        super().delete_queryset(request, queryset)
+        for obj, before in deleted:
+            record(obj, 'delete', before, actor=request.user, source='admin')
@@ -0,0 +1,87 @@
+"""
+Turnos libres de un servicio y "primer turno libre".
+
+Los barberos candidatos salen del índice de capacidades (solo los que hacen
+el servicio, cada uno con su duración); después se hacen dos consultas para
+todos ellos juntos, no por barbero: horarios (``id_barber_id IN``) y reservas
+activas del rango (``id_barber_id IN`` + fecha), más una lectura de la caché
+por día para los holds. Los turnos empiezan cada ``AVAILABILITY_STEP_MINUTES``
+dentro del horario del barbero, en hora local.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import capabilities, holds
+from .schedule import busy_intervals, overlaps, working_hours
+
+
+def step_minutes():
+    return getattr(settings, 'AVAILABILITY_STEP_MINUTES', 15)
+
+
+def _candidates(service_id, barber_ids=None):
+    candidates = capabilities.barbers_for(service_id)
+    if barber_ids is not None:
+        candidates = {barber_id: terms for barber_id, terms in candidates.items() if barber_id in barber_ids}
+    return candidates
+
+
+def _day_slots(candidates, hours, busy, day, now):
+    """[(barbero, inicio)] libres en ``day``, en orden de inicio."""
+    step = timedelta(minutes=step_minutes())
+    slots = []
+    for barber_id, terms in candidates.items():
+        duration = timedelta(minutes=terms.duration)
+        for opening, closing in hours.get(barber_id, {}).get(day.weekday(), ()):
+            start = timezone.make_aware(datetime.combine(day, opening))
+            limit = timezone.make_aware(datetime.combine(day, closing))
+            while start + duration <= limit:
+                if start >= now and not overlaps(busy[barber_id], start, start + duration):
+                    slots.append((barber_id, start))
+                start += step
+    held = holds.held_intervals([
+        (barber_id, start, candidates[barber_id].duration) for barber_id, start in slots
+    ])
+    return sorted(
+        (slot for index, slot in enumerate(slots) if index not in held),
+        key=lambda slot: (slot[1], slot[0]),
+    )
+
+
+def _range(candidates, first_day, days):
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = start + timedelta(days=days)
+    barber_ids = list(candidates)
+    return working_hours(barber_ids), busy_intervals(barber_ids, start, end)
+
+
+def free_slots(service_id, first_day, days=1, barber_ids=None, now=None):
+    """``{barbero: (Terms, [inicio, ...])}`` con los turnos libres del servicio en ``days`` días."""
+    candidates = _candidates(service_id, barber_ids)
+    result = {barber_id: (terms, []) for barber_id, terms in candidates.items()}
+    if not candidates:
+        return result
+    now = now or timezone.now()
+    hours, busy = _range(candidates, first_day, days)
+    for offset in range(days):
+        for barber_id, start in _day_slots(candidates, hours, busy, first_day + timedelta(days=offset), now):
+            result[barber_id][1].append(start)
+    return result
+
+
+def first_available(service_id, after=None, days=14, barber_ids=None):
+    """``(barbero, inicio, Terms)`` del primer turno libre desde ``after``, o None."""
+    after = after or timezone.now()
+    candidates = _candidates(service_id, barber_ids)
+    if not candidates:
+        return None
+    first_day = timezone.localdate(after)
+    hours, busy = _range(candidates, first_day, days)
+    for offset in range(days):
+        slots = _day_slots(candidates, hours, busy, first_day + timedelta(days=offset), after)
+        if slots:
+            barber_id, start = slots[0]
+            return barber_id, start, candidates[barber_id]
+    return None
@@ -0,0 +1,272 @@
+"""
+Micro-benchmarks de los caminos calientes en Python (``manage.py bench_suite``).
+
+Cada caso se mide con varios tamaños de entrada (``SIZES``) usando
+``timeit.Timer.autorange`` + ``repeat``: se guarda el mejor tiempo y la
+mediana por llamada. La comparación con la línea base usa el mejor tiempo,
+el menos sensible al ruido de la máquina, y un cambio menor que
+``DEFAULT_NOISE_FLOOR_MS`` en valor absoluto nunca cuenta como regresión (los
+casos de microsegundos varían más que el umbral de una corrida a otra).
+
+Los datos de prueba se crean en una transacción que el comando revierte; los
+flyweights se vacían antes de cada caso para que un caso no caliente la caché
+del siguiente. La línea base solo es comparable con resultados de la misma
+máquina: guarda ``meta['host']`` y, si no coincide con la máquina actual, la
+comparación es solo informativa (no falla). La del repositorio es una
+referencia; cada máquina que use el gate genera la suya con
+``--save-baseline`` y ``BENCH_BASELINE``.
+"""
+import json
+import platform
+import statistics
+import timeit
+from datetime import date, datetime, time, timedelta
+
+import django
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from .adapters import CardValidationAdapter, ServicePaymentAdapter
+from .flyweight import BarberFlyweight, PaymentFlyweight, ServiceFlyweight
+from .models import BarberService, CustomUser, Payment, Reservation, Service
+from .serializers import PaymentSerializer, ReservationSerializer, ServiceSerializer
+
+SIZES = (10, 100, 1000)
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_NOISE_FLOOR_MS = 0.1
+BENCH_DAY = date(2030, 1, 7)
+
+
+def host():
+    """Identifica la máquina de una medición (nombre, arquitectura y Python)."""
+    return f'{platform.node()}/{platform.machine()}/{platform.python_version()}'
+
+
+def same_host(document):
+    return document.get('meta', {}).get('host') == host()
+
+
+def baseline_path():
+    return getattr(settings, 'BENCH_BASELINE', settings.BASE_DIR / 'benchmarks' / 'baseline.json')
+
+
+def _clear_flyweights():
+    for flyweight in (BarberFlyweight, ServiceFlyweight, PaymentFlyweight):
+        flyweight._cache.clear()
+
+
+# Datos de prueba
+class Fixture:
+    """Servicios, capacidades del barbero, reservas (con pago) y un día por tamaño con ``n`` reservas del barbero."""
+
+    def __init__(self, sizes):
+        largest = max(sizes)
+        self.barber = CustomUser.objects.create(email='bench-suite-barber@example.com', role=1, first_name='Barbero', salary=0)
+        self.client = CustomUser.objects.create(email='bench-suite-client@example.com', role=2, first_name='Cliente')
+        self.services = Service.objects.bulk_create([
+            Service(name=f'Servicio {i}', description='Benchmark', time=30, price='150.50')
+            for i in range(largest)
+        ])
+        # Especialidades del barbero (BarberFlyweight) y capacidad para reservar
+        BarberService.objects.bulk_create([
+            BarberService(barber=self.barber, service=service) for service in self.services[:5]
+        ])
+        self.days = {}
+        reservations = []
+        for offset, size in enumerate(sorted(sizes)):
+            day = BENCH_DAY + timedelta(days=offset)
+            self.days[size] = day
+            opening = timezone.make_aware(datetime.combine(day, time(8)))
+            reservations += [
+                Reservation(id_client=self.client, id_barber=self.barber, id_service=self.services[i % largest],
+                            date=opening + timedelta(seconds=30 * i), person_name=f'Cliente {i}')
+                for i in range(size)
+            ]
+        Reservation.objects.bulk_create(reservations)
+        self.reservations = list(
+            Reservation.objects.filter(id_barber=self.barber)
+            .select_related('id_client', 'id_barber', 'id_service').order_by('id')[:largest]
+        )
+        Payment.objects.bulk_create([
+            Payment(reservation=reservation, amount=reservation.id_service.price, method=('cash', 'card')[i % 2])
+            for i, reservation in enumerate(self.reservations)
+        ])
+        self.payments = list(Payment.objects.filter(reservation__in=self.reservations).order_by('id'))
+
+
+# Casos: (fixture, n) -> función sin argumentos a medir
+def reservation_serializer_many(fixture, n):
+    rows = fixture.reservations[:n]
+    return lambda: ReservationSerializer(rows, many=True).data
+
+
+def payment_serializer_many(fixture, n):
+    rows = fixture.payments[:n]
+    return lambda: PaymentSerializer(rows, many=True).data
+
+
+def service_cached_details(fixture, n):
+    serializer, rows = ServiceSerializer(), fixture.services[:n]
+    for row in rows:
+        serializer.get_cached_details(row)  # Caché caliente: se mide el acceso
+    return lambda: [serializer.get_cached_details(row) for row in rows]
+
+
+def service_flyweight_cold(fixture, n):
+    ids = [service.id for service in fixture.services[:n]]
+
+    def run():
+        ServiceFlyweight._cache.clear()
+        return [ServiceFlyweight.get_service(service_id) for service_id in ids]
+    return run
+
+
+def service_flyweight_warm(fixture, n):
+    ids = [service.id for service in fixture.services[:n]]
+    for service_id in ids:
+        ServiceFlyweight.get_service(service_id)
+    return lambda: [ServiceFlyweight.get_service(service_id) for service_id in ids]
+
+
+def payment_flyweight_cold(fixture, n):
+    ids = [payment.id for payment in fixture.payments[:n]]
+
+    def run():
+        PaymentFlyweight._cache.clear()
+        return [PaymentFlyweight.get_payment_data(payment_id) for payment_id in ids]
+    return run
+
+
+def payment_flyweight_warm(fixture, n):
+    ids = [payment.id for payment in fixture.payments[:n]]
+    for payment_id in ids:
+        PaymentFlyweight.get_payment_data(payment_id)
+    return lambda: [PaymentFlyweight.get_payment_data(payment_id) for payment_id in ids]
+
+
+def barber_flyweight_warm(fixture, n):
+    assert BarberFlyweight.get_barber(fixture.barber.id)['specialties'], 'El barbero no tiene especialidades'
+    return lambda: [BarberFlyweight.get_barber(fixture.barber.id) for _ in range(n)]
+
+
+def service_payment_adapter(fixture, n):
+    adapter, ids = ServicePaymentAdapter(), [service.id for service in fixture.services[:n]]
+    for service_id in ids:
+        ServiceFlyweight.get_service(service_id)
+    return lambda: [adapter.process_service_payment(service_id, ('cash', 'card')[i % 2]) for i, service_id in enumerate(ids)]
+
+
+def card_validation_adapter(fixture, n):
+    cards = [(str(i % 12 + 1), str(2030 + i % 5)) for i in range(n)]
+    return lambda: [CardValidationAdapter.validate_expiration(month, year) for month, year in cards]
+
+
+def horas_ocupadas(fixture, n):
+    from .views import horas_ocupadas as view
+    request = APIRequestFactory().get('/horas-ocupadas/', {'date': fixture.days[n].isoformat(), 'id_barber': fixture.barber.id})
+
+    def run():
+        response = view(request)
+        assert len(response.data) == n, f'{len(response.data)} horas, se esperaban {n}'
+        return response
+    return run
+
+
+CASES = {
+    'reservation_serializer_many': reservation_serializer_many,
+    'payment_serializer_many': payment_serializer_many,
+    'service_cached_details': service_cached_details,
+    'service_flyweight_cold': service_flyweight_cold,
+    'service_flyweight_warm': service_flyweight_warm,
+    'payment_flyweight_cold': payment_flyweight_cold,
+    'payment_flyweight_warm': payment_flyweight_warm,
+    'barber_flyweight_warm': barber_flyweight_warm,
+    'service_payment_adapter': service_payment_adapter,
+    'card_validation_adapter': card_validation_adapter,
+    'horas_ocupadas': horas_ocupadas,
+}
+
+
+# Medición
+def measure(function, repeat):
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    timings = [total / loops for total in timer.repeat(repeat, loops)]
+    return {'best_ms': min(timings) * 1000, 'median_ms': statistics.median(timings) * 1000, 'loops': loops}
+
+
+def run(sizes=SIZES, repeat=5, only=None):
+    """Mide los casos (``only``: nombres o prefijos) y devuelve el documento de resultados."""
+    from .views import horas_ocupadas as view
+    fixture = Fixture(sizes)
+    results = {}
+    # Se mide la consulta, no el throttle (ver bench_throttle)
+    throttles, view.cls.throttle_classes = view.cls.throttle_classes, []
+    try:
+        for name, case in CASES.items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            for n in sizes:
+                _clear_flyweights()
+                key = f'{name}[{n}]'
+                try:
+                    result = measure(case(fixture, n), repeat)
+                except Exception as error:  # Un caso roto no tapa el resto del informe
+                    results[key] = {'error': f'{type(error).__name__}: {error}'[:200]}
+                    continue
+                result['per_item_us'] = result['best_ms'] * 1000 / n
+                results[key] = result
+    finally:
+        view.cls.throttle_classes = throttles
+        _clear_flyweights()
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(timespec='seconds'),
+            'host': host(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.machine(),
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'sizes': list(sizes),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save(document, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as handle:
+        json.dump(document, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, noise_floor_ms=DEFAULT_NOISE_FLOOR_MS):
+    """
+    Filas ``(caso, base_ms, actual_ms, cambio, estado)`` con estado
+    ``regression`` / ``improvement`` / ``ok`` / ``new`` / ``error``. Una
+    diferencia de hasta ``noise_floor_ms`` es ``ok`` sea cual sea el cambio.
+    """
+    rows = []
+    previous = baseline.get('results', {})
+    for key, result in current['results'].items():
+        before = previous.get(key, {})
+        if 'error' in result:
+            rows.append((key, before.get('best_ms'), None, None, 'error'))
+            continue
+        if 'best_ms' not in before:
+            rows.append((key, None, result['best_ms'], None, 'new'))
+            continue
+        change = result['best_ms'] / before['best_ms'] - 1
+        if abs(result['best_ms'] - before['best_ms']) <= noise_floor_ms:
+            state = 'ok'
+        else:
+            state = 'regression' if change > threshold else 'improvement' if change < -threshold else 'ok'
+        rows.append((key, before['best_ms'], result['best_ms'], change, state))
+    return rows
@@ -0,0 +1,213 @@
+"""
+Feed iCalendar (.ics) por barbero, generado de forma incremental.
+
+Cada día de la agenda se guarda en caché como un bloque de VEVENTs ya
+serializado. Al crear, mover o borrar una reserva solo se invalida el día
+afectado y se incrementa la revisión del barbero; al pedir el feed solo se
+regeneran los días sin bloque y el resultado se guarda como bytes junto con
+su ETag y Last-Modified.
+"""
+import hashlib
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import metrics
+from .models import Reservation
+
+SIGNING_SALT = 'accounts.barber-ics'
+FEED_TTL = 60 * 60          # El feed completo se reconstruye al menos cada hora
+DAY_BLOCK_TTL = 60 * 60 * 24
+
+STATUS_MAP = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+}
+
+
+# Firma del enlace del feed
+def make_token(barber_id):
+    return signing.Signer(salt=SIGNING_SALT).sign(str(barber_id))
+
+
+def read_token(token):
+    """Devuelve el id del barbero o None si la firma no es válida."""
+    try:
+        return int(signing.Signer(salt=SIGNING_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+# Claves de caché
+def _generation():
+    # Cambia cuando se modifica un servicio (afecta la duración de todos los eventos)
+    return cache.get('ics:gen', 0)
+
+
+def _revision_key(barber_id):
+    return f'ics:rev:{barber_id}'
+
+
+def _modified_key(barber_id):
+    return f'ics:modified:{barber_id}'
+
+
+def _feed_key(barber_id):
+    return f'ics:feed:{barber_id}'
+
+
+def _day_key(barber_id, day, generation):
+    return f'ics:day:{generation}:{barber_id}:{day.isoformat()}'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+# Invalidación (llamada desde accounts.signals)
+def invalidate_day(barber_id, date):
+    """Marca como modificado el día ``date`` de la agenda del barbero."""
+    if barber_id is None or date is None:
+        return
+    day = timezone.localtime(date).date()
+    cache.delete(_day_key(barber_id, day, _generation()))
+    _incr(_revision_key(barber_id))
+    cache.set(_modified_key(barber_id), time.time(), None)
+
+
+def invalidate_all():
+    """Invalida todos los bloques (p. ej. cambió la duración de un servicio)."""
+    _incr('ics:gen')
+    cache.set('ics:modified:all', time.time(), None)
+
+
+# Serialización iCalendar
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Parte las líneas en trozos de 75 octetos como pide RFC 5545."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return data + b'\r\n'
+    chunks = []
+    while data:
+        size = 75 if not chunks else 74
+        # No cortar en medio de un carácter UTF-8
+        while size < len(data) and (data[size] & 0xC0) == 0x80:
+            size -= 1
+        chunks.append(data[:size])
+        data = data[size:]
+    return b'\r\n '.join(chunks) + b'\r\n'
+
+
+def _format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(row, stamp):
+    start = row['date']
+    end = start + timedelta(minutes=row['id_service__time'])
+    who = row['person_name'] or row['id_client__first_name'] or ''
+    summary = f"{row['id_service__name']} - {who}" if who else row['id_service__name']
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:reservation-{row['id']}@barbershop",
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{_format_datetime(start)}',
+        f'DTEND:{_format_datetime(end)}',
+        f'SUMMARY:{_escape(summary)}',
+        f"STATUS:{STATUS_MAP.get(row['status'], 'TENTATIVE')}",
+        'END:VEVENT',
+    ]
+    return b''.join(_fold(line) for line in lines)
+
+
+def _agenda(barber_id):
+    horizon = timezone.now() - timedelta(days=getattr(settings, 'BARBER_ICS_PAST_DAYS', 30))
+    return (
+        Reservation.objects
+        .filter(id_barber_id=barber_id, date__gte=horizon)
+        .exclude(status='canceled')
+    )
+
+
+def _build_days(barber_id, days):
+    """Genera los bloques de los días indicados con una sola consulta."""
+    rows = (
+        _agenda(barber_id)
+        .filter(date__date__in=days)
+        .order_by('date', 'id')
+        .values(
+            'id', 'date', 'status', 'person_name',
+            'id_client__first_name', 'id_service__name', 'id_service__time',
+        )
+    )
+    stamp = _format_datetime(timezone.now())
+    blocks = {day: [] for day in days}
+    for row in rows:
+        blocks[timezone.localtime(row['date']).date()].append(_event(row, stamp))
+    return {day: b''.join(events) for day, events in blocks.items()}
+
+
+def get_feed(barber_id):
+    """
+    Devuelve ``{'body', 'etag', 'last_modified'}`` para el barbero,
+    regenerando solo los días cuya caché fue invalidada.
+    """
+    generation = _generation()
+    revision = cache.get(_revision_key(barber_id), 0)
+    state = cache.get(_feed_key(barber_id))
+    fresh = bool(state) and state['revision'] == (generation, revision)
+    metrics.cache_lookup('calendar_feed', fresh)
+    if fresh:
+        return state
+
+    days = sorted({
+        timezone.localtime(value).date()
+        for value in _agenda(barber_id).values_list('date', flat=True).distinct()
+    })
+    keys = {day: _day_key(barber_id, day, generation) for day in days}
+    cached = cache.get_many(keys.values())
+    blocks = {day: cached[key] for day, key in keys.items() if key in cached}
+
+    missing = [day for day in days if day not in blocks]
+    if missing:
+        built = _build_days(barber_id, missing)
+        cache.set_many({keys[day]: block for day, block in built.items()}, DAY_BLOCK_TTL)
+        blocks.update(built)
+
+    body = b''.join([
+        b'BEGIN:VCALENDAR\r\n',
+        b'VERSION:2.0\r\n',
+        b'PRODID:-//BARBER SHOP//Agenda//ES\r\n',
+        b'CALSCALE:GREGORIAN\r\n',
+        *(blocks[day] for day in days),
+        b'END:VCALENDAR\r\n',
+    ])
+    last_modified = max(
+        cache.get(_modified_key(barber_id), 0),
+        cache.get('ics:modified:all', 0),
+    ) or time.time()
+    state = {
+        'revision': (generation, revision),
+        'body': body,
+        'etag': '"%s"' % hashlib.md5(body).hexdigest(),
+        'last_modified': http_date(last_modified),
+    }
+    cache.set(_feed_key(barber_id), state, FEED_TTL)
+    return state
@@ -0,0 +1,170 @@
+"""
+Índice de capacidades barbero ↔ servicio (``BarberService``).
+
+El índice se calcula de una vez con cuatro consultas (servicios activos,
+barberos activos, capacidades activas unidas a ambos y barberías que ya
+configuraron capacidades) y se guarda en la caché compartida bajo una
+versión; cada proceso se queda además con la última versión leída, así una
+consulta normal cuesta un ``cache.get`` de la versión. Cualquier cambio en
+capacidades, servicios o barberos sube la versión al confirmar la
+transacción (ver accounts.signals). Un índice calculado dentro de una
+transacción no se guarda: podría incluir filas que luego se revierten; y si
+la propia transacción ya cambió algo, se calcula de nuevo en cada consulta
+para que vea sus cambios aún sin confirmar.
+
+Una barbería sin ninguna fila en ``BarberService`` todavía no configuró
+capacidades: ahí todos sus barberos activos hacen todos sus servicios, con la
+duración y el precio del servicio, como antes de existir la relación.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import BarberService, CustomUser, Service
+
+VERSION_KEY = 'capabilities:version'
+INDEX_KEY = 'capabilities:index:%s'
+INDEX_SECONDS = 24 * 60 * 60
+
+Terms = namedtuple('Terms', 'duration price')
+
+_local = {'version': None, 'index': None}
+_dirty = threading.local()  # .block: transacción externa que cambió capacidades
+
+
+class CapabilityIndex:
+    def __init__(self, services, barbers, capabilities, configured):
+        self.services = services  # {servicio: (barbería, minutos, precio)}
+        self.barbers = barbers  # {barbero activo: barbería}
+        self.capabilities = capabilities  # {servicio: {barbero: (minutos, precio)}}; None = el del servicio
+        self.configured = configured  # Barberías con alguna fila en BarberService (activa o no)
+        self.by_barber = {}
+        for service_id, by_barber in capabilities.items():
+            for barber_id in by_barber:
+                self.by_barber.setdefault(barber_id, set()).add(service_id)
+
+    def terms(self, barber_id, service_id):
+        """``Terms(duration, price)`` del barbero para el servicio, o None si no lo hace."""
+        service = self.services.get(service_id)
+        if service is None or barber_id not in self.barbers:
+            return None
+        shop_id, minutes, price = service
+        override = self.capabilities.get(service_id, {}).get(barber_id)
+        if override is not None:
+            return Terms(override[0] or minutes, override[1] if override[1] is not None else price)
+        if shop_id in self.configured or self.barbers[barber_id] != shop_id:
+            return None
+        return Terms(minutes, price)
+
+    def can_perform(self, barber_id, service_id):
+        return self.terms(barber_id, service_id) is not None
+
+    def barbers_for(self, service_id):
+        """{barbero: Terms} de los barberos activos que hacen el servicio."""
+        service = self.services.get(service_id)
+        if service is None:
+            return {}
+        if service[0] in self.configured:
+            candidates = self.capabilities.get(service_id, {})
+        else:
+            candidates = [barber_id for barber_id, shop_id in self.barbers.items() if shop_id == service[0]]
+        return {barber_id: self.terms(barber_id, service_id) for barber_id in candidates}
+
+    def services_for(self, barber_id):
+        """Ids de los servicios activos que hace el barbero."""
+        shop_id = self.barbers.get(barber_id, False)
+        if shop_id is False:
+            return set()
+        if shop_id in self.configured:
+            return set(self.by_barber.get(barber_id, ()))
+        return {service_id for service_id, service in self.services.items() if service[0] == shop_id}
+
+    def duration(self, barber_id, service_id, default):
+        """Minutos que le lleva el servicio al barbero (``default`` si no hay override)."""
+        override = self.capabilities.get(service_id, {}).get(barber_id)
+        return override[0] if override is not None and override[0] else default
+
+
+def build():
+    services = {
+        service_id: (shop_id, minutes, price)
+        for service_id, shop_id, minutes, price in Service.objects.filter(active_service=True)
+        .values_list('id', 'shop_id', 'time', 'price')
+    }
+    barbers = dict(CustomUser.objects.filter(role=1, is_active=True).values_list('id', 'shop_id'))
+    capabilities = {}
+    # Una consulta con los joins a users y accounts_service por sus PK
+    rows = (
+        BarberService.objects
+        .filter(is_active=True, barber__role=1, barber__is_active=True, service__active_service=True)
+        .values_list('service_id', 'barber_id', 'duration', 'price')
+    )
+    for service_id, barber_id, minutes, price in rows:
+        capabilities.setdefault(service_id, {})[barber_id] = (minutes, price)
+    configured = set(BarberService.objects.order_by().values_list('shop_id', flat=True).distinct())
+    return CapabilityIndex(services, barbers, capabilities, configured)
+
+
+def _initial_version():
+    # Si la caché expulsa la versión, la nueva no repite la de un índice viejo aún guardado
+    return int(time.time() * 1000)
+
+
+def _in_dirty_transaction():
+    return connection.in_atomic_block and getattr(_dirty, 'block', None) is connection.atomic_blocks[0]
+
+
+def get_index():
+    if _in_dirty_transaction():
+        return build()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _initial_version(), None)
+        version = cache.get(VERSION_KEY)
+    if version is not None and _local['version'] == version:
+        return _local['index']
+    data = cache.get(INDEX_KEY % version) if version is not None else None
+    if data is not None:
+        index = CapabilityIndex(*data)
+    else:
+        index = build()
+        if connection.in_atomic_block or version is None:
+            return index
+        cache.set(INDEX_KEY % version, (index.services, index.barbers, index.capabilities, index.configured), INDEX_SECONDS)
+    _local.update(version=version, index=index)
+    return index
+
+
+def invalidate():
+    """Nueva versión del índice: se recalcula con la próxima consulta."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # Sin versión todavía (o expulsada)
+        cache.add(VERSION_KEY, _initial_version(), None)
+    _local.update(version=None, index=None)
+
+
+def changed():
+    """Capacidades, servicios o barberos cambiados: invalida al confirmar."""
+    if connection.in_atomic_block:
+        _dirty.block = connection.atomic_blocks[0]
+    transaction.on_commit(invalidate)
+
+
+def terms(barber_id, service_id):
+    return get_index().terms(int(barber_id), int(service_id))
+
+
+def can_perform(barber_id, service_id):
+    return terms(barber_id, service_id) is not None
+
+
+def barbers_for(service_id):
+    return get_index().barbers_for(int(service_id))
+
+
+def duration(barber_id, service_id, default):
+    return get_index().duration(barber_id, service_id, default)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+IN_PROCESS_EVENTS_BACKEND = 'accounts.realtime.InProcessBackend'
+
+
+@register(Tags.compatibility, deploy=True)
+def check_reservation_events_backend(app_configs, **kwargs):
+    """El pub/sub en memoria no cruza procesos: en producción el stream SSE perdería eventos."""
+    if getattr(settings, 'RESERVATION_EVENTS_BACKEND', IN_PROCESS_EVENTS_BACKEND) != IN_PROCESS_EVENTS_BACKEND:
+        return []
+    return [Warning(
+        'RESERVATION_EVENTS_BACKEND usa el pub/sub en memoria del proceso.',
+        hint=(
+            'Los eventos de reservas guardadas por workers WSGI, otros workers ASGI o comandos '
+            'no llegan a /events/reservations/. Configura un backend compartido (p. ej. sobre Redis).'
+        ),
+        id='accounts.W001',
+    )]
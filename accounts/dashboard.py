@@ -0,0 +1,103 @@
+"""
+Resumen "hoy" del barbero: una sola consulta con agregados condicionales
+sobre sus reservas (con pagos y servicios) más una subconsulta para el
+próximo cliente. El resultado se guarda unos segundos en caché y se invalida
+cuando cambian las reservas o pagos del barbero (ver accounts.signals).
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, JSONField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, JSONObject, NullIf
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+from .models import CustomUser, Reservation
+
+
+def _cache_key(barber_id):
+    return f'dashboard:{barber_id}'
+
+
+def invalidate(barber_id):
+    if barber_id is not None:
+        cache.delete(_cache_key(barber_id))
+
+
+def _today_range():
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    return start, start + timedelta(days=1)
+
+
+def compute(barber_id):
+    now = timezone.now()
+    start, end = _today_range()
+    today = Q(barber_reservations__date__gte=start, barber_reservations__date__lt=end)
+    active = ~Q(barber_reservations__status='canceled')
+
+    next_reservation = (
+        Reservation.objects
+        .filter(id_barber=OuterRef('pk'), date__gte=now, status__in=['pending', 'confirmed'])
+        .order_by('date')
+        .values(data=JSONObject(
+            id='id',
+            date='date',
+            # person_name vacío o nulo: se usa el nombre del cliente
+            name=Coalesce(NullIf('person_name', Value('')), 'id_client__first_name'),
+            phone_number='id_client__phone_number',
+            service='id_service__name',
+        ))[:1]
+    )
+
+    row = (
+        CustomUser.objects
+        .filter(pk=barber_id)
+        .annotate(
+            today_total=Count('barber_reservations', filter=today & active),
+            today_completed=Count('barber_reservations', filter=today & Q(barber_reservations__status='completed')),
+            today_remaining=Count('barber_reservations', filter=today & Q(
+                barber_reservations__date__gte=now,
+                barber_reservations__status__in=['pending', 'confirmed'],
+            )),
+            pending_confirmations=Count('barber_reservations', filter=Q(
+                barber_reservations__date__gte=now, barber_reservations__status='pending',
+            )),
+            booked_minutes=Sum('barber_reservations__id_service__time', filter=today & active),
+            expected_today=Sum('barber_reservations__id_service__price', filter=today & active),
+            takings_today=Sum('barber_reservations__payment__amount', filter=today),
+            next_client=Subquery(next_reservation, output_field=JSONField()),
+        )
+        .values(
+            'today_total', 'today_completed', 'today_remaining', 'pending_confirmations',
+            'booked_minutes', 'expected_today', 'takings_today', 'next_client',
+        )
+        .first()
+    )
+    if row is None:
+        return None
+
+    for field in ('expected_today', 'takings_today'):
+        row[field] = str((row[field] or Decimal(0)).quantize(Decimal('0.01')))
+    row['booked_minutes'] = row['booked_minutes'] or 0
+    if row['next_client']:
+        # Dentro de JSON la fecha llega como texto del motor (en SQLite sin zona, en UTC)
+        date = parse_datetime(row['next_client']['date'].replace(' ', 'T'))
+        if timezone.is_naive(date):
+            date = date.replace(tzinfo=dt_timezone.utc)
+        row['next_client']['date'] = date.isoformat().replace('+00:00', 'Z')
+    row['date'] = timezone.localdate().isoformat()
+    return row
+
+
+def get_dashboard(barber_id):
+    key = _cache_key(barber_id)
+    data = cache.get(key)
+    metrics.cache_lookup('dashboard', data is not None)
+    if data is None:
+        data = compute(barber_id)
+        cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_SECONDS', 10))
+    return data
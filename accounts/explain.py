@@ -0,0 +1,347 @@
+"""
+Auditoría de planes de ejecución (``manage.py explain_audit``).
+
+Cada sonda ejecuta un camino real contra datos sembrados: los ``get_queryset``
+de los viewsets por rol y con sus filtros de ``query_params``, ``horas_ocupadas``,
+las búsquedas de las vistas de correo y los changelists del admin. Se capturan
+los SELECT que lanza y se pide el plan de cada uno:
+
+* SQLite: ``EXPLAIN QUERY PLAN``. ``SCAN tabla`` es un recorrido completo,
+  ``SCAN tabla USING INDEX`` un recorrido completo del índice y
+  ``USE TEMP B-TREE`` un ordenamiento en memoria.
+* PostgreSQL: ``EXPLAIN (FORMAT JSON)`` con ``enable_seqscan = off``, así un
+  ``Seq Scan`` solo aparece cuando no hay índice que sirva (con pocas filas el
+  planificador lo elegiría siempre). ``Sort`` cuenta como el B-tree temporal.
+
+Para cada recorrido se propone un índice candidato con las columnas de la
+tabla que aparecen en el WHERE (y en el ORDER BY si hay ordenamiento) que no
+encabecen ya un índice existente. Los hallazgos se comparan con la línea base
+(``EXPLAIN_BASELINE``, una sección por motor): uno nuevo hace fallar el
+comando.
+"""
+import json
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .models import (
+    BarberSchedule, BarberService, CustomUser, Payment, RecurringReservation, Reservation, Service, Shop,
+    UserCard,
+)
+
+FULL_SCAN = 'full_scan'
+INDEX_SCAN = 'index_scan'
+TEMP_BTREE = 'temp_btree'
+SEED_DAY = date(2030, 1, 7)
+
+
+def baseline_path():
+    return getattr(settings, 'EXPLAIN_BASELINE', settings.BASE_DIR / 'benchmarks' / 'explain_baseline.json')
+
+
+# Datos sembrados
+class Seed:
+    """
+    Una barbería con admin, barbero y cliente, servicios con sus capacidades, agenda, reservas con pago,
+    tarjeta y cita fija.
+    """
+
+    def __init__(self, reservations=200):
+        self.shop = Shop.objects.create(name='Explain', slug='explain-audit')
+        self.admin, self.barber, self.client = CustomUser.objects.bulk_create([
+            CustomUser(email='explain-admin@example.com', role=0, is_staff=True, is_superuser=True, shop=self.shop),
+            CustomUser(email='explain-barber@example.com', role=1, first_name='Barbero', shop=self.shop),
+            CustomUser(email='explain-client@example.com', role=2, first_name='Cliente', shop=self.shop),
+        ])
+        self.services = Service.objects.bulk_create([
+            Service(shop=self.shop, category=1 + i % 2, name=f'Servicio {i}', description='Explain', time=30, price='100.00')
+            for i in range(5)
+        ])
+        BarberService.objects.bulk_create([
+            BarberService(shop=self.shop, barber=self.barber, service=service, duration=45 if i == 0 else None)
+            for i, service in enumerate(self.services)
+        ])
+        BarberSchedule.objects.create(shop=self.shop, id_barber=self.barber, days=['Lunes'], start_time=time(9), end_time=time(18))
+        opening = timezone.make_aware(datetime.combine(SEED_DAY, time(9)))
+        rows = Reservation.objects.bulk_create([
+            Reservation(shop=self.shop, id_client=self.client, id_barber=self.barber, id_service=self.services[i % 5],
+                        date=opening + timedelta(days=i // 16, minutes=30 * (i % 16)),
+                        status=('pending', 'confirmed', 'completed')[i % 3])
+            for i in range(reservations)
+        ])
+        self.reservation = rows[0]
+        Payment.objects.bulk_create([
+            Payment(reservation=row, amount='100.00', method=('cash', 'card')[i % 2]) for i, row in enumerate(rows[::2])
+        ])
+        UserCard.objects.create(user=self.client, card_number='4242424242424242', expiration_month='12', expiration_year='2031')
+        RecurringReservation.objects.create(
+            shop=self.shop, id_client=self.client, id_barber=self.barber, id_service=self.services[0],
+            start_date=SEED_DAY, start_time=time(10), materialized_until=SEED_DAY)
+
+    def user(self, role):
+        return {None: None, 0: self.admin, 1: self.barber, 2: self.client}[role]
+
+
+# Sondas: nombre -> función (seed) que ejecuta el camino
+def _api(path, role=None, params=None):
+    params = params or {}
+
+    def run(seed):
+        client = APIClient()
+        user = seed.user(role)
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(path.format(seed=seed), {key: value.format(seed=seed) for key, value in params.items()})
+        assert response.status_code == 200, f'GET {path} -> {response.status_code}'
+    return run
+
+
+def _horas_ocupadas(seed):
+    from .views import horas_ocupadas
+    request = APIRequestFactory().get('/horas-ocupadas/', {'date': SEED_DAY.isoformat(), 'id_barber': seed.barber.id})
+    view = horas_ocupadas.cls
+    throttles, view.throttle_classes = view.throttle_classes, []  # Se explica la consulta, no el throttle
+    try:
+        assert horas_ocupadas(request).status_code == 200
+    finally:
+        view.throttle_classes = throttles
+
+
+def _email_reservation_lookup(seed):
+    # AppointmentCancellation/ConfirmationEmailView: la reserva y sus usuarios
+    reservation = Reservation.objects.get(id=seed.reservation.id)
+    return reservation.id_barber, reservation.id_client
+
+
+def _email_user_lookup(seed):
+    # PasswordRecoveryCodeView y ValidateRecoveryCodeView
+    return CustomUser.objects.get(email=seed.client.email)
+
+
+def _admin_changelist(model):
+    def run(seed):
+        client = Client()
+        client.force_login(seed.admin)
+        path = f'/admin/{model._meta.app_label}/{model._meta.model_name}/'
+        response = client.get(path)
+        assert response.status_code == 200, f'GET {path} -> {response.status_code}'
+    return run
+
+
+def probes():
+    found = {
+        'users.list[admin]': _api('/users/', 0),
+        'users.list[admin,role]': _api('/users/', 0, {'role': '1'}),
+        'users.retrieve[admin]': _api('/users/{seed.client.id}/', 0),
+        'barber_schedules.list': _api('/barber-schedules/'),
+        'barber_schedules.list[barber_id]': _api('/barber-schedules/', None, {'barber_id': '{seed.barber.id}'}),
+        'services.list': _api('/services/'),
+        'services.list[category]': _api('/services/', None, {'category': '1'}),
+        'reservations.list[anon,barber_id]': _api('/reservations/', None, {'barber_id': '{seed.barber.id}'}),
+        'reservations.list[admin]': _api('/reservations/', 0),
+        'reservations.list[admin,status]': _api('/reservations/', 0, {'status': 'pending'}),
+        'reservations.list[barber]': _api('/reservations/', 1),
+        'reservations.list[barber,status,dates]': _api('/reservations/', 1, {
+            'status': 'confirmed', 'date_from': SEED_DAY.isoformat(),
+            'date_to': (SEED_DAY + timedelta(days=7)).isoformat()}),
+        'reservations.list[client]': _api('/reservations/', 2),
+        'reservations.list[client,dates]': _api('/reservations/', 2, {'date_from': SEED_DAY.isoformat()}),
+        'reservations.retrieve[admin]': _api('/reservations/{seed.reservation.id}/', 0),
+        'payments.list[admin]': _api('/payments/', 0),
+        'cards.list[client]': _api('/cards/', 2),
+        'recurrences.list[admin]': _api('/recurrences/', 0),
+        'recurrences.list[barber]': _api('/recurrences/', 1),
+        'recurrences.list[client]': _api('/recurrences/', 2),
+        'barber_services.list[barber_id]': _api('/barber-services/', None, {'barber_id': '{seed.barber.id}'}),
+        'availability': _api('/availability/', None, {
+            'service': '{seed.services[0].id}', 'date': SEED_DAY.isoformat(), 'days': '7',
+        }),
+        'availability.first': _api('/availability/first/', None, {
+            'service': '{seed.services[0].id}', 'from': SEED_DAY.isoformat(),
+        }),
+        'horas_ocupadas': _horas_ocupadas,
+        'emails.reservation_lookup': _email_reservation_lookup,
+        'emails.user_lookup': _email_user_lookup,
+    }
+    if apps.is_installed('django.contrib.admin'):  # No está en backend.settings_api
+        admin.autodiscover()  # SimpleAdminConfig: el registro es perezoso (ver backend.urls)
+        for model in admin.site._registry:
+            if model._meta.app_label == 'accounts':
+                found[f'admin.{model._meta.model_name}.changelist'] = _admin_changelist(model)
+    return found
+
+
+# Planes
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def capture(probe, seed):
+    """``(total, selects)``: consultas que lanza la sonda y un SELECT por forma (sin literales)."""
+    with CaptureQueriesContext(connection) as context:
+        probe(seed)
+    shapes = {}
+    for query in context.captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith('SELECT'):
+            shapes.setdefault(_LITERAL.sub('?', sql), sql)
+    return len(context.captured_queries), list(shapes.values())
+
+
+def explain(sql):
+    """[(tipo, tabla, alias, detalle)] de los pasos problemáticos del plan."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return _sqlite_steps(sql, [row[-1] for row in cursor.fetchall()])
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            try:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+            finally:
+                cursor.execute('RESET enable_seqscan')
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return list(_postgres_steps(plan[0]['Plan'], _tables(sql)[0]))
+    raise NotImplementedError(f'EXPLAIN no soportado para {connection.vendor}')
+
+
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (?:COVERING )?INDEX (\w+))?')
+
+
+def _sqlite_steps(sql, details):
+    tables, aliases = _tables(sql)
+    main = tables[0] if tables else None
+    steps = []
+    for detail in details:
+        match = _SQLITE_SCAN.match(detail)
+        if match:
+            name = match.group(2) or match.group(1)
+            table = aliases.get(name, name)
+            if table in tables:
+                steps.append((INDEX_SCAN if match.group(3) else FULL_SCAN, table, name, detail))
+        elif detail.startswith('USE TEMP B-TREE') and main:
+            steps.append((TEMP_BTREE, main, main, detail))
+    return steps
+
+
+def _postgres_steps(node, tables):
+    table = node.get('Relation Name')
+    alias = node.get('Alias', table)
+    if node['Node Type'] == 'Seq Scan' and table:
+        yield FULL_SCAN, table, alias, f'Seq Scan on {table}'
+    elif node['Node Type'] in ('Index Scan', 'Index Only Scan') and not node.get('Index Cond') and table:
+        yield INDEX_SCAN, table, alias, f'{node["Node Type"]} using {node.get("Index Name")} on {table}'
+    elif node['Node Type'] == 'Sort' and tables:
+        yield TEMP_BTREE, tables[0], tables[0], f'Sort ({", ".join(node.get("Sort Key", []))})'
+    for child in node.get('Plans', []):
+        yield from _postgres_steps(child, tables)
+
+
+_TABLE_REF = re.compile(r'(?:FROM|JOIN) "(\w+)"(?: (?:AS )?"?(\w+)"?)?')
+
+
+def _tables(sql):
+    tables, aliases = [], {}
+    for table, alias in _TABLE_REF.findall(sql):
+        tables.append(table)
+        if alias and alias.upper() not in ('ON', 'WHERE', 'INNER', 'LEFT', 'ORDER', 'GROUP', 'LIMIT'):
+            aliases[alias] = table
+    return tables, aliases
+
+
+def _columns(sql, alias, clause):
+    """Columnas de ``alias`` citadas en la primera cláusula WHERE u ORDER BY del SELECT."""
+    upper = sql.upper()
+    start = upper.find(f' {clause} ')
+    if start < 0:
+        return []
+    end = min([position for position in (upper.find(' ORDER BY ', start + 1), upper.find(' LIMIT ', start + 1)) if position > 0] or [len(sql)])
+    return list(dict.fromkeys(re.findall(rf'"{re.escape(alias)}"\."(\w+)"', sql[start:end])))
+
+
+@lru_cache(maxsize=None)
+def _leading_columns(table):
+    """Primeras columnas de los índices (y PK/UNIQUE) de la tabla."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return frozenset(
+        info['columns'][0] for info in constraints.values()
+        if (info['index'] or info['primary_key'] or info['unique']) and info['columns']
+    )
+
+
+def candidate_index(sql, kind, table, alias):
+    """``tabla(col, ...)`` propuesto para el paso, o None si no hay columnas útiles."""
+    columns = _columns(sql, alias, 'WHERE')
+    if kind == TEMP_BTREE:
+        columns += [column for column in _columns(sql, alias, 'ORDER BY') if column not in columns]
+    if not columns or columns[0] in _leading_columns(table):
+        return None
+    return f'{table}({", ".join(columns)})'
+
+
+def audit(seed=None):
+    """Ejecuta todas las sondas. Devuelve ``{sonda: [hallazgo, ...]}`` y ``{sonda: consultas}``."""
+    seed = seed or Seed()
+    _leading_columns.cache_clear()
+    report, counts = {}, {}
+    hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+    with override_settings(ALLOWED_HOSTS=hosts):
+        for name, probe in probes().items():
+            findings = []
+            try:
+                counts[name], queries = capture(probe, seed)
+            except Exception as error:  # Una sonda rota no tapa el resto del informe
+                report[name] = [{'error': f'{type(error).__name__}: {error}'[:200]}]
+                continue
+            for sql in queries:
+                for kind, table, alias, detail in explain(sql):
+                    findings.append({
+                        'kind': kind, 'table': table, 'detail': detail,
+                        'candidate': candidate_index(sql, kind, table, alias), 'sql': sql,
+                    })
+            report[name] = findings
+    return report, counts
+
+
+def finding_keys(report):
+    """Claves estables (``sonda|tipo|tabla``) para comparar con la línea base."""
+    return sorted({
+        f'{name}|{finding["kind"]}|{finding["table"]}'
+        for name, findings in report.items() for finding in findings if 'error' not in finding
+    })
+
+
+def load(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def save(report, path):
+    document = load(path)
+    document[connection.vendor] = finding_keys(report)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as handle:
+        json.dump(document, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def compare(report, baseline):
+    """``(nuevos, resueltos)`` respecto a la sección del motor actual; None si no hay sección."""
+    known = baseline.get(connection.vendor)
+    if known is None:
+        return None
+    current = finding_keys(report)
+    return [key for key in current if key not in known], [key for key in known if key not in current]
@@ -1,3 +1,4 @@
+from . import identity
 from .models import Reservation, Service, Payment, UserCard
 from django.contrib.auth import get_user_model
 from datetime import datetime
@@ -26,9 +27,9 @@ User = get_user_model()
 
 class CardFactory:
     @staticmethod
-    def create_card(validated_data):
-        """Crea tarjeta"""
-        user = User.objects.get(id=1)
+    def create_card(validated_data, user=None):
+        """Crea tarjeta (del usuario indicado o, si no hay, del usuario 1)"""
+        user = user or identity.get(User, 1)
         return UserCard.objects.create(user=user, **validated_data)
 
 class PaymentFactory:
@@ -37,4 +38,6 @@ class PaymentFactory:
         """Crea pago con lógica de negocio integrada"""
         payment_data = validated_data.copy() # Copia los datos validados para evitar modificar el original
         payment_data['amount'] = service_price # Establece el monto del pago
-        return Payment.objects.create(**payment_data)
\ No newline at end of file
+        payment = Payment.objects.create(**payment_data)
+        identity.add(payment)
+        return payment
\ No newline at end of file
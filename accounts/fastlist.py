@@ -0,0 +1,182 @@
+"""
+Modo de listado rápido sin instanciar serializadores por fila.
+
+Construye el mismo JSON que el ``ModelSerializer`` del viewset a partir de
+filas de ``values()``. Los mapeadores de cada campo se compilan una sola vez
+por serializador leyendo sus campos declarados (mismo orden, mismas claves).
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+try:  # orjson es opcional; si no está instalado se usa json de la librería estándar
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps(data):
+    """Serializa a bytes con la misma salida compacta que JSONRenderer."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _identity(value, context):
+    return value
+
+
+def _decimal_converter(field):
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+
+    def convert(value, context):
+        return '{:f}'.format(value.quantize(exponent))
+    return convert
+
+
+def _datetime_converter(value, context):
+    value = value.astimezone(context['timezone']).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _isoformat_converter(value, context):
+    return value.isoformat()
+
+
+# Campos cuyo valor de values() ya es el que devuelve DRF
+_IDENTITY_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField, serializers.JSONField,
+    serializers.ChoiceField,
+)
+
+
+def _converter_for(field):
+    if isinstance(field, serializers.DecimalField):
+        coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if not coerce or field.decimal_places is None or getattr(field, 'normalize_output', False):
+            return None
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601:
+            return None
+        return _datetime_converter
+    if isinstance(field, (serializers.DateField, serializers.TimeField)):
+        return _isoformat_converter
+    if isinstance(field, _IDENTITY_FIELDS):
+        return _identity
+    return None
+
+
+class CompiledMapper:
+    """Mapeo precompilado ``fila de values() -> dict`` para un serializador."""
+
+    def __init__(self, mappers):
+        self.mappers = mappers
+        # Columnas a pedir en values(), sin repetir y en orden estable
+        self.lookups = list(dict.fromkeys(
+            lookup for mapper in mappers for lookup in mapper[4]
+        ))
+
+    @classmethod
+    def compile(cls, serializer, method_fields):
+        """
+        Devuelve un CompiledMapper, o None si algún campo no se puede
+        resolver sin el serializador (en ese caso se usa el camino normal).
+        ``method_fields`` asocia cada SerializerMethodField a
+        ``(lookups, funcion(fila))``.
+        """
+        mappers = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in method_fields:
+                    return None
+                extra_lookups, function = method_fields[name]
+                mappers.append((name, None, (), function, tuple(extra_lookups)))
+                continue
+            converter = _converter_for(field)
+            if converter is None or field.source == '*':
+                return None
+
+            attrs = field.source_attrs
+            lookup = '__'.join(attrs)
+            # Si una relación intermedia es nula DRF omite la clave (SkipField)
+            guards = tuple('__'.join(attrs[:index]) for index in range(1, len(attrs)))
+            mappers.append((name, lookup, guards, converter, (lookup,) + guards))
+        return cls(mappers)
+
+    def only(self, names):
+        """Copia del mapeo restringida a los campos pedidos (``?fields=``)."""
+        return CompiledMapper([mapper for mapper in self.mappers if mapper[0] in names])
+
+    def map_rows(self, rows):
+        context = {'timezone': timezone.get_current_timezone()}
+        mappers = self.mappers
+        result = []
+        append = result.append
+        for row in rows:
+            item = {}
+            for name, lookup, guards, converter, _ in mappers:
+                if lookup is None:
+                    item[name] = converter(row)
+                    continue
+                if guards and any(row[guard] is None for guard in guards):
+                    continue
+                value = row[lookup]
+                item[name] = None if value is None else converter(value, context)
+            append(item)
+        return result
+
+
+class FastListMixin:
+    """
+    Listado opt-in sin serializadores por fila. Se activa con ``?fast=1`` o
+    globalmente con ``FAST_LIST_MODE = True`` en settings. Los viewsets pueden
+    declarar ``fast_method_fields`` para sus SerializerMethodField.
+    """
+    fast_method_fields = {}
+    _fast_mappers = None
+
+    def use_fast_list(self):
+        params = self.request.query_params
+        if params.get('expand'):
+            return False
+        fast = params.get('fast')
+        if fast is not None:
+            return fast.lower() in ('1', 'true', 'yes')
+        return getattr(settings, 'FAST_LIST_MODE', False)
+
+    @classmethod
+    def get_fast_mapper(cls, serializer_class):
+        """Compila (una vez por clase) el mapeo del serializador completo."""
+        if cls._fast_mappers is None or cls._fast_mappers[0] is not serializer_class:
+            mapper = CompiledMapper.compile(serializer_class(), cls.fast_method_fields)
+            cls._fast_mappers = (serializer_class, mapper)
+        return cls._fast_mappers[1]
+
+    def fast_list_response(self, queryset):
+        """Devuelve la respuesta rápida, o None si este serializador no la soporta."""
+        mapper = self.get_fast_mapper(self.get_serializer_class())
+        if mapper is None:
+            return None
+        fields = self.request.query_params.get('fields')
+        if fields:
+            mapper = mapper.only({name.strip() for name in fields.split(',')})
+        rows = queryset.values(*mapper.lookups)
+        return HttpResponse(dumps(mapper.map_rows(rows)), content_type='application/json')
+
+    def list(self, request, *args, **kwargs):
+        if self.use_fast_list():
+            response = self.fast_list_response(self.filter_queryset(self.get_queryset()))
+            if response is not None:
+                return response
+        return super().list(request, *args, **kwargs)
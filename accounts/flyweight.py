@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from . import identity, metrics
 from .models import Service
 
 User = get_user_model()
@@ -9,6 +10,7 @@ class BarberFlyweight:
     @classmethod
     def get_barber(cls, barber_id):
         # Verifica si el barber_id ya está en la caché        
+        metrics.cache_lookup('barber_flyweight', barber_id in cls._cache)
         if barber_id not in cls._cache:
             try:
                 # Si no está en la caché, obtiene el objeto User correspondiente                
@@ -16,7 +18,12 @@ class BarberFlyweight:
                 # Almacena los datos relevantes del barbero en la caché                
                 cls._cache[barber_id] = {
                     'name': barber.username,
-                    'specialties': list(barber.services_offered.all().values_list('name', flat=True))
+                    # Solo las capacidades activas (ver accounts.capabilities)
+                    'specialties': list(
+                        barber.services_offered.filter(
+                            capabilities__barber=barber, capabilities__is_active=True, active_service=True)
+                        .values_list('name', flat=True)
+                    )
                 }
             except User.DoesNotExist:
                 # Si el barbero no existe, retorna None                
@@ -29,6 +36,7 @@ class ServiceFlyweight:
     @classmethod
     def get_service(cls, service_id):
         # Verifica si el service_id ya está en la caché        
+        metrics.cache_lookup('service_flyweight', service_id in cls._cache)
         if service_id not in cls._cache:
             try:
                 # Si no está en la caché, obtiene el objeto Service correspondiente                
@@ -42,6 +50,17 @@ class ServiceFlyweight:
             except Service.DoesNotExist:
                 return None
         return cls._cache[service_id]
+
+    @classmethod
+    def prime(cls, service_id, name, price, duration):
+        """Carga el servicio en la caché con datos ya leídos, sin consultar la BD"""
+        if service_id not in cls._cache:
+            cls._cache[service_id] = {
+                'name': name,
+                'price': float(price),
+                'duration': duration
+            }
+        return cls._cache[service_id]
     
 class PaymentFlyweight:
     _cache = {}
@@ -49,12 +68,15 @@ class PaymentFlyweight:
     @classmethod
     def get_payment_data(cls, payment_id):
         """Cachea datos de pagos recurrentes"""
+        metrics.cache_lookup('payment_flyweight', payment_id in cls._cache)
         if payment_id not in cls._cache:
             from .models import Payment
-            payment = Payment.objects.get(id=payment_id)
+            # Pago, reserva y servicio suelen estar ya en el mapa si el pago se acaba de crear
+            payment = identity.get(Payment, payment_id)
+            service = identity.related(identity.related(payment, 'reservation'), 'id_service')
             cls._cache[payment_id] = {
                 'amount': float(payment.amount),
-                'service': payment.reservation.id_service.name,
+                'service': service.name,
                 'date': payment.created_at
             }
         return cls._cache[payment_id]
\ No newline at end of file
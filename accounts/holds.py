@@ -0,0 +1,167 @@
+"""
+Reservas provisionales de turno ("holds") durante el checkout.
+
+Un hold es un lease con TTL sobre ``(barbero, inicio, duración)`` guardado solo
+en la caché compartida (Redis en producción, ver CACHES): no escribe en la BD,
+así que un checkout abandonado no deja reservas ``pending`` y el hold caduca
+solo, sin limpieza.
+
+El turno se parte en ranuras de ``SLOT_MINUTES``; cada ranura es una clave
+``hold:slot:<barbero>:<minuto>`` que se toma con ``cache.add`` (SET NX en
+Redis), así dos holds que se solapan no pueden coexistir. Confirmar convierte
+el hold en una ``Reservation`` dentro de una transacción que vuelve a
+comprobar la BD con el barbero bloqueado.
+"""
+import secrets
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import capabilities, metrics
+from .models import CustomUser, Reservation
+
+SLOT_MINUTES = 5
+ACTIVE_STATUSES = ('pending', 'confirmed', 'completed')
+
+
+class SlotUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El turno ya no está disponible.'
+    default_code = 'slot_unavailable'
+
+
+def conflict(source):
+    metrics.inc('booking_conflicts_total', metrics.labels(source=source))
+    return SlotUnavailable()
+
+
+class HoldExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'La reserva provisional caducó o no existe.'
+    default_code = 'hold_expired'
+
+
+def hold_seconds():
+    return getattr(settings, 'SLOT_HOLD_SECONDS', 300)
+
+
+def _minute(moment):
+    return int(moment.timestamp()) // 60
+
+
+def _slot_keys(barber_id, start, duration):
+    first = _minute(start) // SLOT_MINUTES * SLOT_MINUTES
+    last = _minute(start + timedelta(minutes=duration))
+    return [f'hold:slot:{barber_id}:{minute}' for minute in range(first, last, SLOT_MINUTES)]
+
+
+def _hold_key(hold_id):
+    return f'hold:{hold_id}'
+
+
+def overlaps_reservation(barber_id, start, duration, exclude_id=None):
+    """True si el barbero tiene una reserva activa que se solapa con el turno."""
+    end = start + timedelta(minutes=duration)
+    # Ninguna reserva dura más de un día: basta con mirar desde el día anterior
+    candidates = (
+        Reservation.objects
+        .filter(id_barber_id=barber_id, status__in=ACTIVE_STATUSES,
+                date__lt=end, date__gt=start - timedelta(days=1))
+        .values_list('id', 'date', 'id_service_id', 'id_service__time')
+    )
+    index = capabilities.get_index()  # Duración propia del barbero si la tiene
+    return any(
+        reservation_id != exclude_id
+        and booked + timedelta(minutes=index.duration(barber_id, service_id, minutes)) > start
+        for reservation_id, booked, service_id, minutes in candidates
+    )
+
+
+def create_hold(barber_id, service, start, owner_id):
+    """Toma el turno para ``owner_id``. Devuelve el hold o lanza SlotUnavailable."""
+    duration = capabilities.duration(barber_id, service.id, service.time)
+    if overlaps_reservation(barber_id, start, duration):
+        raise conflict('hold')
+
+    hold_id = secrets.token_urlsafe(16)
+    ttl = hold_seconds()
+    value = f'{hold_id}|{start.astimezone(dt_timezone.utc):%H:%M}'  # held_times devuelve horas UTC
+    taken = []
+    for key in _slot_keys(barber_id, start, duration):
+        if not cache.add(key, value, ttl):
+            # Otro hold tiene parte del turno: se sueltan las ranuras tomadas
+            cache.delete_many(taken)
+            raise conflict('hold')
+        taken.append(key)
+
+    expires_at = datetime.now(dt_timezone.utc) + timedelta(seconds=ttl)
+    hold = {
+        'id': hold_id,
+        'barber_id': barber_id,
+        'service_id': service.id,
+        'start': start.isoformat(),
+        'duration': duration,
+        'owner_id': owner_id,
+        'expires_at': expires_at.isoformat().replace('+00:00', 'Z'),
+    }
+    cache.set(_hold_key(hold_id), hold, ttl)
+    return hold
+
+
+def get_hold(hold_id, owner_id):
+    hold = cache.get(_hold_key(hold_id))
+    if hold is None or hold['owner_id'] != owner_id:
+        raise HoldExpired()
+    return hold
+
+
+def release_hold(hold):
+    start = datetime.fromisoformat(hold['start'])
+    keys = _slot_keys(hold['barber_id'], start, hold['duration'])
+    # Solo se borran las ranuras que siguen siendo de este hold
+    mine = [key for key, value in cache.get_many(keys).items() if value.startswith(hold['id'] + '|')]
+    cache.delete_many(mine + [_hold_key(hold['id'])])
+
+
+def confirm_hold(hold, save_reservation):
+    """
+    Convierte el hold en reserva. ``save_reservation()`` crea la reserva
+    (normalmente ``serializer.save()``) y se ejecuta con el barbero bloqueado
+    y tras comprobar que el turno sigue libre en la BD.
+    """
+    start = datetime.fromisoformat(hold['start'])
+    with transaction.atomic():
+        # Serializa las confirmaciones del mismo barbero (SELECT ... FOR UPDATE)
+        CustomUser.objects.select_for_update().filter(pk=hold['barber_id']).exists()
+        if cache.get(_hold_key(hold['id'])) is None:
+            raise HoldExpired()
+        if overlaps_reservation(hold['barber_id'], start, hold['duration']):
+            raise conflict('confirm')
+        reservation = save_reservation()
+    release_hold(hold)
+    return reservation
+
+
+def held_times(barber_id, day):
+    """Horas de inicio (HH:MM, UTC) de los holds vigentes del barbero en ``day``."""
+    start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+    keys = _slot_keys(barber_id, start, 24 * 60)
+    values = cache.get_many(keys).values()  # Una sola ida y vuelta (MGET en Redis)
+    return sorted({value.split('|', 1)[1] for value in values})
+
+
+def is_held(barber_id, start, duration, owner_hold_id=None):
+    """True si alguna ranura del turno está tomada por un hold ajeno."""
+    values = cache.get_many(_slot_keys(barber_id, start, duration)).values()
+    return any(not value.startswith(f'{owner_hold_id}|') for value in values)
+
+
+def held_intervals(intervals):
+    """Índices de los turnos ``(barbero, inicio, duración)`` con alguna ranura retenida (una sola lectura)."""
+    keys = [_slot_keys(*interval) for interval in intervals]
+    values = cache.get_many([key for slot_keys in keys for key in slot_keys])
+    return {index for index, slot_keys in enumerate(keys) if any(key in values for key in slot_keys)}
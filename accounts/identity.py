@@ -0,0 +1,134 @@
+"""
+Mapa de identidad por petición: cada objeto relacionado se lee como mucho una
+vez por petición y todos (serializadores, factories, adapters, señales)
+comparten la misma instancia.
+
+``IdentityMapMiddleware`` abre el mapa al empezar la petición y lo descarta
+al terminar; fuera de una petición (comandos, tests) ``get`` consulta la BD
+como siempre, salvo dentro de ``with identity.scope():``. El mapa vive en un
+ContextVar, así que no se comparte entre hilos ni tareas ASGI.
+
+``IdentityMapRelatedField`` sustituye a ``PrimaryKeyRelatedField`` en el
+serializador de pagos, el único camino donde la reserva se vuelve a leer
+después (adapter, flyweight, señal; ver ``manage.py bench_identity_map``):
+valida contra el mapa cuando el queryset del campo solo tiene filtros de
+igualdad (barbería, ``limit_choices_to``) que se pueden comprobar en memoria;
+si no, consulta como DRF. En reservas y horarios cada objeto relacionado ya
+se lee una sola vez y el mapa no ahorraría nada.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Model
+from django.db.models.expressions import Col
+from django.db.models.lookups import Exact
+from django.db.models.sql.where import AND
+from rest_framework import serializers
+
+_map = ContextVar('identity_map', default=None)
+
+
+@contextmanager
+def scope():
+    token = _map.set({})
+    try:
+        yield
+    finally:
+        _map.reset(token)
+
+
+def _key(model, pk):
+    return (model._meta.concrete_model._meta.label, str(pk))
+
+
+def add(*instances):
+    identity_map = _map.get()
+    if identity_map is not None:
+        for instance in instances:
+            if instance is not None and instance.pk is not None:
+                identity_map.setdefault(_key(type(instance), instance.pk), instance)
+
+
+def peek(model, pk):
+    identity_map = _map.get()
+    return None if identity_map is None else identity_map.get(_key(model, pk))
+
+
+def get(model, pk, queryset=None):
+    """Instancia con esa pk: del mapa o de ``queryset`` (por defecto el manager del modelo)."""
+    instance = peek(model, pk)
+    if instance is None:
+        instance = (queryset if queryset is not None else model._default_manager).get(pk=pk)
+        add(instance)
+    return instance
+
+
+def related(instance, name):
+    """``instance.<name>`` (FK) pasando por el mapa; None si la fila ya no existe."""
+    field = instance._meta.get_field(name)
+    if field.is_cached(instance):
+        return getattr(instance, name)
+    pk = getattr(instance, field.attname)
+    if pk is None:
+        return None
+    try:
+        value = get(field.related_model, pk)
+    except ObjectDoesNotExist:
+        return None
+    field.set_cached_value(instance, value)
+    return value
+
+
+def _matches(instance, queryset):
+    """
+    True si ``instance`` cumple los filtros de ``queryset`` y se pudo comprobar
+    en memoria; None si el filtro es más complejo que igualdades con AND.
+    """
+    where = queryset.query.where
+    if where.negated or where.connector != AND:
+        return None
+    for child in where.children:
+        if not (isinstance(child, Exact) and isinstance(child.lhs, Col) and child.lhs.alias == queryset.query.base_table):
+            return None
+        value = child.rhs
+        if hasattr(value, 'resolve_expression'):
+            return None
+        if isinstance(value, Model):
+            value = value.pk
+        if getattr(instance, child.lhs.target.attname) != value:
+            return False
+    return True
+
+
+class IdentityMapRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        queryset = self.get_queryset()
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = peek(queryset.model, data)
+        if instance is not None:
+            matches = _matches(instance, queryset)
+            if matches:
+                return instance
+            if matches is False:
+                self.fail('does_not_exist', pk_value=data)
+        try:
+            return get(queryset.model, data, queryset)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class IdentityMapMiddleware:
+    """Un mapa de identidad nuevo por petición."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with scope():
+            return self.get_response(request)
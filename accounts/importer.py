@@ -0,0 +1,213 @@
+"""
+Importación masiva desde CSV de servicios, usuarios y horarios de barberos.
+
+Las filas se leen en streaming y se procesan por lotes: cada lote se valida
+con las reglas de los serializadores existentes (las búsquedas de unicidad y
+de barberos se resuelven con una consulta por lote), las contraseñas se
+hashean en un pool de procesos y las filas válidas se insertan con
+``bulk_create`` dentro de una transacción por lote. Las filas con error no
+detienen la importación; quedan en ``errors`` con su número de línea.
+
+Columnas esperadas:
+
+* servicios: name, category, description, time, price
+* usuarios: email, first_name, last_name, role, phone_number, salary, password
+* horarios: barber_email (o id_barber), days (separados por ``|``), start_time, end_time
+"""
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from . import capabilities, search
+from .models import BarberSchedule, CustomUser, Service
+from .serializers import BarberScheduleSerializer, CustomUserSerializer, ServiceSerializer
+
+
+def _init_worker():
+    # Con el método "spawn" los procesos hijos arrancan sin Django configurado
+    django.setup()
+
+
+def _hash_password(raw):
+    return make_password(raw or None)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _clean(row):
+    """Quita espacios y convierte celdas vacías en ausentes."""
+    return {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+
+
+class _PrefetchedRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que resuelve contra un dict precargado por lote."""
+
+    def __init__(self, objects, **kwargs):
+        self.objects = objects
+        super().__init__(queryset=CustomUser.objects.none(), **kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.objects[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+class ShopImporter:
+    def __init__(self, batch_size=500, workers=None, dry_run=False, shop_id=None):
+        self.batch_size = batch_size
+        self.shop_id = shop_id
+        self.workers = workers
+        self.dry_run = dry_run
+        self.errors = []
+        self.created = {'services': 0, 'users': 0, 'schedules': 0}
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def _hash_passwords(self, passwords):
+        if len(passwords) < 8:  # Para pocos usuarios no compensa arrancar procesos
+            return [_hash_password(password) for password in passwords]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return list(self._pool.map(_hash_password, passwords, chunksize=4))
+
+    def _error(self, source, line, errors):
+        self.errors.append({'file': source, 'line': line, 'errors': errors})
+
+    def _rows(self, stream):
+        # Línea 1 es la cabecera
+        return enumerate(csv.DictReader(stream), start=2)
+
+    # Servicios
+    def import_services(self, stream, source='services.csv'):
+        for chunk in _chunks(self._rows(stream), self.batch_size):
+            valid = []
+            for line, row in chunk:
+                serializer = ServiceSerializer(data=_clean(row))
+                if not serializer.is_valid():
+                    self._error(source, line, serializer.errors)
+                    continue
+                data = dict(serializer.validated_data)
+                data['active_service'] = True  # Igual que ServiceFactory.create_service
+                valid.append(Service(**data))
+            self._save('services', valid)
+
+    # Usuarios
+    def import_users(self, stream, source='users.csv'):
+        seen = set()
+        for chunk in _chunks(self._rows(stream), self.batch_size):
+            rows = [(line, _clean(row)) for line, row in chunk]
+            emails = {row.get('email', '').lower() for _, row in rows}
+            existing = {
+                email.lower() for email in
+                CustomUser.objects.filter(email__in=emails).values_list('email', flat=True)
+            }
+
+            valid = []
+            for line, row in rows:
+                serializer = CustomUserSerializer(data=row)
+                # La unicidad del email se comprobó para todo el lote con una consulta
+                email_field = serializer.fields['email']
+                email_field.validators = [
+                    validator for validator in email_field.validators
+                    if not isinstance(validator, UniqueValidator)
+                ]
+                if not serializer.is_valid():
+                    self._error(source, line, serializer.errors)
+                    continue
+
+                data = dict(serializer.validated_data)
+                email = data['email'].lower()
+                if email in existing or email in seen:
+                    self._error(source, line, {'email': ['Ya existe un usuario con este email.']})
+                    continue
+                role = int(data.get('role', 2))
+                # Misma regla que UserPermissionsHelper.perform_create
+                if role == 1 and not data.get('salary'):
+                    self._error(source, line, {'salary': ['El salario es obligatorio para los barberos.']})
+                    continue
+                seen.add(email)
+                valid.append((data, data.pop('password', None)))
+
+            hashed = self._hash_passwords([password for _, password in valid])
+            users = []
+            for (data, _), password in zip(valid, hashed):
+                user = CustomUser(**data, password=password)
+                user.is_staff = user.role == 0  # Lo que hace CustomUser.save()
+                users.append(user)
+            self._save('users', users)
+
+    # Horarios
+    def import_schedules(self, stream, source='schedules.csv'):
+        for chunk in _chunks(self._rows(stream), self.batch_size):
+            rows = [(line, _clean(row)) for line, row in chunk]
+            emails = {row['barber_email'].lower() for _, row in rows if 'barber_email' in row}
+            ids = {row['id_barber'] for _, row in rows if 'id_barber' in row and row['id_barber'].isdigit()}
+            barbers = CustomUser.objects.filter(email__in=emails) | CustomUser.objects.filter(id__in=ids)
+            if self.shop_id is not None:
+                barbers = barbers.filter(shop_id=self.shop_id)
+            by_id = {barber.id: barber for barber in barbers}
+            by_email = {barber.email.lower(): barber.id for barber in by_id.values()}
+
+            valid = []
+            for line, row in rows:
+                if 'barber_email' in row:
+                    email = row.pop('barber_email').lower()
+                    if email not in by_email:
+                        self._error(source, line, {'barber_email': ['No existe un usuario con este email.']})
+                        continue
+                    row['id_barber'] = by_email[email]
+                if 'days' in row:
+                    row['days'] = [day.strip() for day in row['days'].split('|') if day.strip()]
+                serializer = BarberScheduleSerializer(data=row)
+                serializer.fields['id_barber'] = _PrefetchedRelatedField(by_id)
+                if not serializer.is_valid():  # Incluye validate_id_barber (rol de barbero)
+                    self._error(source, line, serializer.errors)
+                    continue
+                valid.append(BarberSchedule(**serializer.validated_data))
+            self._save('schedules', valid)
+
+    def _save(self, kind, objects):
+        if not objects or self.dry_run:
+            return
+        if self.shop_id is not None:
+            for obj in objects:
+                obj.shop_id = self.shop_id
+        with transaction.atomic():
+            model = type(objects[0])
+            created = model.objects.bulk_create(objects)
+            # bulk_create no dispara señales: nueva versión del índice de capacidades al confirmar
+            capabilities.changed()
+        # Por lo mismo, se indexan aquí para /search/
+        if kind == 'users':
+            search.bulk_index('user', created)
+        elif kind == 'services':
+            search.bulk_index('service', created)
+        self.created[kind] += len(created)
+
+    def write_report(self, stream):
+        writer = csv.writer(stream)
+        writer.writerow(['file', 'line', 'field', 'error'])
+        for error in self.errors:
+            for field, messages in error['errors'].items():
+                for message in messages:
+                    writer.writerow([error['file'], error['line'], field, message])
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve reservas completadas/canceladas (y sus pagos) más viejas que el "
+        "horizonte a las tablas de archivo, en lotes con una transacción cada uno."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Horizonte en días (por defecto RESERVATION_ARCHIVE_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta lo que se archivaría')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            horizon = timezone.now() - timedelta(days=options['days'])
+        else:
+            horizon = archive.default_horizon()
+
+        if options['dry_run']:
+            count = archive.archivable(horizon).count()
+            self.stdout.write(f'Se archivarían {count} reservas anteriores a {horizon:%Y-%m-%d}.')
+            return
+
+        total_reservations = total_payments = 0
+        while True:
+            reservations, payments = archive.archive_batch(horizon, options['batch_size'])
+            if not reservations:
+                break
+            total_reservations += reservations
+            total_payments += payments
+            self.stdout.write(f'  lote: {reservations} reservas, {payments} pagos')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archivadas {total_reservations} reservas y {total_payments} pagos '
+            f'anteriores a {horizon:%Y-%m-%d}.'
+        ))
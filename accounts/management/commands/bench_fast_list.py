@@ -0,0 +1,94 @@
+import json
+import time
+from datetime import datetime, timedelta, time as dtime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import CustomUser, BarberSchedule, Service, Reservation
+from accounts.views import ReservationViewSet, ServiceViewSet, BarberScheduleViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara filas/seg del listado con serializadores contra el listado "
+        "rápido (?fast=1) y verifica que ambos devuelvan el mismo JSON. "
+        "Los datos de prueba se crean en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Filas por endpoint')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por medición')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        with transaction.atomic():
+            admin = self._seed(rows)
+            endpoints = [
+                ('reservations', ReservationViewSet),
+                ('services', ServiceViewSet),
+                ('barber-schedules', BarberScheduleViewSet),
+            ]
+            for name, viewset in endpoints:
+                self._bench(name, viewset, admin, repeat)
+            transaction.set_rollback(True)
+
+    def _seed(self, rows):
+        admin = CustomUser.objects.create(email='bench-admin@example.com', role=0)
+        barber = CustomUser.objects.create(email='bench-barber@example.com', role=1, first_name='Bench', salary=0)
+        client = CustomUser.objects.create(email='bench-client@example.com', role=2, first_name='Client')
+        services = Service.objects.bulk_create([
+            Service(name=f'Servicio {i}', description='Benchmark', time=30, price='150.50')
+            for i in range(rows)
+        ])
+        start = timezone.make_aware(datetime(2025, 1, 6, 9, 0))
+        Reservation.objects.bulk_create([
+            Reservation(
+                id_client=client,
+                id_barber=barber if i % 10 else None,  # Algunas sin barbero asignado
+                id_service=services[i % len(services)],
+                date=start + timedelta(minutes=30 * i),
+                person_name=f'Cliente {i}',
+            )
+            for i in range(rows)
+        ])
+        BarberSchedule.objects.bulk_create([
+            BarberSchedule(id_barber=barber, days=['Lunes', 'Martes'], start_time=dtime(9), end_time=dtime(18))
+            for _ in range(rows)
+        ])
+        return admin
+
+    def _call(self, viewset, path, admin):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=admin)
+        response = viewset.as_view({'get': 'list'})(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content
+
+    def _bench(self, name, viewset, admin, repeat):
+        path = f'/{name}/'
+        slow = self._call(viewset, path, admin)
+        fast = self._call(viewset, path + '?fast=1', admin)
+        if json.loads(slow) != json.loads(fast):
+            raise CommandError(f'{name}: el listado rápido no coincide con el serializador')
+        count = len(json.loads(slow))
+
+        results = {}
+        for label, query in (('serializer', ''), ('fast', '?fast=1')):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                self._call(viewset, path + query, admin)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = count / best if best else 0
+
+        speedup = results['fast'] / results['serializer'] if results['serializer'] else 0
+        self.stdout.write(
+            f"{name:18} filas={count:6}  serializer={results['serializer']:10.0f} filas/s  "
+            f"fast={results['fast']:10.0f} filas/s  x{speedup:.1f}  (JSON idéntico)"
+        )
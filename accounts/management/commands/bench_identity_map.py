@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts import identity
+from accounts.models import BarberService, CustomUser, Service
+from accounts.views import BarberScheduleViewSet, PaymentViewSet, ReservationViewSet, UserCardViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Cuenta las consultas de los caminos de escritura (reserva, pago con "
+        "tarjeta, tarjeta, horario) con y sin el mapa de identidad por petición. "
+        "Solo el pago con tarjeta usa el mapa; los demás caminos sirven de control. "
+        "Todo corre en una transacción que se revierte."
+    )
+
+    def handle(self, *args, **options):
+        results = []
+        for enabled in (False, True):
+            with transaction.atomic():
+                results.append(self._measure(enabled))
+                transaction.set_rollback(True)
+
+        without, with_map = results
+        self.stdout.write(f'  {"camino":<14} {"sin mapa":>9} {"con mapa":>9} {"ahorro":>7}')
+        for label in without:
+            before, after = without[label], with_map[label]
+            self.stdout.write(f'  {label:<14} {before:>9} {after:>9} {before - after:>7}')
+        total_before, total_after = sum(without.values()), sum(with_map.values())
+        self.stdout.write(f'  {"TOTAL":<14} {total_before:>9} {total_after:>9} {total_before - total_after:>7}')
+
+    def _measure(self, enabled):
+        admin = CustomUser.objects.create(email='bench-identity-admin@example.com', role=0)
+        barber = CustomUser.objects.create(email='bench-identity-barber@example.com', role=1, first_name='Barbero')
+        client = CustomUser.objects.create(email='bench-identity-client@example.com', role=2)
+        service = Service.objects.create(name='Corte', description='Benchmark', time=30, price='100.00')
+        # Si ya hay capacidades configuradas, el barbero del benchmark necesita la suya
+        BarberService.objects.create(barber=barber, service=service)
+
+        counts = {}
+        reservation = self._post(counts, 'reserva', enabled, ReservationViewSet, client, {
+            'id_barber': barber.id, 'id_service': service.id, 'date': '2030-01-07T10:00:00Z',
+        })
+        self._post(counts, 'pago tarjeta', enabled, PaymentViewSet, client, {
+            'reservation': reservation['id'], 'method': 'card', 'save_card': True,
+            'card_number': '4111111111111111', 'expiration_month': '12', 'expiration_year': '2030',
+        })
+        self._post(counts, 'tarjeta', enabled, UserCardViewSet, client, {
+            'card_number': '4111111111111111', 'expiration_month': '12', 'expiration_year': '2030',
+        })
+        self._post(counts, 'horario', enabled, BarberScheduleViewSet, admin, {
+            'id_barber': barber.id, 'days': ['Lunes'], 'start_time': '09:00', 'end_time': '18:00',
+        })
+        return counts
+
+    def _post(self, counts, label, enabled, viewset, user, data):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, user=user)
+        view = viewset.as_view({'post': 'create'})
+        with CaptureQueriesContext(connection) as queries:
+            if enabled:
+                with identity.scope():  # Lo que hace IdentityMapMiddleware
+                    response = view(request)
+            else:
+                response = view(request)
+        if response.status_code >= 400:
+            self.stderr.write(f'{label}: {response.status_code} {response.data}')
+        counts[label] = len(queries)
+        return response.data
@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.views.decorators.csrf import csrf_exempt
+
+from accounts.models import Service
+from backend.middleware import RouteMiddlewareDispatcher
+
+DISPATCHER = 'backend.middleware.RouteMiddlewareDispatcher'
+
+
+@csrf_exempt  # Como las vistas de DRF
+def _empty_view(request):
+    return HttpResponse(b'{}', content_type='application/json')
+
+
+class Command(BaseCommand):
+    help = (
+        "Costo por petición de sesión, CSRF, auth, mensajes y clickjacking "
+        "(WEB_MIDDLEWARE) en las rutas de la API: primero la capa sola sobre "
+        "una vista vacía, después peticiones completas con la pila de "
+        "MIDDLEWARE de siempre contra el despacho por ruta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Peticiones por medición')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones (se toma la mejor)')
+        parser.add_argument('--path', action='append', dest='paths', help='Ruta a medir (repetible)')
+
+    def handle(self, *args, **options):
+        if DISPATCHER not in settings.MIDDLEWARE:
+            self.stdout.write(self.style.WARNING(f'{DISPATCHER} no está en MIDDLEWARE: nada que comparar.'))
+            return
+        count, repeat = options['requests'], options['repeat']
+        factory = RequestFactory(HTTP_HOST='localhost')
+
+        # 1. Solo la capa: lo que cada petición a la API deja de pagar
+        dispatcher = RouteMiddlewareDispatcher(_empty_view)
+
+        def full_layer(request):
+            for process_view in dispatcher._view_middleware:
+                process_view(request, _empty_view, (), {})
+            return dispatcher.web_handler(request)
+
+        def routed_layer(request):
+            dispatcher.process_view(request, _empty_view, (), {})
+            return dispatcher(request)
+
+        layer = {
+            name: self._measure(function, factory, '/reservations/', count, repeat)
+            for name, function in (('completa', full_layer), ('por ruta', routed_layer))
+        }
+        saved = layer['completa'] - layer['por ruta']
+        self.stdout.write(self.style.MIGRATE_HEADING('Capa WEB_MIDDLEWARE sobre una vista vacía (ruta de la API)'))
+        self.stdout.write(f'  completa {layer["completa"]:8.1f}µs   por ruta {layer["por ruta"]:8.1f}µs   ahorro {saved:8.1f}µs')
+
+        # 2. Peticiones completas (resolver, DRF, vista y el resto de MIDDLEWARE)
+        index = settings.MIDDLEWARE.index(DISPATCHER)
+        full = settings.MIDDLEWARE[:index] + list(settings.WEB_MIDDLEWARE) + settings.MIDDLEWARE[index + 1:]
+        handlers = {'completa': self._handler(full), 'por ruta': self._handler(settings.MIDDLEWARE)}
+        web_paths, web_prefixes = set(settings.WEB_ROUTE_PATHS), tuple(settings.WEB_ROUTE_PREFIXES)
+
+        with transaction.atomic():
+            Service.objects.bulk_create([
+                Service(name=f'Servicio {i}', description='Benchmark', time=30, price='100.00') for i in range(10)
+            ])
+            self.stdout.write(self.style.MIGRATE_HEADING('Peticiones completas'))
+            self.stdout.write(f'  {"ruta":<20} {"tipo":<5} {"completa":>10} {"por ruta":>10} {"ahorro":>10}')
+            for path in options['paths'] or ['/reservations/', '/services/', '/logout/']:
+                timings = {
+                    name: self._measure(handler.get_response, factory, path, count, repeat)
+                    for name, handler in handlers.items()
+                }
+                kind = 'web' if path in web_paths or path.startswith(web_prefixes) else 'api'
+                saved = timings['completa'] - timings['por ruta']
+                self.stdout.write(
+                    f'  {path:<20} {kind:<5} {timings["completa"]:8.1f}µs {timings["por ruta"]:8.1f}µs '
+                    f'{saved:8.1f}µs ({saved / timings["completa"]:.0%})')
+            transaction.set_rollback(True)
+
+    def _handler(self, middleware):
+        with override_settings(MIDDLEWARE=middleware):
+            handler = BaseHandler()
+            handler.load_middleware()
+        return handler
+
+    def _measure(self, function, factory, path, count, repeat):
+        function(factory.get(path))  # Calienta resolver, plantillas y cachés
+        best = None
+        for _ in range(repeat):
+            requests = [factory.get(path) for _ in range(count)]  # Fuera del tiempo medido
+            start = time.perf_counter()
+            for request in requests:
+                function(request)
+            elapsed = (time.perf_counter() - start) / count * 1e6
+            best = elapsed if best is None else min(best, elapsed)
+        return best
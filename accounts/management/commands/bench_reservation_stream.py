@@ -0,0 +1,72 @@
+import asyncio
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from accounts.realtime import InProcessBackend, serve
+
+
+class Command(BaseCommand):
+    help = (
+        "Abre N conexiones SSE inactivas contra el pub/sub en proceso y mide "
+        "memoria por suscriptor, CPU en reposo y latencia de fan-out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=1000)
+        parser.add_argument('--barbers', type=int, default=50, help='Barberos entre los que se reparten')
+        parser.add_argument('--idle', type=float, default=2.0, help='Segundos en reposo a medir')
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options['subscribers'], options['barbers'], options['idle']))
+
+    async def _run(self, subscribers, barbers, idle):
+        backend = InProcessBackend()
+        disconnected = asyncio.Event()
+        received = []
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            body = message.get('body', b'')
+            if body.startswith(b'id:'):
+                received.append(time.perf_counter())
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(serve({f'barber:{i % barbers}'}, receive, send, backend=backend))
+            for i in range(subscribers)
+        ]
+        while backend.subscriber_count() < subscribers:
+            await asyncio.sleep(0)
+        connect_time = time.perf_counter() - started
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        cpu_before = time.process_time()
+        await asyncio.sleep(idle)
+        idle_cpu = time.process_time() - cpu_before
+
+        # Un evento para un barbero: solo despierta a sus suscriptores
+        event = {'event': 'created', 'reservation': {'id': 1, 'status': 'pending'}}
+        expected = len(range(0, subscribers, barbers))
+        published = time.perf_counter()
+        backend.publish(event, {'barber:0'})
+        while len(received) < expected:
+            await asyncio.sleep(0)
+        targeted = received[-1] - published
+
+        disconnected.set()
+        await asyncio.gather(*tasks)
+
+        self.stdout.write(f'suscriptores:            {subscribers}')
+        self.stdout.write(f'conexión de todos:       {connect_time * 1000:.1f} ms')
+        self.stdout.write(f'memoria por suscriptor:  {(after - before) / subscribers / 1024:.2f} KiB')
+        self.stdout.write(f'CPU en reposo ({idle:.0f}s):     {idle_cpu * 1000:.1f} ms')
+        self.stdout.write(f'fan-out a {expected} suscriptores: {targeted * 1000:.2f} ms')
+        self.stdout.write(f'suscriptores tras cerrar: {backend.subscriber_count()}')
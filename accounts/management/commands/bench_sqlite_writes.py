@@ -0,0 +1,117 @@
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser, Reservation, Service
+
+PROFILES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}},
+    'production': {'ENGINE': 'backend.sqlite', 'OPTIONS': settings.SQLITE_PRODUCTION_OPTIONS},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Reservas concurrentes contra un archivo SQLite temporal con la "
+        "configuración de fábrica y con el perfil de producción (backend.sqlite): "
+        "reservas confirmadas por segundo, latencia y errores 'database is locked'. "
+        "Cada operación es como confirm_hold: transacción que lee y después "
+        "inserta, más un UPDATE suelto en autocommit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Hilos escribiendo a la vez')
+        parser.add_argument('--ops', type=int, default=200, help='Reservas por hilo')
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES), help='Perfil a medir (repetible)')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['ops'] < 1:
+            raise CommandError('--threads y --ops deben ser positivos.')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{options["threads"]} hilos x {options["ops"]} reservas'))
+        self.stdout.write(f'  {"perfil":<12} {"reservas/s":>11} {"p50 ms":>9} {"p95 ms":>9} {"errores":>8}')
+        results = {}
+        for profile in options['profile'] or ['default', 'production']:
+            with tempfile.TemporaryDirectory() as directory:
+                results[profile] = self._run(profile, Path(directory) / 'bench.sqlite3', options['threads'], options['ops'])
+            throughput, latencies, errors = results[profile]
+            p50 = statistics.median(latencies) if latencies else 0
+            p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else p50
+            self.stdout.write(f'  {profile:<12} {throughput:11.1f} {p50:9.2f} {p95:9.2f} {errors:8d}')
+        if {'default', 'production'} <= results.keys() and results['default'][0]:
+            gain = results['production'][0] / results['default'][0]
+            self.stdout.write(self.style.SUCCESS(f'Producción: {gain:.1f}x reservas/s'))
+
+    def _run(self, profile, path, threads, ops):
+        alias = f'bench_sqlite_{profile}'
+        connections.settings[alias] = {
+            **connections['default'].settings_dict, **PROFILES[profile], 'NAME': str(path), 'TEST': {}}
+        try:
+            barber_id, client_id, service_id = self._setup(alias)
+            opening = timezone.make_aware(datetime(2030, 1, 7, 8))
+            latencies, errors = [], []
+            start_gate = threading.Barrier(threads + 1)
+
+            def worker(index):
+                mine, failures = [], 0
+                start_gate.wait()
+                try:
+                    for op in range(ops):
+                        date = opening + timedelta(minutes=index * ops + op)
+                        began = time.perf_counter()
+                        try:
+                            self._book(alias, barber_id, client_id, service_id, date)
+                        except DatabaseError:
+                            failures += 1
+                            continue
+                        mine.append((time.perf_counter() - began) * 1000)
+                finally:
+                    connections[alias].close()
+                latencies.extend(mine)
+                errors.append(failures)
+
+            workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+            for thread in workers:
+                thread.start()
+            start_gate.wait()
+            began = time.perf_counter()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - began
+            return len(latencies) / elapsed, latencies, sum(errors)
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+
+    def _setup(self, alias):
+        with connections[alias].schema_editor() as editor:
+            for model in apps.get_models():
+                if model._meta.managed and not model._meta.proxy:
+                    editor.create_model(model)
+        # bulk_create no dispara señales: la auditoría y el índice de búsqueda usan la BD default
+        barber, client = CustomUser.objects.using(alias).bulk_create([
+            CustomUser(email='bench-sqlite-barber@example.com', role=1, first_name='Barbero'),
+            CustomUser(email='bench-sqlite-client@example.com', role=2, first_name='Cliente'),
+        ])
+        service, = Service.objects.using(alias).bulk_create([
+            Service(name='Corte', description='Benchmark', time=30, price='100.00')])
+        return barber.id, client.id, service.id
+
+    def _book(self, alias, barber_id, client_id, service_id, date):
+        with transaction.atomic(using=alias):
+            # Mismo patrón que confirm_hold: leer el barbero y el turno, después insertar
+            CustomUser.objects.using(alias).filter(pk=barber_id).exists()
+            if Reservation.objects.using(alias).filter(id_barber_id=barber_id, date=date).exists():
+                return
+            reservation, = Reservation.objects.using(alias).bulk_create([
+                Reservation(id_client_id=client_id, id_barber_id=barber_id, id_service_id=service_id, date=date)])
+        Reservation.objects.using(alias).filter(pk=reservation.pk).update(status='confirmed')
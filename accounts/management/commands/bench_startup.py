@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Se ejecuta en un proceso nuevo por medición: arranque en frío real
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+t1 = time.perf_counter()
+application = get_wsgi_application()  # django.setup() + carga de middleware
+t2 = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+
+def request(url):
+    path, _, query = url.partition('?')
+    environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': 'localhost'}
+    setup_testing_defaults(environ)
+    status = []
+    start = time.perf_counter()
+    body = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    b''.join(body)
+    return time.perf_counter() - start, status[0].split()[0]
+
+first, status = request(sys.argv[1])
+second, _ = request(sys.argv[1])
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'setup_ms': (t2 - t1) * 1000,
+    'first_request_ms': first * 1000,
+    'second_request_ms': second * 1000,
+    'status': status,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def _top_packages(importtime_output, top):
+    """Suma el tiempo propio de -X importtime por paquete de primer nivel."""
+    totals = defaultdict(int)
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en frío de un worker: import de Django, setup, "
+        "primera y segunda petición, para uno o varios módulos de settings."
+    )
+    requires_system_checks = []  # Los checks cargarían las URLs en este proceso; no hace falta
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', action='append', dest='modules',
+                            help='Módulo de settings a medir (repetible). Por defecto el actual y backend.settings_api')
+        parser.add_argument('--path', default='/search/?q=ab', help='Ruta de la primera petición (por defecto no toca la BD)')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=8, help='Paquetes más lentos de importar a mostrar')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or [os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'), 'backend.settings_api']
+        results = {}
+        for module in dict.fromkeys(modules):
+            results[module] = self.measure(module, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for module, result in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{module}  (mediana de {options["runs"]} arranques)'))
+            for key in ('process_ms', 'import_ms', 'setup_ms', 'first_request_ms', 'second_request_ms'):
+                self.stdout.write(f'  {key:<18} {result[key]:9.1f}')
+            self.stdout.write(f'  {"modules":<18} {result["modules"]:9d}   status {result["status"]}')
+            self.stdout.write('  import más lento (ms propios):')
+            for name, micros in result['top_imports']:
+                self.stdout.write(f'    {name:<24} {micros / 1000:7.1f}')
+
+    def measure(self, module, options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module, 'PYTHONDONTWRITEBYTECODE': '1'}
+        samples = []
+        importtime = ''
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', PROBE, options['path']],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            if proc.returncode != 0:
+                self.stderr.write(proc.stderr[-2000:])
+                raise SystemExit(f'El arranque con {module} falló.')
+            sample = json.loads(proc.stdout.strip().splitlines()[-1])
+            sample['process_ms'] = elapsed
+            samples.append(sample)
+            importtime = proc.stderr
+
+        result = {
+            key: statistics.median(sample[key] for sample in samples)
+            for key in ('process_ms', 'import_ms', 'setup_ms', 'first_request_ms', 'second_request_ms')
+        }
+        result['modules'] = samples[-1]['modules']
+        result['status'] = samples[-1]['status']
+        result['top_imports'] = _top_packages(importtime, options['top'])
+        return result
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmarks de serializadores, flyweights, adapters y horas_ocupadas "
+        "con varios tamaños. Compara con la línea base guardada y termina con "
+        "error si algún caso empeora más que --threshold y más que --noise-floor; "
+        "con una línea base de otra máquina la comparación es solo informativa. "
+        "Los datos de prueba se crean en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(map(str, benchmarks.SIZES)), help='Tamaños de entrada, p. ej. 10,100,1000')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por medición')
+        parser.add_argument('--only', action='append', help='Solo los casos con este prefijo (repetible)')
+        parser.add_argument('--output', help='Guarda los resultados en este JSON')
+        parser.add_argument('--baseline', help='Línea base (por defecto BENCH_BASELINE)')
+        parser.add_argument('--save-baseline', action='store_true', help='Reemplaza la línea base con estos resultados')
+        parser.add_argument('--threshold', type=float, default=benchmarks.DEFAULT_THRESHOLD,
+                            help='Empeoramiento tolerado, p. ej. 0.25 = 25 %%')
+        parser.add_argument('--noise-floor', type=float, default=benchmarks.DEFAULT_NOISE_FLOOR_MS,
+                            help='Diferencia absoluta en ms que nunca es regresión')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = tuple(sorted({int(size) for size in options['sizes'].split(',')}))
+        except ValueError:
+            raise CommandError('--sizes debe ser una lista de enteros separada por comas.')
+        if not sizes or min(sizes) < 1:
+            raise CommandError('--sizes debe tener tamaños positivos.')
+        unknown = [prefix for prefix in options['only'] or () if not any(name.startswith(prefix) for name in benchmarks.CASES)]
+        if unknown:
+            raise CommandError(f'Casos desconocidos: {", ".join(unknown)}. Disponibles: {", ".join(benchmarks.CASES)}')
+
+        with transaction.atomic():
+            document = benchmarks.run(sizes, options['repeat'], options['only'])
+            transaction.set_rollback(True)
+
+        if options['output']:
+            benchmarks.save(document, Path(options['output']))
+        baseline = Path(options['baseline']) if options['baseline'] else Path(benchmarks.baseline_path())
+        if options['save_baseline']:
+            benchmarks.save(document, baseline)
+            self._print_results(document)
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {baseline}'))
+            return
+
+        if not baseline.exists():
+            self._print_results(document)
+            self.stdout.write(self.style.WARNING(f'Sin línea base en {baseline}; créala con --save-baseline.'))
+            return
+
+        previous = benchmarks.load(baseline)
+        rows = benchmarks.compare(document, previous, options['threshold'], options['noise_floor'])
+        self._print_comparison(rows, options['threshold'], options['noise_floor'])
+        if not benchmarks.same_host(previous):
+            self.stdout.write(self.style.WARNING(
+                f'La línea base es de otra máquina ({previous.get("meta", {}).get("host", "desconocida")}): '
+                f'comparación solo informativa. Genera la de esta máquina con --save-baseline.'))
+            return
+        regressions = [row[0] for row in rows if row[4] == 'regression']
+        if regressions:
+            raise CommandError(f'{len(regressions)} casos empeoraron más de {options["threshold"]:.0%}: {", ".join(regressions)}')
+
+    def _print_results(self, document):
+        for key, result in document['results'].items():
+            if 'error' in result:
+                self.stdout.write(f'  {key:<36} {self.style.ERROR(result["error"])}')
+            else:
+                self.stdout.write(
+                    f'  {key:<36} mejor {result["best_ms"]:10.3f} ms  mediana {result["median_ms"]:10.3f} ms  '
+                    f'{result["per_item_us"]:9.2f} µs/elemento')
+
+    def _print_comparison(self, rows, threshold, noise_floor):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{"caso":<36} {"base ms":>10} {"actual ms":>10} {"cambio":>8}'))
+        styles = {'regression': self.style.ERROR, 'improvement': self.style.SUCCESS, 'error': self.style.ERROR}
+        for key, before, current, change, state in rows:
+            before_text = f'{before:10.3f}' if before is not None else f'{"-":>10}'
+            current_text = f'{current:10.3f}' if current is not None else f'{"-":>10}'
+            change_text = f'{change:+8.1%}' if change is not None else f'{"":>8}'
+            label = {'regression': 'REGRESIÓN', 'improvement': 'mejora', 'new': 'nuevo', 'error': 'error'}.get(state, '')
+            self.stdout.write(f'{key:<36} {before_text} {current_text} {change_text}  ' + styles.get(state, str)(label))
+        self.stdout.write(f'Umbral: ±{threshold:.0%} sobre el mejor tiempo por llamada y más de {noise_floor:g} ms.')
@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.throttling import TokenBucketThrottle, _redis_client
+
+
+class BenchThrottle(TokenBucketThrottle):
+    scope = 'bench'
+    kinds = ('ip', 'identity')
+
+
+class Command(BaseCommand):
+    help = "Mide el costo por petición del throttle token bucket sobre la caché configurada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=100, help='IPs distintas')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        clients = options['clients']
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(clients):
+            request = Request(factory.post('/', {'email': f'cliente{i}@example.com'},
+                                           REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'), parsers=[MultiPartParser()])
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        throttle = BenchThrottle()
+        throttle.rates = {'ip': f'{total}/s', 'identity': f'{total}/s'}  # Sin rechazos: se mide solo el costo
+
+        started = time.perf_counter()
+        for i in range(total):
+            requests[i % clients]  # Mismo trabajo de bucle sin throttle
+        baseline = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(total):
+            throttle.allow_request(requests[i % clients], None)
+        elapsed = time.perf_counter() - started - baseline
+
+        backend = 'redis (EVALSHA)' if _redis_client() is not None else type(caches['default']).__name__
+        self.stdout.write(f'caché:                 {backend}')
+        self.stdout.write(f'peticiones:            {total}')
+        self.stdout.write(f'costo por petición:    {elapsed / total * 1e6:.1f} µs (IP + identidad en una llamada)')
+
+        # Comprobación de las cubetas: capacidad 5 por IP, sin recarga apreciable
+        throttle.rates = {'ip': '5/d', 'identity': '100/d'}
+        cache.delete_many([throttle.get_cache_key(requests[0], kind) for kind in throttle.kinds])
+        results = [throttle.allow_request(requests[0], None) for _ in range(7)]
+        self.stdout.write(f'cubeta 5/d, 7 intentos: {results}  espera={throttle.wait():.0f}s')
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from accounts import explain
+
+
+class Command(BaseCommand):
+    help = (
+        "Pide el plan de ejecución de las consultas de los viewsets (por rol y "
+        "filtro), horas_ocupadas, las vistas de correo y los changelists del "
+        "admin sobre datos sembrados en una transacción que se revierte. Informa "
+        "recorridos completos, B-trees temporales e índices candidatos, y "
+        "termina con error si aparece un hallazgo que no está en la línea base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', help='Solo las sondas con este prefijo (repetible)')
+        parser.add_argument('--baseline', help='Línea base (por defecto EXPLAIN_BASELINE)')
+        parser.add_argument('--save-baseline', action='store_true', help='Guarda los hallazgos actuales como línea base de este motor')
+        parser.add_argument('--sql', action='store_true', help='Muestra el SQL de cada hallazgo')
+        parser.add_argument('--reservations', type=int, default=200, help='Reservas sembradas')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'explain_audit solo entiende los planes de SQLite y PostgreSQL, no de {connection.vendor}.')
+        if options['only'] and options['save_baseline']:
+            raise CommandError('--save-baseline necesita todas las sondas (sin --only).')
+
+        with transaction.atomic():
+            seed = explain.Seed(options['reservations'])
+            report, counts = explain.audit(seed)
+            transaction.set_rollback(True)
+        if options['only']:
+            report = {name: findings for name, findings in report.items()
+                      if any(name.startswith(prefix) for prefix in options['only'])}
+
+        self._print_report(report, counts, options['sql'])
+        errors = [name for name, findings in report.items() if any('error' in finding for finding in findings)]
+
+        baseline = Path(options['baseline']) if options['baseline'] else Path(explain.baseline_path())
+        if options['save_baseline']:
+            explain.save(report, baseline)
+            self.stdout.write(self.style.SUCCESS(f'Línea base de {connection.vendor} guardada en {baseline}'))
+            return
+
+        result = explain.compare(report, explain.load(baseline))
+        if result is None:
+            self.stdout.write(self.style.WARNING(
+                f'Sin línea base de {connection.vendor} en {baseline}; créala con --save-baseline.'))
+        else:
+            new, fixed = result
+            if options['only']:
+                fixed = [key for key in fixed if any(key.startswith(prefix) for prefix in options['only'])]
+            for key in fixed:
+                self.stdout.write(self.style.SUCCESS(f'Resuelto: {key}'))
+            if new:
+                raise CommandError(f'{len(new)} hallazgos nuevos respecto a la línea base:\n  ' + '\n  '.join(new))
+        if errors:
+            raise CommandError(f'Sondas con error: {", ".join(errors)}')
+        self.stdout.write(self.style.SUCCESS('Sin recorridos nuevos.'))
+
+    def _print_report(self, report, counts, show_sql):
+        labels = {explain.FULL_SCAN: 'RECORRIDO COMPLETO', explain.INDEX_SCAN: 'recorrido de índice',
+                  explain.TEMP_BTREE: 'B-tree temporal'}
+        for name, findings in report.items():
+            queries = f'{counts[name]:>4} consultas' if name in counts else ''
+            if not findings:
+                self.stdout.write(f'{name:<48} {queries}  {self.style.SUCCESS("ok")}')
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name:<48} {queries}'))
+            for finding in findings:
+                if 'error' in finding:
+                    self.stdout.write(f'  {self.style.ERROR(finding["error"])}')
+                    continue
+                style = self.style.ERROR if finding['kind'] == explain.FULL_SCAN else self.style.WARNING
+                self.stdout.write(f'  {style(labels[finding["kind"]])} {finding["table"]}: {finding["detail"]}')
+                if finding['candidate']:
+                    self.stdout.write(f'    índice candidato: {finding["candidate"]}')
+                if show_sql:
+                    self.stdout.write(f'    {finding["sql"]}')
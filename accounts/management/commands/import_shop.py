@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importer import ShopImporter
+from accounts.models import Shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa servicios, usuarios y horarios de barberos desde CSV. Las filas "
+        "se validan con las reglas de los serializadores y se insertan por lotes; "
+        "las filas con error se listan en el reporte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', help='CSV de servicios')
+        parser.add_argument('--users', help='CSV de usuarios')
+        parser.add_argument('--schedules', help='CSV de horarios (después de usuarios)')
+        parser.add_argument('--shop', help='Slug de la barbería a la que pertenecen las filas')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Procesos para hashear contraseñas (por defecto, uno por CPU)')
+        parser.add_argument('--report', help='Escribe el reporte de errores por fila en este CSV')
+        parser.add_argument('--dry-run', action='store_true', help='Solo valida, no inserta nada')
+
+    def handle(self, *args, **options):
+        # Orden fijo: los horarios pueden referirse a barberos del CSV de usuarios
+        steps = [
+            ('services', 'import_services'),
+            ('users', 'import_users'),
+            ('schedules', 'import_schedules'),
+        ]
+        if not any(options[kind] for kind, _ in steps):
+            raise CommandError('Indica al menos uno de --services, --users o --schedules.')
+
+        shop_id = None
+        if options['shop']:
+            shop_id = Shop.objects.filter(slug=options['shop']).values_list('id', flat=True).first()
+            if shop_id is None:
+                raise CommandError(f"No existe la barbería {options['shop']}.")
+
+        with ShopImporter(options['batch_size'], options['workers'], options['dry_run'], shop_id) as importer:
+            for kind, method in steps:
+                path = options[kind]
+                if not path:
+                    continue
+                try:
+                    # utf-8-sig: los CSV exportados desde Excel traen BOM
+                    with open(path, newline='', encoding='utf-8-sig') as stream:
+                        getattr(importer, method)(stream, source=path)
+                except OSError as exc:
+                    raise CommandError(f'No se pudo leer {path}: {exc}')
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as stream:
+                importer.write_report(stream)
+        else:
+            for error in importer.errors[:20]:
+                self.stdout.write(self.style.WARNING(
+                    f"  {error['file']}:{error['line']} {error['errors']}"
+                ))
+
+        created = importer.created
+        summary = (
+            f"{created['services']} servicios, {created['users']} usuarios, "
+            f"{created['schedules']} horarios; {len(importer.errors)} filas con error."
+        )
+        if options['dry_run']:
+            self.stdout.write(f'Validación sin cambios: {len(importer.errors)} filas con error.')
+        elif importer.errors:
+            self.stdout.write(self.style.WARNING(f'Importados {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Importados {summary}'))
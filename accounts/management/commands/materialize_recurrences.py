@@ -0,0 +1,33 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import recurrence
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea las reservas de las citas fijas hasta el horizonte "
+        "(RECURRENCE_HORIZON_DAYS). Solo recorre las reglas que se quedaron "
+        "por detrás; pensado para ejecutarse a diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon-days', type=int, default=None,
+                            help='Días hacia adelante (por defecto RECURRENCE_HORIZON_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Reglas por lote (una transacción cada uno)')
+
+    def handle(self, *args, **options):
+        horizon = None
+        if options['horizon_days'] is not None:
+            horizon = timezone.localdate() + timedelta(days=options['horizon_days'])
+
+        start = time.perf_counter()
+        totals = recurrence.materialize(horizon=horizon, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['rules']} citas fijas revisadas: {totals['created']} reservas creadas, "
+            f"{totals['skipped']} ocurrencias saltadas por turno ocupado ({elapsed:.2f} s)."
+        ))
@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts import payroll
+from accounts.models import Shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula la nómina mensual de los barberos (salario base + comisión "
+        "sobre reservas completadas, descontando la comisión de tarjeta). "
+        "Repetirla es seguro: un mes abierto se recalcula y uno cerrado no se toca."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Mes YYYY-MM (por defecto el mes anterior)')
+        parser.add_argument('--through', help='Último mes YYYY-MM: calcula de --month a --through')
+        parser.add_argument('--shop', help='Slug de la barbería (por defecto todas por separado)')
+        parser.add_argument('--commission-rate', help='Comisión del barbero, p. ej. 0.35 (por defecto PAYROLL_COMMISSION_RATE)')
+        parser.add_argument('--close', action='store_true', help='Cierra el mes al terminar (ya no se recalcula)')
+        parser.add_argument('--reopen', action='store_true', help='Reabre el mes cerrado y lo recalcula')
+
+    def handle(self, *args, **options):
+        first = self._month(options['month']) if options['month'] else payroll.month_start(
+            payroll.month_start(timezone.localdate()) - timedelta(days=1))
+        last = self._month(options['through']) if options['through'] else first
+        if last < first:
+            raise CommandError('--through debe ser posterior a --month.')
+
+        rate = None
+        if options['commission_rate']:
+            try:
+                rate = Decimal(options['commission_rate'])
+            except InvalidOperation:
+                raise CommandError('--commission-rate debe ser un número decimal.')
+
+        if options['shop']:
+            shop_id = Shop.objects.filter(slug=options['shop']).values_list('id', flat=True).first()
+            if shop_id is None:
+                raise CommandError(f"No existe la barbería {options['shop']}.")
+            shops = [shop_id]
+        else:
+            shops = list(Shop.objects.filter(is_active=True).values_list('id', flat=True)) or [None]
+
+        period = first
+        while period <= last:
+            for shop_id in shops:
+                if options['reopen']:
+                    payroll.reopen(period, shop_id)
+                try:
+                    run, computed = payroll.run_payroll(period, shop_id, close=options['close'], commission_rate=rate)
+                except payroll.PayrollClosed as error:
+                    raise CommandError(str(error))
+                self._print(run, computed)
+            period = payroll.month_start(period + timedelta(days=32))
+
+    def _month(self, value):
+        try:
+            year, month = (int(part) for part in value.split('-'))
+            return date(year, month, 1)
+        except ValueError:
+            raise CommandError(f'Mes inválido: {value} (formato YYYY-MM)')
+
+    def _print(self, run, computed):
+        shop = f'barbería {run.shop_id}' if run.shop_id else 'todas las barberías'
+        state = 'recalculada' if computed else 'cerrada, sin cambios'
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Nómina {run.period:%Y-%m} · {shop} · {state} · comisión {run.commission_rate:.2%}'))
+        for line in run.lines.order_by('barber_email'):
+            self.stdout.write(
+                f'  {line.barber_email:<32} base {line.base_salary:>10}  reservas {line.reservations:>4}  '
+                f'cobrado {line.gross_sales:>10}  tarjeta -{line.card_fees:>7}  comisión {line.commission:>9}  '
+                f'total {line.total:>10}'
+            )
+        self.stdout.write(f'  {"TOTAL":<32} {run.total:>10}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las lápidas de /sync/ más viejas que SYNC_TOMBSTONE_DAYS. Los "
+        "clientes con un token anterior reciben una sincronización completa."
+    )
+
+    def handle(self, *args, **options):
+        deleted = sync.purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} lápidas borradas.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounts import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea las estructuras del motor (FTS5 / pg_trgm) y reconstruye el índice de /search/. "
+        "Con --prune solo borra las reservas que salieron de la ventana (p. ej. cada noche)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prune', action='store_true',
+                            help='Solo borra las entradas de reservas más viejas que SEARCH_RESERVATION_DAYS')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            deleted = search.prune_stale()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} reservas viejas quitadas del índice de búsqueda.'))
+            return
+        search.ensure_backend()
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {count} entradas.'))
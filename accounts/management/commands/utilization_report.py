@@ -0,0 +1,131 @@
+import json
+import random
+import time
+from datetime import date, datetime, timedelta, time as dtime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from accounts import utilization
+from accounts.models import BarberSchedule, CustomUser, Reservation, Service, Shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Ocupación por barbero, día de la semana y franja de 15 minutos en un "
+        "rango de fechas. Con --bench genera un año de reservas sintéticas "
+        "(en una transacción que se revierte) y mide el cálculo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Fecha inicial YYYY-MM-DD (por defecto hace 30 días)')
+        parser.add_argument('--to', dest='date_to', help='Fecha final YYYY-MM-DD (por defecto hoy)')
+        parser.add_argument('--barber', type=int, action='append', dest='barbers', help='Id de barbero (repetible)')
+        parser.add_argument('--shop', help='Slug de la barbería')
+        parser.add_argument('--json', action='store_true', help='Informe completo (con el mapa) en JSON')
+        parser.add_argument('--bench', action='store_true', help='Mide el cálculo con datos sintéticos')
+        parser.add_argument('--barbers-count', type=int, default=50, help='Barberos sintéticos para --bench')
+        parser.add_argument('--per-day', type=int, default=12, help='Reservas por barbero y día para --bench')
+
+    def handle(self, *args, **options):
+        if options['bench']:
+            return self.bench(options)
+
+        today = timezone.localdate()
+        date_from = self._date(options['date_from'], today - timedelta(days=30))
+        date_to = self._date(options['date_to'], today)
+        if date_to < date_from:
+            raise CommandError('--to debe ser posterior a --from.')
+
+        shop_id = None
+        if options['shop']:
+            shop_id = Shop.objects.filter(slug=options['shop']).values_list('id', flat=True).first()
+            if shop_id is None:
+                raise CommandError(f"No existe la barbería {options['shop']}.")
+
+        data = utilization.report(date_from, date_to, options['barbers'], shop_id)
+        if options['json']:
+            self.stdout.write(json.dumps(data, ensure_ascii=False))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Ocupación {date_from} → {date_to}'))
+        self.stdout.write(f'  {"barbero":<24} {"total":>6}  ' + ' '.join(f'{day[:3]:>5}' for day in utilization.WEEKDAYS))
+        for barber in data['barbers']:
+            cells = ' '.join(self._pct(value) for value in barber['by_weekday'])
+            label = f'{barber["id"]} {barber["name"]}'[:24]
+            line = f'  {label:<24} {self._pct(barber["utilization"]):>6}  {cells}'
+            if barber['minutes_outside_schedule']:
+                line += f'   ({barber["minutes_outside_schedule"]} min fuera de horario)'
+            self.stdout.write(line)
+
+    def _date(self, value, default):
+        if not value:
+            return default
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Fecha inválida: {value}')
+        return parsed
+
+    def _pct(self, value):
+        return f'{value:5.1f}' if value is not None else '    -'
+
+    def bench(self, options):
+        date_from = date(2024, 1, 1)
+        date_to = date(2024, 12, 31)
+        with transaction.atomic():
+            count = self._seed(options['barbers_count'], options['per_day'], date_from, date_to)
+
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                ids, booked, capacity = utilization.compute(date_from, date_to)
+                timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            utilization.report(date_from, date_to)
+            report_time = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{len(ids)} barberos, {count} reservas, tensor {booked.shape}')
+        self.stdout.write(f'  compute  mejor {min(timings) * 1000:8.1f} ms   peor {max(timings) * 1000:8.1f} ms')
+        self.stdout.write(f'  report   {report_time * 1000:8.1f} ms (incluye el JSON del mapa)')
+        total = booked.sum() / capacity.sum() * 100 if capacity.sum() else 0
+        self.stdout.write(f'  ocupación media {total:.1f} %')
+
+    def _seed(self, barbers_count, per_day, date_from, date_to):
+        rng = random.Random(42)
+        client = CustomUser.objects.create(email='bench-util-client@example.com', role=2, first_name='Cliente')
+        barbers = CustomUser.objects.bulk_create([
+            CustomUser(email=f'bench-util-{i}@example.com', role=1, first_name=f'Barbero {i}', salary=0)
+            for i in range(barbers_count)
+        ])
+        services = Service.objects.bulk_create([
+            Service(name=f'Servicio {minutes}', description='Benchmark', time=minutes, price='100.00')
+            for minutes in (15, 30, 45, 60, 90)
+        ])
+        BarberSchedule.objects.bulk_create(
+            schedule
+            for barber in barbers
+            for schedule in (
+                BarberSchedule(id_barber=barber, days=['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes'],
+                               start_time=dtime(9), end_time=dtime(18)),
+                BarberSchedule(id_barber=barber, days=['Sábado'], start_time=dtime(10), end_time=dtime(14)),
+            )
+        )
+
+        reservations = []
+        day = date_from
+        while day <= date_to:
+            if day.weekday() < 6:
+                opening = timezone.make_aware(datetime.combine(day, dtime(9)))
+                for barber in barbers:
+                    for _ in range(per_day):
+                        reservations.append(Reservation(
+                            id_client=client, id_barber=barber, id_service=rng.choice(services),
+                            date=opening + timedelta(minutes=15 * rng.randrange(36)),
+                            status=rng.choice(('pending', 'confirmed', 'completed', 'canceled')),
+                        ))
+            day += timedelta(days=1)
+        Reservation.objects.bulk_create(reservations, batch_size=5000)
+        return len(reservations)
@@ -0,0 +1,245 @@
+"""
+Métricas de la API en formato de texto de Prometheus (``GET /metrics``).
+
+Cada proceso acumula contadores e histogramas en diccionarios propios,
+protegidos por un lock: ``+=`` sobre un dict es leer-modificar-escribir y con
+workers de varios hilos se perderían incrementos. Como mucho una
+vez por segundo, al terminar una petición, el proceso vuelca una foto a
+``METRICS_DIR/<pid>.json`` (escritura atómica con ``os.replace``); ``/metrics``
+suma las fotos de todos los workers. Sin ``METRICS_DIR`` solo se exponen las
+del proceso que atiende el scrape.
+
+Los archivos de procesos que ya terminaron se conservan (los contadores son
+totales acumulados); conviene vaciar el directorio en cada despliegue.
+
+``/metrics`` exige ``Authorization: Bearer <METRICS_TOKEN>``; sin token
+configurado solo responde a ``METRICS_ALLOWED_IPS`` (por defecto, la propia
+máquina).
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 1.0
+
+METRICS = {
+    'http_requests_total': ('counter', 'Peticiones atendidas por ruta, método y código'),
+    'http_request_duration_seconds': ('histogram', 'Latencia de las peticiones por ruta'),
+    'db_queries_total': ('counter', 'Consultas SQL ejecutadas por ruta'),
+    'db_query_duration_seconds_total': ('counter', 'Tiempo total en consultas SQL por ruta'),
+    'cache_requests_total': ('counter', 'Lecturas de cachés (flyweights y respuestas) por resultado'),
+    'cache_hit_ratio': ('gauge', 'Aciertos / lecturas de cada caché desde el arranque'),
+    'email_send_duration_seconds': ('histogram', 'Latencia del envío de correos'),
+    'email_send_failures_total': ('counter', 'Correos que fallaron al enviarse'),
+    'booking_conflicts_total': ('counter', 'Intentos de reservar un turno ocupado o retenido'),
+}
+
+_counters = defaultdict(float)
+# Por serie: conteos por bucket (no acumulados) + [suma, total]
+_histograms = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def labels(**values):
+    return ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in values.items()
+    )
+
+
+def inc(name, label_str='', value=1):
+    with _lock:
+        _counters[(name, label_str)] += value
+
+
+def observe(name, label_str, seconds):
+    bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), None)
+    with _lock:
+        series = _histograms.get((name, label_str))
+        if series is None:
+            series = _histograms[(name, label_str)] = [0] * (len(LATENCY_BUCKETS) + 2)
+        if bucket is not None:
+            series[bucket] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+
+def cache_lookup(cache_name, hit):
+    inc('cache_requests_total', labels(cache=cache_name, result='hit' if hit else 'miss'))
+
+
+@contextmanager
+def track_email(kind):
+    """Mide un envío de correo y cuenta el fallo si lanza excepción."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc('email_send_failures_total', labels(kind=kind))
+        raise
+    finally:
+        observe('email_send_duration_seconds', labels(kind=kind), time.perf_counter() - start)
+
+
+# Volcado y agregación entre procesos
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'counters': [[name, label_str, value] for (name, label_str), value in _counters.items()],
+            'histograms': [[name, label_str, list(series)] for (name, label_str), series in _histograms.items()],
+        }
+
+
+def flush():
+    global _last_flush
+    _last_flush = time.monotonic()
+    directory = _metrics_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(fd, 'w') as tmp:
+        json.dump(_snapshot(), tmp)
+    os.replace(tmp_path, os.path.join(directory, f'{os.getpid()}.json'))
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(flush)
+
+
+def _load_snapshots():
+    directory = _metrics_dir()
+    if not directory:
+        return [_snapshot()]
+    flush()
+    snapshots = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.json'):
+            try:
+                with open(entry.path) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue  # Un worker lo está reemplazando justo ahora
+    return snapshots
+
+
+def _merge(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, label_str, value in snapshot['counters']:
+            counters[(name, label_str)] += value
+        for name, label_str, series in snapshot['histograms']:
+            total = histograms.setdefault((name, label_str), [0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+    return counters, histograms
+
+
+def _series(name, label_str, value, extra=''):
+    inner = ','.join(part for part in (label_str, extra) if part)
+    return f'{name}{{{inner}}} {value:g}' if inner else f'{name} {value:g}'
+
+
+def render():
+    counters, histograms = _merge(_load_snapshots())
+
+    # Ratio de aciertos derivado de cache_requests_total
+    lookups = defaultdict(lambda: [0, 0])
+    for (name, label_str), value in counters.items():
+        if name == 'cache_requests_total':
+            cache_label = label_str.split(',result=')[0]
+            lookups[cache_label][0 if label_str.endswith('"hit"') else 1] += value
+    gauges = {('cache_hit_ratio', cache_label): hits / (hits + misses)
+              for cache_label, (hits, misses) in lookups.items() if hits + misses}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'histogram':
+            for (series_name, label_str), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, series):
+                    cumulative += count
+                    lines.append(_series(f'{name}_bucket', label_str, cumulative, f'le="{bound}"'))
+                lines.append(_series(f'{name}_bucket', label_str, series[-1], 'le="+Inf"'))
+                lines.append(_series(f'{name}_sum', label_str, series[-2]))
+                lines.append(_series(f'{name}_count', label_str, series[-1]))
+        else:
+            source = gauges if kind == 'gauge' else counters
+            for (series_name, label_str), value in sorted(source.items()):
+                if series_name == name:
+                    lines.append(_series(name, label_str, value))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=401)
+    elif request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')):
+        return HttpResponse(status=403)
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Middleware
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.route.replace('^', '').replace('$', '') or '/'
+
+
+class MetricsMiddleware:
+    """Latencia por ruta y consultas SQL por petición (con execute_wrapper)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        route = _route(request)
+        route_labels = labels(route=route, method=request.method)
+        inc('http_requests_total', labels(route=route, method=request.method, status=response.status_code))
+        observe('http_request_duration_seconds', route_labels, elapsed)
+        if queries[0]:
+            inc('db_queries_total', route_labels, queries[0])
+            inc('db_query_duration_seconds_total', route_labels, queries[1])
+        maybe_flush()
+        return response
@@ -1,5 +1,22 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+
+# Modelo de las barberías (tenants). Las tablas principales llevan shop_id y
+# todos sus índices empiezan por él, para poder repartir tenants por shop_id
+class Shop(models.Model):
+    name = models.CharField(max_length=150)
+    slug = models.SlugField(max_length=60, unique=True)  # Valor de la cabecera X-Shop
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'shops'
+
+    def __str__(self):
+        return self.name
 
 # Modelo del usuario personalizado
 class CustomUser(AbstractUser):
@@ -10,6 +27,9 @@ class CustomUser(AbstractUser):
     )
     
     email = models.EmailField(unique=True)  # Email como campo único
+
+    # Barbería a la que pertenece (null: despliegue de una sola barbería o admin global)
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='users')
     
     username = models.CharField(max_length=150, blank=True, null=True)   # para crear el super usuario se comento 
     
@@ -30,12 +50,18 @@ class CustomUser(AbstractUser):
     
     # Nuevo campo para el código de recuperación de contraseña
     password_recovery_code = models.PositiveIntegerField(null=True, blank=True)
+
+    # Servicios que sabe hacer el barbero, con su duración y precio (ver BarberService)
+    services_offered = models.ManyToManyField('Service', through='BarberService', related_name='barbers', blank=True)
     
     USERNAME_FIELD = 'email'  # Ahora el usuario se autentica con email # Se comento el username para lo del super usuario
     REQUIRED_FIELDS = []  # Si quieres agregar más campos requeridos para superusuarios, agréguelos aquí
 
     class Meta:
         db_table = 'users' #La tabla en la BD se llame users
+        indexes = [
+            models.Index(fields=['shop', 'role'], name='users_shop_role_idx'),
+        ]
 
     def __str__(self):
         #Muestra el nombre de usuario y el rol
@@ -52,6 +78,7 @@ class CustomUser(AbstractUser):
 # Modelo de los horarios de los barberos
 class BarberSchedule(models.Model):
     id_schedule = models.AutoField(primary_key=True)
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='barber_schedules')
     id_barber = models.ForeignKey(
         CustomUser, 
         on_delete=models.CASCADE, 
@@ -61,9 +88,14 @@ class BarberSchedule(models.Model):
     days = models.JSONField(default=list)  # Almacenar días como JSON (lista)
     start_time = models.TimeField()
     end_time = models.TimeField()
+    updated_at = models.DateTimeField(auto_now=True)  # Sincronización incremental (ver accounts.sync)
 
     class Meta:
         db_table = 'barber_schedule'
+        indexes = [
+            models.Index(fields=['shop', 'id_barber'], name='schedule_shop_barber_idx'),
+            models.Index(fields=['shop', 'updated_at'], name='schedule_shop_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Horario de {self.id_barber.username}: {self.days}"
@@ -76,16 +108,56 @@ class Service(models.Model):
         (3, 'Tratamientos y Cuidado'),
     )
     
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='services')
     category = models.PositiveSmallIntegerField(choices=SERVICES_CHOICES, default=1, blank=False, null=False)
     name = models.CharField(max_length=150)
     description = models.TextField(blank=True, null=True)
     time = models.IntegerField(default=30)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     active_service = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Sincronización incremental (ver accounts.sync)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', 'category'], name='service_shop_category_idx'),
+            models.Index(fields=['shop', 'updated_at'], name='service_shop_updated_idx'),
+        ]
 
     def _str_(self):
         return self.name
 
+# Qué servicios hace cada barbero, con duración y precio propios si difieren
+# de los del servicio. Se consulta a través de accounts.capabilities
+class BarberService(models.Model):
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='barber_services')
+    barber = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 1}, related_name='capabilities')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='capabilities')
+    duration = models.PositiveSmallIntegerField(null=True, blank=True)  # Minutos (None: los del servicio)
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)  # None: el del servicio
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'barber_services'
+        indexes = [
+            # Barberos que hacen un servicio ("primer turno libre", disponibilidad)
+            models.Index(fields=['shop', 'service', 'barber'], name='barber_service_shop_svc_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['barber', 'service'], name='barber_service_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.barber} - {self.service.name}'
+
+    @property
+    def effective_duration(self):
+        return self.duration or self.service.time
+
+    @property
+    def effective_price(self):
+        return self.price if self.price is not None else self.service.price
+
 # Modelo de las reservas
 class Reservation(models.Model):
     # Se define el estado de la reserva con las opciones disponibles
@@ -96,6 +168,7 @@ class Reservation(models.Model):
         ('completed', 'Completada')
     ]
     
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='reservations')
     id_client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='client_reservations')
     id_barber = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='barber_reservations')
     id_service = models.ForeignKey(Service, on_delete=models.CASCADE)
@@ -103,6 +176,67 @@ class Reservation(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     pay = models.BooleanField(default=False)
     person_name = models.CharField(max_length=100, null=True, blank=True) # Nombre de la persona que hace la reserva
+    # Cita fija de la que salió la reserva (ver accounts.recurrence)
+    recurrence = models.ForeignKey('RecurringReservation', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences')
+    updated_at = models.DateTimeField(auto_now=True)  # Sincronización incremental (ver accounts.sync)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', 'date'], name='reservation_shop_date_idx'),
+            models.Index(fields=['shop', 'id_barber', 'date'], name='reservation_shop_barber_idx'),
+            models.Index(fields=['shop', 'id_client', 'date'], name='reservation_shop_client_idx'),
+            models.Index(fields=['shop', 'updated_at'], name='reservation_shop_updated_idx'),
+        ]
+        constraints = [
+            # Cada ocurrencia de una cita fija se materializa una sola vez
+            models.UniqueConstraint(fields=['recurrence', 'date'], name='reservation_recurrence_date_unique'),
+        ]
+
+# Cita fija: el cliente repite con el mismo barbero y servicio cada N semanas.
+# Solo se crean reservas dentro del horizonte (RECURRENCE_HORIZON_DAYS);
+# materialized_until marca hasta qué día ya se generaron
+class RecurringReservation(models.Model):
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='recurrences')
+    id_client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='client_recurrences')
+    id_barber = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 1}, related_name='barber_recurrences')
+    id_service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    start_date = models.DateField()  # Primera ocurrencia
+    start_time = models.TimeField()  # Hora local
+    interval_weeks = models.PositiveSmallIntegerField(default=2)
+    until = models.DateField(null=True, blank=True)  # Última fecha posible (None: sin fin)
+    person_name = models.CharField(max_length=100, null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    materialized_until = models.DateField()
+    skipped = models.PositiveIntegerField(default=0)  # Ocurrencias no creadas por estar el turno ocupado
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'reservation_recurrences'
+        indexes = [
+            models.Index(fields=['shop', 'id_client'], name='recurrence_shop_client_idx'),
+            models.Index(fields=['shop', 'id_barber'], name='recurrence_shop_barber_idx'),
+            # Para el job incremental, que recorre todas las barberías
+            models.Index(fields=['is_active', 'materialized_until'], name='recurrence_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Cita fija {self.id_client_id} con {self.id_barber_id} cada {self.interval_weeks} semanas"
+
+    def save(self, *args, **kwargs):
+        if self.materialized_until is None:  # Nada generado todavía
+            self.materialized_until = self.start_date - timedelta(days=1)
+        super().save(*args, **kwargs)
+
+    def dates_between(self, first, last):
+        """Fechas de las ocurrencias entre ``first`` y ``last`` (incluidas), sin recorrer las anteriores."""
+        step = 7 * self.interval_weeks
+        if self.until is not None:
+            last = min(last, self.until)
+        offset = max((first - self.start_date).days, 0)
+        day = self.start_date + timedelta(days=-(-offset // step) * step)
+        while day <= last:
+            yield day
+            day += timedelta(days=step)
 
 # Modelo de los pagos
 class Payment(models.Model):
@@ -134,3 +268,184 @@ class UserCard(models.Model):
 
     def __str__(self):
         return f"{self.nickname} - ****{self.card_number[-4:]}"
+
+
+# Archivo de reservas y pagos antiguos (completados o cancelados).
+# Conservan el id original; las relaciones no tienen restricción en la BD
+# para que archivar no dependa del estado de las tablas calientes.
+class ArchivedReservation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    shop = models.ForeignKey(Shop, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    id_client = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    id_barber = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    id_service = models.ForeignKey(Service, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    date = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Reservation.STATUS_CHOICES)
+    pay = models.BooleanField(default=False)
+    person_name = models.CharField(max_length=100, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    recurrence = None  # No se archiva la cita fija de origen; ReservationSerializer devuelve null
+
+    class Meta:
+        db_table = 'reservation_archive'
+        indexes = [
+            models.Index(fields=['shop', 'date'], name='res_archive_date_idx'),
+            models.Index(fields=['shop', 'id_barber', 'date'], name='res_archive_barber_date_idx'),
+            models.Index(fields=['shop', 'id_client', 'date'], name='res_archive_client_date_idx'),
+        ]
+
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    reservation = models.ForeignKey(ArchivedReservation, on_delete=models.DO_NOTHING, db_constraint=False, related_name='payments')
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    method = models.CharField(max_length=15, choices=Payment.METHOD_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'payment_archive'
+
+
+# Índice de búsqueda (usuarios, servicios y reservas recientes).
+# Lo mantiene accounts.search a partir de señales; en PostgreSQL se le añade
+# un índice GIN de trigramas y en SQLite una tabla FTS5 (ver search.ensure_backend).
+class SearchEntry(models.Model):
+    ENTITY_CHOICES = [
+        ('user', 'Usuario'),
+        ('service', 'Servicio'),
+        ('reservation', 'Reserva'),
+    ]
+
+    shop = models.ForeignKey(Shop, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    entity_type = models.CharField(max_length=12, choices=ENTITY_CHOICES)
+    entity_id = models.BigIntegerField()
+    label = models.CharField(max_length=255)
+    detail = models.CharField(max_length=255, blank=True)
+    tokens = models.TextField()  # Texto normalizado: minúsculas, sin acentos, teléfono solo dígitos
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'search_index'
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'entity_id'], name='search_entity_unique'),
+        ]
+        indexes = [
+            # text_pattern_ops permite LIKE 'prefijo%' con índice en PostgreSQL
+            models.Index(fields=['shop', 'tokens'], name='search_tokens_prefix_idx', opclasses=['int8_ops', 'text_pattern_ops']),
+        ]
+
+
+# Lápidas de la sincronización incremental (/sync/): una fila por reserva,
+# servicio u horario borrado, para que los clientes offline lo quiten. En las
+# reservas guardan cliente y barbero para filtrarlas igual que ReservationViewSet
+class SyncTombstone(models.Model):
+    ENTITY_CHOICES = [
+        ('reservation', 'Reserva'),
+        ('service', 'Servicio'),
+        ('barber_schedule', 'Horario'),
+    ]
+
+    shop = models.ForeignKey(Shop, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    entity_type = models.CharField(max_length=16, choices=ENTITY_CHOICES)
+    entity_id = models.BigIntegerField()
+    id_client = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    id_barber = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['shop', 'deleted_at'], name='tombstone_shop_deleted_idx'),
+        ]
+
+
+# Historial de cambios de reservas, pagos y usuarios (ver accounts.audit).
+# Se escribe por lotes: created_at es la hora del cambio, no la del insert
+class AuditEntry(models.Model):
+    ENTITY_CHOICES = [
+        ('reservation', 'Reserva'),
+        ('payment', 'Pago'),
+        ('user', 'Usuario'),
+    ]
+    ACTION_CHOICES = [
+        ('create', 'Creación'),
+        ('update', 'Modificación'),
+        ('delete', 'Borrado'),
+    ]
+    SOURCE_CHOICES = [
+        ('api', 'API'),
+        ('admin', 'Admin'),
+    ]
+
+    shop = models.ForeignKey(Shop, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    entity_type = models.CharField(max_length=16, choices=ENTITY_CHOICES)
+    entity_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    # Sin restricción en la BD: el historial se conserva aunque el usuario se borre
+    actor = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=5, choices=SOURCE_CHOICES, default='api')
+    changes = models.JSONField(default=dict)  # {campo: [antes, después]}
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'audit_log'
+        indexes = [
+            models.Index(fields=['shop', 'entity_type', 'entity_id', 'created_at'], name='audit_entity_idx'),
+            models.Index(fields=['shop', 'actor', 'created_at'], name='audit_actor_idx'),
+            models.Index(fields=['shop', 'created_at'], name='audit_shop_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type} {self.entity_id} {self.action} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+# Nómina mensual de los barberos (ver accounts.payroll). Una corrida por
+# barbería y mes; una corrida cerrada no se vuelve a calcular.
+class PayrollRun(models.Model):
+    STATUS_CHOICES = [
+        ('open', 'Abierta'),
+        ('closed', 'Cerrada'),
+    ]
+
+    shop = models.ForeignKey(Shop, on_delete=models.PROTECT, null=True, blank=True, related_name='payroll_runs')
+    period = models.DateField()  # Primer día del mes
+    status = models.CharField(max_length=6, choices=STATUS_CHOICES, default='open')
+    commission_rate = models.DecimalField(max_digits=5, decimal_places=4)
+    card_fee_rate = models.DecimalField(max_digits=5, decimal_places=4)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    computed_at = models.DateTimeField()
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'payroll_runs'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'period'], name='payroll_shop_period_unique'),
+            # NULL no choca en un UNIQUE: la corrida sin barbería necesita su propia restricción
+            models.UniqueConstraint(fields=['period'], condition=models.Q(shop__isnull=True), name='payroll_global_period_unique'),
+        ]
+
+    def __str__(self):
+        return f"Nómina {self.period:%Y-%m} ({self.get_status_display()})"
+
+
+class PayrollLine(models.Model):
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='lines')
+    # Sin restricción en la BD: la nómina se conserva aunque el barbero se borre
+    barber = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    barber_email = models.EmailField()
+    base_salary = models.DecimalField(max_digits=10, decimal_places=2)
+    reservations = models.PositiveIntegerField(default=0)  # Reservas completadas del mes
+    gross_sales = models.DecimalField(max_digits=14, decimal_places=2)
+    card_sales = models.DecimalField(max_digits=14, decimal_places=2)
+    card_fees = models.DecimalField(max_digits=14, decimal_places=2)
+    commission = models.DecimalField(max_digits=14, decimal_places=2)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        db_table = 'payroll_lines'
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'barber'], name='payroll_line_run_barber_unique'),
+        ]
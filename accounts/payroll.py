@@ -0,0 +1,162 @@
+"""
+Nómina mensual de los barberos: salario base + comisión sobre lo cobrado.
+
+Por barbero se suman las reservas ``completed`` del mes: el importe del
+``Payment`` si existe (si no, el precio del servicio) y, aparte, lo cobrado con
+tarjeta, de lo que se descuenta la comisión del datáfono (``CARD_FEE_RATE``, la
+misma que aplica ``ServicePaymentAdapter``). La comisión del barbero es
+``(cobrado - comisión de tarjeta) × commission_rate``.
+
+Todo sale de un único aggregate agrupado por barbero (más otro sobre el
+archivo solo si el mes ya tiene reservas archivadas) y se redondea con
+``Decimal``. Cada mes es una ``PayrollRun`` por barbería: repetir la corrida de
+un mes abierto reemplaza sus líneas; un mes cerrado se devuelve tal cual, sin
+volver a leer reservas.
+"""
+from datetime import date, datetime, time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import archive
+from .adapters import CARD_FEE_RATE
+from .models import ArchivedReservation, CustomUser, PayrollLine, PayrollRun, Reservation
+
+CENT = Decimal('0.01')
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+class PayrollClosed(Exception):
+    """El mes ya está cerrado (o no se puede cerrar todavía)."""
+
+
+def default_commission_rate():
+    return Decimal(str(getattr(settings, 'PAYROLL_COMMISSION_RATE', '0.30')))
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(period):
+    return date(period.year + (period.month == 12), period.month % 12 + 1, 1)
+
+
+def _bounds(period):
+    start = timezone.make_aware(datetime.combine(period, time.min))
+    end = timezone.make_aware(datetime.combine(_next_month(period), time.min))
+    return start, end
+
+
+def _money(value):
+    return (value or Decimal('0')).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _sales_by_barber(queryset, payment_relation):
+    """Aggregate agrupado: reservas, cobrado y cobrado con tarjeta por barbero."""
+    amount = f'{payment_relation}__amount'
+    return (
+        queryset
+        .values('id_barber_id')
+        .order_by()
+        .annotate(
+            reservations=Count('id'),
+            gross=Sum(Coalesce(amount, 'id_service__price', output_field=MONEY)),
+            card=Sum(Case(
+                When(**{f'{payment_relation}__method': 'card'}, then=amount),
+                default=Value(Decimal('0')), output_field=MONEY,
+            )),
+        )
+    )
+
+
+def compute_lines(period, shop_id=None, commission_rate=None):
+    """Líneas de nómina (sin guardar) de todos los barberos activos de la barbería."""
+    commission_rate = default_commission_rate() if commission_rate is None else commission_rate
+    start, end = _bounds(period)
+
+    filters = {'status': 'completed', 'date__gte': start, 'date__lt': end, 'id_barber__isnull': False}
+    barbers = CustomUser.objects.filter(role=1, is_active=True)
+    if shop_id is not None:
+        filters['shop_id'] = shop_id
+        barbers = barbers.filter(shop_id=shop_id)
+
+    sources = [_sales_by_barber(Reservation.objects.filter(**filters), 'payment')]
+    if archive.needs_archive(start, shop_id):
+        sources.append(_sales_by_barber(ArchivedReservation.objects.filter(**filters), 'payments'))
+
+    sales = {}
+    for source in sources:
+        for row in source:
+            totals = sales.setdefault(row['id_barber_id'], [0, Decimal('0'), Decimal('0')])
+            totals[0] += row['reservations']
+            totals[1] += row['gross'] or 0
+            totals[2] += row['card'] or 0
+
+    lines = []
+    people = {barber_id: (email, salary) for barber_id, email, salary in barbers.values_list('id', 'email', 'salary')}
+    # Un barbero desactivado a mitad de mes cobra la comisión de lo que ya hizo
+    missing = set(sales) - set(people)
+    if missing:
+        people.update({
+            barber_id: (email, None)
+            for barber_id, email in CustomUser.objects.filter(id__in=missing).values_list('id', 'email')
+        })
+    for barber_id, (email, salary) in sorted(people.items()):
+        reservations, gross, card = sales.get(barber_id, (0, Decimal('0'), Decimal('0')))
+        gross, card = _money(gross), _money(card)
+        card_fees = _money(card * CARD_FEE_RATE)
+        commission = _money((gross - card_fees) * commission_rate)
+        base_salary = _money(salary)
+        lines.append(PayrollLine(
+            barber_id=barber_id, barber_email=email, base_salary=base_salary,
+            reservations=reservations, gross_sales=gross, card_sales=card,
+            card_fees=card_fees, commission=commission, total=base_salary + commission,
+        ))
+    return lines
+
+
+def run_payroll(period, shop_id=None, close=False, commission_rate=None):
+    """
+    Calcula (o recalcula) la nómina del mes. Devuelve ``(run, computed)``;
+    ``computed`` es False si el mes ya estaba cerrado y no se tocó.
+    """
+    period = month_start(period)
+    with transaction.atomic():
+        run = PayrollRun.objects.select_for_update().filter(shop_id=shop_id, period=period).first()
+        if run is not None and run.status == 'closed':
+            return run, False
+        if close and _next_month(period) > timezone.localdate():
+            raise PayrollClosed(f'El mes {period:%Y-%m} no ha terminado; no se puede cerrar.')
+
+        rate = commission_rate if commission_rate is not None else (
+            run.commission_rate if run is not None else default_commission_rate())
+        lines = compute_lines(period, shop_id, rate)
+
+        if run is None:
+            run = PayrollRun(shop_id=shop_id, period=period)
+        run.commission_rate = rate
+        run.card_fee_rate = CARD_FEE_RATE
+        run.total = sum((line.total for line in lines), Decimal('0'))
+        run.computed_at = timezone.now()
+        if close:
+            run.status = 'closed'
+            run.closed_at = run.computed_at
+        run.save()
+
+        run.lines.all().delete()
+        for line in lines:
+            line.run = run
+        PayrollLine.objects.bulk_create(lines)
+    return run, True
+
+
+def reopen(period, shop_id=None):
+    """Reabre un mes cerrado para corregirlo (la siguiente corrida lo recalcula)."""
+    return PayrollRun.objects.filter(
+        shop_id=shop_id, period=month_start(period), status='closed',
+    ).update(status='open', closed_at=None)
@@ -0,0 +1,257 @@
+"""
+Eventos de reservas en tiempo real (Server-Sent Events sobre ASGI).
+
+Las señales de ``Reservation`` publican cada alta, cambio, cancelación o
+borrado en un pub/sub. El backend por defecto vive en el proceso: solo
+recibe lo que se guarda en el mismo proceso ASGI que sirve el stream. Si
+escriben otros procesos (workers WSGI, varios workers ASGI, comandos como
+``materialize_recurrences``) hace falta un backend compartido (p. ej. sobre
+Redis) en ``RESERVATION_EVENTS_BACKEND`` que implemente ``subscribe``,
+``unsubscribe`` y ``publish``; ``manage.py check --deploy`` avisa
+(accounts.W001) mientras siga configurado el de memoria.
+
+Con ``?status=`` el suscriptor recibe las reservas en ese estado y también
+el evento que las saca de él (``previous_status``), para poder quitarlas.
+
+Cada suscriptor se registra bajo una clave con el mismo criterio que
+``ReservationViewSet.get_queryset``: ``shop:<id>`` (admin de esa barbería),
+``barber:<id>`` o ``client:<id>``, así publicar un evento solo recorre los
+interesados. Un admin sin barbería propia elige una con ``?shop=<slug>``; sin
+ella solo ve las reservas sin barbería (despliegue de una sola barbería).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+KEEPALIVE_SECONDS = 15
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Cola de eventos de una conexión, ligada al event loop que la creó."""
+
+    def __init__(self, keys, status=None):
+        self.keys = frozenset(keys)
+        self.status = status
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Con ?status= llega también el cambio que saca a una reserva del filtro (p. ej. su cancelación)
+        if self.status and self.status not in (event['reservation']['status'], event.get('previous_status')):
+            return
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        # Un cliente lento pierde los eventos más viejos, no bloquea a los demás
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class InProcessBackend:
+    """Pub/sub en memoria: sirve para un proceso ASGI o como sustituto local."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, keys, status=None):
+        subscription = Subscription(keys, status)
+        with self._lock:
+            for key in subscription.keys:
+                self._subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                bucket = self._subscribers.get(key)
+                if bucket is not None:
+                    bucket.discard(subscription)
+                    if not bucket:
+                        del self._subscribers[key]
+
+    def publish(self, event, keys):
+        with self._lock:
+            targets = set()
+            for key in keys:
+                targets.update(self._subscribers.get(key, ()))
+        for subscription in targets:
+            subscription.deliver(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for bucket in self._subscribers.values() for s in bucket})
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'RESERVATION_EVENTS_BACKEND', 'accounts.realtime.InProcessBackend')
+        _backend = import_string(path)()
+    return _backend
+
+
+# Publicación (desde accounts.signals)
+def reservation_event(instance, kind, previous_status=None):
+    return {
+        'event': kind,
+        'previous_status': previous_status,  # Estado antes de un cambio (None en altas y borrados)
+        'reservation': {
+            'id': instance.id,
+            'id_barber': instance.id_barber_id,
+            'id_client': instance.id_client_id,
+            'id_service': instance.id_service_id,
+            'date': instance.date.isoformat() if instance.date else None,
+            'status': instance.status,
+            'pay': instance.pay,
+        },
+    }
+
+
+def shop_key(shop_id):
+    return f'shop:{shop_id}' if shop_id is not None else 'shop:none'
+
+
+def publish_reservation(instance, kind, previous_status=None):
+    """Publica el evento cuando la transacción se confirma."""
+    event = reservation_event(instance, kind, previous_status)
+    keys = {shop_key(instance.shop_id), f'client:{instance.id_client_id}'}
+    if instance.id_barber_id is not None:
+        keys.add(f'barber:{instance.id_barber_id}')
+    transaction.on_commit(lambda: get_backend().publish(event, keys))
+
+
+# Filtro del suscriptor (mismo criterio que ReservationViewSet.get_queryset)
+def _authenticate(raw_token):
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    from .revocation import RevocableJWTAuthentication
+
+    # La misma autenticación que la API: un token revocado no abre el stream
+    authentication = RevocableJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+
+
+def _shop_id_for_slug(slug):
+    from .tenancy import shop_id_for_slug
+    return shop_id_for_slug(slug)
+
+
+def _barber_exists(barber_id):
+    from .models import CustomUser
+    return CustomUser.objects.filter(id=barber_id, role=1).exists()
+
+
+async def resolve_keys(scope):
+    """Devuelve las claves de suscripción de la conexión, o None si no ve nada."""
+    params = parse_qs(scope.get('query_string', b'').decode())
+    headers = dict(scope.get('headers', []))
+    raw_token = None
+    authorization = headers.get(b'authorization', b'').decode()
+    if authorization.startswith('Bearer '):
+        raw_token = authorization[7:]
+    elif params.get('token'):
+        raw_token = params['token'][0]  # EventSource no permite cabeceras propias
+
+    if raw_token:
+        user = await sync_to_async(_authenticate)(raw_token)
+        if user is None:
+            return None
+        if user.role == 0:
+            shop_id = user.shop_id
+            if shop_id is None and params.get('shop'):
+                shop_id = await sync_to_async(_shop_id_for_slug)(params['shop'][0])
+                if shop_id is None:
+                    return None
+            return {shop_key(shop_id)}
+        if user.role == 1:
+            return {f'barber:{user.id}'}
+        if user.role == 2:
+            return {f'client:{user.id}'}
+        return None
+
+    barber_id = params.get('barber_id', [None])[0]
+    if barber_id and barber_id.isdigit() and await sync_to_async(_barber_exists)(barber_id):
+        return {f'barber:{barber_id}'}
+    return None
+
+
+# Conexión SSE
+def _format_event(event_id, event):
+    data = json.dumps(event, separators=(',', ':'))
+    return f"id: {event_id}\nevent: reservation.{event['event']}\ndata: {data}\n\n".encode()
+
+
+async def serve(keys, receive, send, status=None, backend=None, keepalive=KEEPALIVE_SECONDS):
+    """Envía los eventos de ``keys`` hasta que el cliente se desconecta."""
+    backend = backend or get_backend()
+    subscription = backend.subscribe(keys, status)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnect = asyncio.ensure_future(wait_disconnect())
+    event_id = 0
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnect}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                next_event.cancel()
+                break
+            if next_event in done:
+                event_id += 1
+                body = _format_event(event_id, next_event.result())
+            else:
+                next_event.cancel()
+                body = b': ping\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        disconnect.cancel()
+        backend.unsubscribe(subscription)
+
+
+class ReservationEventStream:
+    """Aplicación ASGI para ``/events/reservations/``."""
+
+    async def __call__(self, scope, receive, send):
+        keys = await resolve_keys(scope)
+        if keys is None:
+            await send({
+                'type': 'http.response.start',
+                'status': 401,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            await send({'type': 'http.response.body', 'body': b'{"detail":"No autorizado."}'})
+            return
+        params = parse_qs(scope.get('query_string', b'').decode())
+        status = params.get('status', [None])[0]
+        await serve(keys, receive, send, status=status)
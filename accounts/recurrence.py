@@ -0,0 +1,140 @@
+"""
+Citas fijas (``RecurringReservation``) materializadas bajo demanda.
+
+Una regla nunca se expande entera: el job incremental (``manage.py
+materialize_recurrences``, p. ej. cada noche) solo toma las reglas activas
+cuyo ``materialized_until`` quedó por detrás del horizonte y genera las
+reservas de los días que faltan hasta él.
+
+La disponibilidad se comprueba por lotes de reglas, con una consulta de
+reservas activas y otra de horarios para todos los barberos del lote, y una
+sola lectura de la caché para los holds. Una ocurrencia que choca con algo
+se salta (se cuenta en ``skipped``); el cliente reserva ese día a mano.
+"""
+from bisect import insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import calendar_feed, capabilities, dashboard, holds, realtime, search
+from .models import CustomUser, RecurringReservation, Reservation
+from .schedule import busy_intervals, overlaps, working_hours
+
+
+def horizon_date(today=None):
+    today = today or timezone.localdate()
+    return today + timedelta(days=getattr(settings, 'RECURRENCE_HORIZON_DAYS', 28))
+
+
+def pending_rules(horizon):
+    """Reglas con ocurrencias sin generar antes del horizonte (usa recurrence_pending_idx)."""
+    return (
+        RecurringReservation.objects
+        .filter(is_active=True, materialized_until__lt=horizon)
+        .select_related('id_client', 'id_barber', 'id_service')
+        .order_by('id')
+    )
+
+
+def _candidates(rules, horizon, today):
+    index = capabilities.get_index()
+    for rule in rules:
+        first = max(rule.materialized_until + timedelta(days=1), today)
+        minutes = index.duration(rule.id_barber_id, rule.id_service_id, rule.id_service.time)
+        for day in rule.dates_between(first, horizon):
+            start = timezone.make_aware(datetime.combine(day, rule.start_time))
+            yield rule, start, start + timedelta(minutes=minutes)
+
+
+def _fits_schedule(hours, start, end):
+    local_start, local_end = timezone.localtime(start), timezone.localtime(end)
+    if local_end.date() != local_start.date():
+        return False  # Los horarios no cruzan la medianoche
+    return any(
+        opening <= local_start.time() and local_end.time() <= closing
+        for opening, closing in hours.get(local_start.weekday(), ())
+    )
+
+
+def materialize_rules(rules, horizon, today=None):
+    """
+    Genera las ocurrencias de ``rules`` hasta ``horizon`` (fecha incluida).
+    Devuelve ``(creadas, saltadas)``.
+    """
+    today = today or timezone.localdate()
+    rules = list(rules)
+    if not rules:
+        return 0, 0
+    barber_ids = {rule.id_barber_id for rule in rules}
+    with transaction.atomic():
+        # Serializa con confirm_hold y con otros jobs: barberos bloqueados hasta el commit
+        list(CustomUser.objects.select_for_update().filter(id__in=barber_ids).values_list('id', flat=True))
+
+        candidates = sorted(_candidates(rules, horizon, today), key=lambda item: item[1])
+        created, skipped = [], defaultdict(int)
+        if candidates:
+            busy = busy_intervals(barber_ids, candidates[0][1], max(end for _, _, end in candidates))
+            hours = working_hours(barber_ids)
+            held = holds.held_intervals([
+                (rule.id_barber_id, start, (end - start).seconds // 60) for rule, start, end in candidates
+            ])
+            for index, (rule, start, end) in enumerate(candidates):
+                barber = rule.id_barber_id
+                if (index in held or overlaps(busy[barber], start, end)
+                        or not _fits_schedule(hours.get(barber, {}), start, end)):
+                    skipped[rule.id] += 1
+                    continue
+                insort(busy[barber], (start, end))  # Dos reglas del lote no pueden tomar el mismo turno
+                created.append(Reservation(
+                    shop_id=rule.shop_id, recurrence=rule, id_client=rule.id_client,
+                    id_barber=rule.id_barber, id_service=rule.id_service, date=start,
+                    person_name=rule.person_name,
+                ))
+            Reservation.objects.bulk_create(created)
+
+        for rule in rules:
+            reached = horizon if rule.until is None else min(horizon, rule.until)
+            rule.materialized_until = max(rule.materialized_until, reached)
+            rule.skipped += skipped[rule.id]
+            if rule.until is not None and rule.until <= horizon:
+                rule.is_active = False  # Ya no quedan ocurrencias por generar
+        RecurringReservation.objects.bulk_update(rules, ['materialized_until', 'skipped', 'is_active'])
+
+        # bulk_create no dispara las señales de Reservation
+        for reservation in created:
+            calendar_feed.invalidate_day(reservation.id_barber_id, reservation.date)
+            realtime.publish_reservation(reservation, 'created')
+        for barber_id in {reservation.id_barber_id for reservation in created}:
+            dashboard.invalidate(barber_id)
+        if created:
+            transaction.on_commit(lambda: search.bulk_index('reservation', created))
+    return len(created), sum(skipped.values())
+
+
+def materialize(horizon=None, batch_size=200, today=None):
+    """Job incremental: todas las reglas pendientes, por lotes. Devuelve totales."""
+    horizon = horizon or horizon_date(today)
+    totals = {'rules': 0, 'created': 0, 'skipped': 0}
+    last_id = 0
+    while True:
+        batch = list(pending_rules(horizon).filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return totals
+        created, skipped = materialize_rules(batch, horizon, today)
+        totals['rules'] += len(batch)
+        totals['created'] += created
+        totals['skipped'] += skipped
+        last_id = batch[-1].id
+
+
+def cancel(rule):
+    """Desactiva la regla y cancela sus ocurrencias futuras aún no atendidas."""
+    rule.is_active = False
+    rule.save(update_fields=['is_active'])
+    # save() por reserva: hay pocas (solo las del horizonte) y así se disparan las señales
+    for reservation in rule.occurrences.filter(date__gte=timezone.now(), status__in=('pending', 'confirmed')):
+        reservation.status = 'canceled'
+        reservation.save(update_fields=['status', 'updated_at'])
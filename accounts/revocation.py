@@ -0,0 +1,182 @@
+"""
+Revocación de JWT sin consulta a la BD.
+
+Se revocan tokens sueltos (``jti``: logout, refresh ya rotado) o todos los de
+un usuario emitidos hasta ahora (corte por ``iat``: cambio de contraseña,
+desactivación). Cada revocación vive en la caché compartida con un TTL igual
+a lo que le queda al token (el corte de usuario, la vida máxima de un token),
+así la lista se limpia sola.
+
+Delante hay un filtro de Bloom en cada proceso con las claves revocadas: si
+dice "no está", que es casi siempre, el token se acepta sin ir a la caché; si
+dice "puede estar" se confirma con un ``get_many``. Cada revocación se anota
+también en un registro numerado (``revocation:seq`` + ``revocation:log:<n>``)
+que los demás procesos leen cada ``REVOCATION_REFRESH_SECONDS`` para añadir
+solo lo nuevo a su filtro. Un token revocado en otro worker puede seguir
+valiendo hasta ese intervalo; en el worker que revoca deja de valer al
+instante. Las entradas caducadas se quedan en el filtro hasta que el proceso
+reinicia: solo cuestan una consulta a la caché de más.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+SEQ_KEY = 'revocation:seq'
+LOG_KEY = 'revocation:log:%d'
+JTI_KEY = 'revocation:jti:%s'
+USER_KEY = 'revocation:user:%s'
+READ_CHUNK = 1000
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray; ``k`` posiciones por doble hash (blake2b)."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class _State:
+    def __init__(self):
+        self.bloom = BloomFilter(
+            getattr(settings, 'REVOCATION_BLOOM_CAPACITY', 100_000),
+            getattr(settings, 'REVOCATION_BLOOM_ERROR_RATE', 0.001),
+        )
+        self.seen = 0  # Último número del registro ya leído
+        self.retry = set()  # Números que aún no estaban escritos al leer
+        self.checked = float('-inf')
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+def _jti_entry(jti):
+    return f'j:{jti}'
+
+
+def _user_entry(user_id):
+    return f'u:{user_id}'
+
+
+def _max_lifetime():
+    return max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME).total_seconds()
+
+
+# Revocar
+def _publish(entry, key, value, ttl):
+    ttl = max(1, int(ttl))
+    cache.set(key, value, ttl)
+    cache.add(SEQ_KEY, 0, None)
+    number = cache.incr(SEQ_KEY)
+    cache.set(LOG_KEY % number, entry, ttl)
+    with _lock:
+        _state.bloom.add(entry)
+
+
+def revoke_token(token):
+    """Revoca un token (access o refresh) hasta que caduque."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return
+    _publish(_jti_entry(jti), JTI_KEY % jti, 1, token['exp'] - time.time())
+
+
+def revoke_user(user_id):
+    """Revoca todos los tokens del usuario emitidos hasta este segundo."""
+    _publish(_user_entry(user_id), USER_KEY % user_id, int(time.time()), _max_lifetime())
+
+
+# Comprobar
+def refresh(force=False):
+    """Añade al filtro las revocaciones de otros procesos (como mucho una vez por intervalo)."""
+    now = time.monotonic()
+    if not force and now - _state.checked < getattr(settings, 'REVOCATION_REFRESH_SECONDS', 5):
+        return
+    with _lock:
+        _state.checked = now
+        last = cache.get(SEQ_KEY, 0)
+        if last < _state.seen:
+            _state.seen = 0  # Se vació la caché: el registro empezó de nuevo
+        new = range(_state.seen + 1, last + 1)
+        numbers = [*_state.retry, *new]
+        found = {}
+        for start in range(0, len(numbers), READ_CHUNK):
+            found.update(cache.get_many([LOG_KEY % number for number in numbers[start:start + READ_CHUNK]]))
+        for entry in found.values():
+            _state.bloom.add(entry)
+        # Un número sin entrada caducó o el otro proceso aún no la escribió: se reintenta una vez
+        _state.retry = {number for number in new if LOG_KEY % number not in found}
+        _state.seen = max(_state.seen, last)
+
+
+def is_revoked(token):
+    refresh()
+    jti = token.get(api_settings.JTI_CLAIM)
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    keys = []
+    if jti and _jti_entry(jti) in _state.bloom:
+        keys.append(JTI_KEY % jti)
+    if user_id is not None and _user_entry(user_id) in _state.bloom:
+        keys.append(USER_KEY % user_id)
+    if not keys:
+        return False
+    values = cache.get_many(keys)
+    if jti and JTI_KEY % jti in values:
+        return True
+    cutoff = values.get(USER_KEY % user_id)
+    return cutoff is not None and token.get('iat', 0) <= cutoff
+
+
+# Integración con simplejwt
+class RevocableJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que además rechaza los tokens revocados."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken({'detail': 'El token fue revocado.', 'code': 'token_revoked'})
+        return token
+
+
+class _RefreshToken(RefreshToken):
+    # Sin la app token_blacklist no hay tabla de tokens emitidos; simplejwt la usa igual al rotar
+    def outstand(self):
+        return None
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """No refresca con un token revocado y revoca el refresh viejo al rotarlo (BLACKLIST_AFTER_ROTATION)."""
+
+    token_class = _RefreshToken
+
+    def validate(self, attrs):
+        previous = self.token_class(attrs['refresh'])
+        if is_revoked(previous):
+            raise InvalidToken({'detail': 'El token fue revocado.', 'code': 'token_revoked'})
+        data = super().validate(attrs)
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            revoke_token(previous)
+        return data
@@ -0,0 +1,76 @@
+"""
+Horarios y agenda ocupada de varios barberos a la vez.
+
+Lo comparten las citas fijas (accounts.recurrence) y los turnos libres
+(accounts.availability): una consulta de horarios y otra de reservas
+activas para todos los barberos pedidos, nunca una por barbero. La duración
+de cada reserva es la propia del barbero si la tiene (ver
+accounts.capabilities).
+"""
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from . import capabilities
+from .models import BarberSchedule, Reservation
+
+ACTIVE_STATUSES = ('pending', 'confirmed', 'completed')
+
+_DAY_NAMES = {
+    **{name: index for index, name in enumerate(
+        ['lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo'])},
+    **{name: index for index, name in enumerate(
+        ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'])},
+}
+
+
+def weekday_index(value):
+    """Índice 0 (lunes) - 6 de un día guardado en BarberSchedule.days."""
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value) % 7
+    name = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode().strip().lower()
+    if name in _DAY_NAMES:
+        return _DAY_NAMES[name]
+    # Abreviaturas ("Lun", "Mié", "Sat")
+    return next((index for full, index in _DAY_NAMES.items() if len(name) >= 2 and full.startswith(name)), None)
+
+
+def working_hours(barber_ids):
+    """{barbero: {día de la semana: [(inicio, fin), ...]}} en una consulta."""
+    hours = defaultdict(lambda: defaultdict(list))
+    rows = BarberSchedule.objects.filter(id_barber_id__in=barber_ids).values_list(
+        'id_barber_id', 'days', 'start_time', 'end_time')
+    for barber_id, days, start, end in rows:
+        for day in days or []:
+            index = weekday_index(day)
+            if index is not None:
+                hours[barber_id][index].append((start, end))
+    return hours
+
+
+def busy_intervals(barber_ids, first_start, last_end):
+    """{barbero: [(inicio, fin), ...] ordenado} de reservas activas en el rango, en una consulta."""
+    busy = defaultdict(list)
+    rows = (
+        Reservation.objects
+        # Ninguna reserva dura más de un día: basta con mirar desde el día anterior
+        .filter(id_barber_id__in=barber_ids, status__in=ACTIVE_STATUSES,
+                date__gt=first_start - timedelta(days=1), date__lt=last_end)
+        .values_list('id_barber_id', 'date', 'id_service_id', 'id_service__time')
+    )
+    index = capabilities.get_index()  # Duración propia del barbero si la tiene
+    for barber_id, start, service_id, minutes in rows:
+        busy[barber_id].append((start, start + timedelta(minutes=index.duration(barber_id, service_id, minutes))))
+    for intervals in busy.values():
+        intervals.sort()
+    return busy
+
+
+def overlaps(intervals, start, end):
+    """Si [start, end) choca con algún intervalo de la lista ordenada ``intervals``."""
+    index = bisect_left(intervals, (start,))
+    # La reserva anterior puede terminar después de que empiece esta
+    if index and intervals[index - 1][1] > start:
+        return True
+    return index < len(intervals) and intervals[index][0] < end
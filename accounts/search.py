@@ -0,0 +1,280 @@
+"""
+Búsqueda de clientes, servicios y reservas recientes.
+
+Cada entidad tiene una fila en ``search_index`` con sus tokens normalizados
+(nombre, email, teléfono). Las señales mantienen el índice al día y la
+consulta usa el índice nativo de cada motor:
+
+* PostgreSQL: ``pg_trgm`` (GIN de trigramas) + prefijo con ``text_pattern_ops``.
+* SQLite: tabla virtual FTS5 con índices de prefijo, sincronizada por triggers.
+* Otros motores: ``icontains`` sobre los tokens.
+"""
+import re
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import CustomUser, Service, Reservation, SearchEntry
+
+_WORD_RE = re.compile(r'[a-z0-9@._+-]+')
+
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index_fts USING fts5("
+    "tokens, content='search_index', content_rowid='id', prefix='1 2 3 4')",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ai AFTER INSERT ON search_index BEGIN "
+    "INSERT INTO search_index_fts(rowid, tokens) VALUES (new.id, new.tokens); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_ad AFTER DELETE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens); END",
+    "CREATE TRIGGER IF NOT EXISTS search_index_au AFTER UPDATE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens); "
+    "INSERT INTO search_index_fts(rowid, tokens) VALUES (new.id, new.tokens); END",
+]
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS search_tokens_trgm_idx ON search_index USING gin (tokens gin_trgm_ops)",
+]
+
+
+def ensure_backend(using=None):
+    """Crea las estructuras propias del motor (se llama en post_migrate)."""
+    target = connections[using or DEFAULT_DB_ALIAS]
+    statements = {'sqlite': SQLITE_SETUP, 'postgresql': POSTGRES_SETUP}.get(target.vendor, [])
+    with target.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+# Normalización
+def normalize(text):
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode()
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def _phone_tokens(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    if not digits or set(digits) == {'0'}:  # El valor por defecto es "0000000000"
+        return ''
+    return f'{digits} {digits[-4:]}'
+
+
+def _user_tokens(user):
+    email = user.email or ''
+    return normalize(' '.join([
+        user.first_name, user.last_name, email, email.split('@')[0],
+        _phone_tokens(user.phone_number),
+    ]))
+
+
+def _recent_horizon():
+    return timezone.now() - timedelta(days=getattr(settings, 'SEARCH_RESERVATION_DAYS', 90))
+
+
+# Construcción de entradas
+def _user_entry(user):
+    name = f'{user.first_name} {user.last_name}'.strip() or user.email
+    return {
+        'shop_id': user.shop_id,
+        'label': name,
+        'detail': f'{user.get_role_display()} · {user.email} · {user.phone_number}',
+        'tokens': _user_tokens(user),
+    }
+
+
+def _service_entry(service):
+    return {
+        'shop_id': service.shop_id,
+        'label': service.name,
+        'detail': f'{service.get_category_display()} · {service.time} min · ${service.price}',
+        'tokens': normalize(f'{service.name} {service.description or ""}'),
+    }
+
+
+def _reservation_entry(reservation):
+    client = reservation.id_client
+    barber = reservation.id_barber
+    who = reservation.person_name or f'{client.first_name} {client.last_name}'.strip() or client.email
+    when = timezone.localtime(reservation.date).strftime('%Y-%m-%d %H:%M') if reservation.date else ''
+    return {
+        'shop_id': reservation.shop_id,
+        'label': f'Reserva #{reservation.id} - {who}',
+        'detail': f'{reservation.id_service.name} · {when} · {reservation.get_status_display()}',
+        'tokens': normalize(' '.join([
+            str(reservation.id), reservation.person_name or '', _user_tokens(client),
+            reservation.id_service.name, barber.first_name if barber else '',
+        ])),
+    }
+
+
+def _upsert(entity_type, entity_id, entry):
+    SearchEntry.objects.update_or_create(
+        entity_type=entity_type, entity_id=entity_id, defaults=entry,
+    )
+
+
+def _remove(entity_type, entity_id):
+    SearchEntry.objects.filter(entity_type=entity_type, entity_id=entity_id).delete()
+
+
+# Mantenimiento (desde accounts.signals, tras confirmar la transacción)
+def index_user(user):
+    _upsert('user', user.id, _user_entry(user))
+    # Las reservas recientes del cliente llevan su nombre, email y teléfono
+    for reservation in (
+        Reservation.objects.filter(id_client=user, date__gte=_recent_horizon())
+        .select_related('id_client', 'id_barber', 'id_service')
+    ):
+        _upsert('reservation', reservation.id, _reservation_entry(reservation))
+
+
+def index_service(service):
+    _upsert('service', service.id, _service_entry(service))
+
+
+def index_reservation(reservation):
+    if reservation.date is not None and reservation.date < _recent_horizon():
+        _remove('reservation', reservation.id)
+        return
+    reservation = (
+        Reservation.objects.select_related('id_client', 'id_barber', 'id_service')
+        .filter(id=reservation.id).first()
+    )
+    if reservation is not None:
+        _upsert('reservation', reservation.id, _reservation_entry(reservation))
+
+
+def remove(entity_type, entity_id):
+    _remove(entity_type, entity_id)
+
+
+def remove_many(entity_type, entity_ids):
+    """Quita varias entradas en una consulta (borrados que no disparan señales)."""
+    SearchEntry.objects.filter(entity_type=entity_type, entity_id__in=entity_ids).delete()
+
+
+def bulk_index(entity_type, objects):
+    """
+    Indexa filas recién creadas con bulk_create (que no dispara señales). Las
+    reservas deben traer cargados cliente, barbero y servicio.
+    """
+    build = {'user': _user_entry, 'service': _service_entry, 'reservation': _reservation_entry}[entity_type]
+    SearchEntry.objects.bulk_create(
+        [SearchEntry(entity_type=entity_type, entity_id=obj.id, **build(obj)) for obj in objects],
+        ignore_conflicts=True,
+    )
+
+
+def prune_stale():
+    """
+    Borra las entradas de reservas que ya salieron de la ventana de
+    ``SEARCH_RESERVATION_DAYS`` (o que ya no existen): una reserva solo se
+    reindexa al guardarse. Devuelve cuántas borró.
+    """
+    recent = Reservation.objects.filter(id=OuterRef('entity_id'), date__gte=_recent_horizon())
+    deleted, _ = SearchEntry.objects.filter(entity_type='reservation').filter(~Exists(recent)).delete()
+    return deleted
+
+
+def rebuild(batch_size=1000):
+    """Reconstruye el índice completo. Devuelve el número de entradas."""
+    entries = []
+    for user in CustomUser.objects.iterator(chunk_size=batch_size):
+        entries.append(SearchEntry(entity_type='user', entity_id=user.id, **_user_entry(user)))
+    for service in Service.objects.iterator(chunk_size=batch_size):
+        entries.append(SearchEntry(entity_type='service', entity_id=service.id, **_service_entry(service)))
+    recent = (
+        Reservation.objects.filter(date__gte=_recent_horizon())
+        .select_related('id_client', 'id_barber', 'id_service')
+    )
+    for reservation in recent.iterator(chunk_size=batch_size):
+        entries.append(SearchEntry(entity_type='reservation', entity_id=reservation.id, **_reservation_entry(reservation)))
+
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+    return len(entries)
+
+
+# Consulta
+def _search_sqlite(terms, limit, shop_id):
+    # Cada palabra como prefijo: "ana"* "lop"*. FTS5 separa emails en sus partes
+    # (ana.lopez@gmail -> ana, lopez, gmail), así que los términos también
+    words = [word for term in terms for word in re.findall(r'[a-z0-9]+', term)]
+    if not words:
+        return []
+    match = ' '.join('"%s"*' % word for word in words)
+    shop_clause, shop_params = ('AND s.shop_id = %s ', [shop_id]) if shop_id is not None else ('', [])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT s.entity_type, s.entity_id, s.label, s.detail, bm25(search_index_fts) AS score "
+            "FROM search_index_fts JOIN search_index s ON s.id = search_index_fts.rowid "
+            f"WHERE search_index_fts MATCH %s {shop_clause}ORDER BY score LIMIT %s",
+            [match, *shop_params, limit],
+        )
+        # bm25 es menor cuanto mejor; se invierte para que score alto = mejor
+        return [(row[0], row[1], row[2], row[3], -row[4]) for row in cursor.fetchall()]
+
+
+def _search_postgres(query, terms, limit, shop_id):
+    prefix_clauses = ' AND '.join(
+        "(tokens LIKE %s OR tokens LIKE %s)" for _ in terms
+    )
+    prefix_params = []
+    for term in terms:
+        prefix_params += [f'{term}%', f'% {term}%']
+    shop_clause, shop_params = ('shop_id = %s AND ', [shop_id]) if shop_id is not None else ('', [])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT entity_type, entity_id, label, detail, "
+            f"similarity(tokens, %s) + CASE WHEN {prefix_clauses} THEN 1 ELSE 0 END AS score "
+            f"FROM search_index WHERE {shop_clause}(tokens %% %s OR ({prefix_clauses})) "
+            "ORDER BY score DESC LIMIT %s",
+            [query, *prefix_params, *shop_params, query, *prefix_params, limit],
+        )
+        return cursor.fetchall()
+
+
+def _search_generic(terms, limit, shop_id):
+    queryset = SearchEntry.objects.all()
+    if shop_id is not None:
+        queryset = queryset.filter(shop_id=shop_id)
+    for term in terms:
+        queryset = queryset.filter(tokens__icontains=term)
+    return [
+        (entry.entity_type, entry.entity_id, entry.label, entry.detail, 1.0)
+        for entry in queryset[:limit]
+    ]
+
+
+def search(text, types=None, limit=20, shop_id=None):
+    """Devuelve resultados ordenados por relevancia para ``text`` (solo de ``shop_id`` si se indica)."""
+    query = normalize(text)
+    terms = query.split()
+    if not terms:
+        return []
+
+    # Se piden más filas si luego se filtra por tipo
+    fetch = limit * 3 if types else limit
+    if connection.vendor == 'sqlite':
+        rows = _search_sqlite(terms, fetch, shop_id)
+    elif connection.vendor == 'postgresql':
+        rows = _search_postgres(query, terms, fetch, shop_id)
+    else:
+        rows = _search_generic(terms, fetch, shop_id)
+
+    results = []
+    for entity_type, entity_id, label, detail, score in rows:
+        if types and entity_type not in types:
+            continue
+        results.append({
+            'type': entity_type,
+            'id': entity_id,
+            'label': label,
+            'detail': detail,
+            'score': round(float(score), 4),
+        })
+    return results[:limit]
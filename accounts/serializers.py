@@ -1,17 +1,120 @@
 from rest_framework import serializers
-from .models import CustomUser, BarberSchedule, Service, Reservation, Payment, UserCard
+from rest_framework.permissions import SAFE_METHODS
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from .models import CustomUser, BarberSchedule, Service, BarberService, Reservation, Payment, UserCard, RecurringReservation, AuditEntry
 from datetime import datetime, time  
 from .factories import ReservationFactory, CardFactory, ServiceFactory
 from .flyweight import PaymentFlyweight, ServiceFlyweight
 from .adapters import ServicePaymentAdapter, CardValidationAdapter, PaymentProcessingAdapter, PaymentAdapter
+from .identity import IdentityMapRelatedField
+from . import capabilities
 from django.contrib.auth import get_user_model
 
 
+# Sección de sparse fieldsets (?fields=) y expansión de relaciones (?expand=)
+def _parse_list_param(request, name):
+    """Convierte ``?name=a,b`` en un set, o None si no se envió."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Permite pedir solo algunos campos con ``?fields=a,b`` y expandir las
+    relaciones declaradas en ``Meta.expandable_fields`` con ``?expand=``.
+    Solo aplica a lecturas; los campos no pedidos se eliminan antes de
+    serializar, así los SerializerMethodField no se llegan a calcular.
+    """
+
+    def __init__(self, *args, **kwargs):
+        sparse = kwargs.pop('sparse', True)  # Los serializadores anidados no se filtran
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if sparse and request is not None and request.method in SAFE_METHODS:
+            self._apply_sparse_fieldset(request)
+
+    def _apply_sparse_fieldset(self, request):
+        requested = _parse_list_param(request, 'fields')
+        expand = _parse_list_param(request, 'expand') or set()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+
+        # Reemplaza el campo plano por el serializador anidado de la relación
+        for name in expand & set(expandable):
+            serializer_class = globals()[expandable[name]]
+            self.fields[name] = serializer_class(read_only=True, sparse=False)
+
+        if requested is not None:
+            for name in set(self.fields) - requested - expand:
+                self.fields.pop(name)
+
+    def get_queryset_plan(self, model=None):
+        """
+        Devuelve ``(select_related, only, complete)`` para los campos visibles
+        sobre ``model`` (por defecto el del serializador; otro para leer, p. ej.,
+        reservas archivadas). ``complete`` es False si algún campo no se puede
+        mapear a columnas, en ese caso no se debe aplicar ``only()``.
+        """
+        return _collect_queryset_paths(self, model or self.Meta.model, '')
+
+
+def _collect_queryset_paths(serializer, model, prefix):
+    related = set()
+    only = {prefix + model._meta.pk.name}
+    complete = True
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        # Relación expandida: se sigue con select_related y se recorren sus campos
+        if isinstance(field, serializers.BaseSerializer):
+            path = prefix + field.source
+            related.add(path)
+            only.add(path)
+            nested_model = model._meta.get_field(field.source).related_model
+            sub_related, sub_only, sub_complete = _collect_queryset_paths(field, nested_model, path + '__')
+            related |= sub_related
+            only |= sub_only
+            complete = complete and sub_complete
+            continue
+
+        # Los SerializerMethodField de este módulo solo usan la pk, que ya está incluida
+        if isinstance(field, serializers.SerializerMethodField):
+            continue
+
+        current, path = model, prefix
+        attrs = field.source_attrs
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                complete = False
+                break
+            if index == len(attrs) - 1:
+                if getattr(model_field, 'concrete', False) and not model_field.many_to_many:
+                    only.add(path + attr)
+                else:
+                    complete = False
+            elif model_field.many_to_one or model_field.one_to_one:
+                related.add(path + attr)
+                only.add(path + attr)
+                current, path = model_field.related_model, path + attr + '__'
+            else:
+                complete = False
+                break
+
+    return related, only, complete
+
+
 # Sección de serializadores para los horarios de los barberos
-class BarberScheduleSerializer(serializers.ModelSerializer):
+class BarberScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = BarberSchedule
         fields = '__all__' 
+        expandable_fields = {'id_barber': 'CustomUserSerializer'}
 
     def validate_id_barber(self, value):
         if value.role != 1:
@@ -20,7 +123,7 @@ class BarberScheduleSerializer(serializers.ModelSerializer):
 
 
 # Sección de serializadores para los usuarios
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = (
@@ -52,7 +155,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
 
 
 # Sección de serializadores para los servicios    
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     cached_details = serializers.SerializerMethodField()
     _factory = ServiceFactory()
     _payment_adapter = ServicePaymentAdapter()
@@ -69,8 +172,47 @@ class ServiceSerializer(serializers.ModelSerializer):
         return self._factory.create_service(validated_data)
 
 
+# Qué servicios hace cada barbero (duración y precio propios opcionales)
+class BarberServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    service_name = serializers.CharField(source='service.name', read_only=True)
+    effective_duration = serializers.IntegerField(read_only=True)
+    effective_price = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = BarberService
+        fields = ('id', 'barber', 'service', 'service_name', 'duration', 'price',
+                  'effective_duration', 'effective_price', 'is_active', 'updated_at')
+        read_only_fields = ('updated_at',)
+        expandable_fields = {
+            'barber': 'CustomUserSerializer',
+            'service': 'ServiceSerializer',
+        }
+
+    def validate_barber(self, value):
+        if value.role != 1:
+            raise serializers.ValidationError("El usuario seleccionado no es un barbero.")
+        return value
+
+    def validate(self, data):
+        barber = data.get('barber', getattr(self.instance, 'barber', None))
+        service = data.get('service', getattr(self.instance, 'service', None))
+        if barber and service and barber.shop_id != service.shop_id:
+            raise serializers.ValidationError({'service': "El servicio es de otra barbería."})
+        return data
+
+
+def validate_capability(data, instance=None, barber_field='id_barber', service_field='id_service'):
+    """Error si la petición cambia barbero o servicio a una pareja que el barbero no hace."""
+    if barber_field not in data and service_field not in data:
+        return
+    barber = data.get(barber_field, getattr(instance, barber_field, None))
+    service = data.get(service_field, getattr(instance, service_field, None))
+    if barber is not None and service is not None and not capabilities.can_perform(barber.id, service.id):
+        raise serializers.ValidationError({barber_field: "El barbero no realiza este servicio."})
+
+
 # Sección de serializadores para las reservas
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     barber_name = serializers.CharField(source='id_barber.first_name', read_only=True)
     id_client = serializers.IntegerField(source='id_client.id', read_only=True)  # Añadido para mostrar el email del cliente OPCIONAL NO RECOMENDABLE
     phone_number = serializers.CharField(source='id_client.phone_number', read_only=True)  # Añadido para mostrar el teléfono del cliente
@@ -81,8 +223,17 @@ class ReservationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Reservation
-        fields = ('id_barber', 'barber_name', 'id_service', 'service_name', 'date', 'status', 'pay', 'id', "id_client", 'person_name', 'phone_number')
-        read_only_fields = ('barber_name',)
+        fields = ('id_barber', 'barber_name', 'id_service', 'service_name', 'date', 'status', 'pay', 'id', "id_client", 'person_name', 'phone_number', 'recurrence')
+        read_only_fields = ('barber_name', 'recurrence')
+        expandable_fields = {
+            'id_barber': 'CustomUserSerializer',
+            'id_client': 'CustomUserSerializer',
+            'id_service': 'ServiceSerializer',
+        }
+
+    def validate(self, data):
+        validate_capability(data, self.instance)
+        return data
 
     def create(self, validated_data):
         """Usa el Factory para crear la reserva asignando automáticamente el cliente autenticado"""
@@ -107,8 +258,43 @@ class ReservationSerializer(serializers.ModelSerializer):
                 "solution": "Asegúrate que el usuario esté autenticado"
             })
 
+# Citas fijas (las reservas las genera accounts.recurrence)
+class RecurringReservationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id_client = serializers.IntegerField(source='id_client.id', read_only=True)
+
+    class Meta:
+        model = RecurringReservation
+        fields = (
+            'id', 'id_client', 'id_barber', 'id_service', 'start_date', 'start_time', 'interval_weeks',
+            'until', 'person_name', 'is_active', 'materialized_until', 'skipped', 'created_at',
+        )
+        read_only_fields = ('is_active', 'materialized_until', 'skipped', 'created_at')
+        expandable_fields = {
+            'id_barber': 'CustomUserSerializer',
+            'id_service': 'ServiceSerializer',
+        }
+
+    def validate_id_barber(self, value):
+        if value.role != 1:
+            raise serializers.ValidationError("El usuario seleccionado no es un barbero.")
+        return value
+
+    def validate_interval_weeks(self, value):
+        if not 1 <= value <= 12:
+            raise serializers.ValidationError("El intervalo debe estar entre 1 y 12 semanas.")
+        return value
+
+    def validate(self, data):
+        if data['start_date'] < timezone.localdate():
+            raise serializers.ValidationError({'start_date': "La primera cita no puede estar en el pasado."})
+        if data.get('until') and data['until'] < data['start_date']:
+            raise serializers.ValidationError({'until': "La fecha final debe ser posterior a la primera cita."})
+        validate_capability(data)
+        return data
+
+
 # Sección de serializadores para las tarjetas de usuario   
-class UserCardSerializer(serializers.ModelSerializer):
+class UserCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     _validation_adapter = CardValidationAdapter()
 
     class Meta:
@@ -126,13 +312,16 @@ class UserCardSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        return CardFactory.create_card(validated_data)
+        request = self.context.get('request')
+        user = request.user if request and request.user.is_authenticated else None
+        return CardFactory.create_card(validated_data, user=user)
 
 
 # Sección de serializadores para los pagos
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     _processing_adapter = PaymentProcessingAdapter()
     _flyweight = PaymentFlyweight()
+    serializer_related_field = IdentityMapRelatedField  # La reserva la reutilizan el adapter y el flyweight
 
     reservation_id = serializers.IntegerField(source='reservation.id', read_only=True)
     service_name = serializers.CharField(source='reservation.id_service.name', read_only=True)
@@ -149,6 +338,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         model = Payment
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at', 'amount')
+        expandable_fields = {'reservation': 'ReservationSerializer'}
 
     def get_cached_details(self, obj):
         return self._flyweight.get_payment_data(obj.id)
@@ -160,4 +350,12 @@ class PaymentSerializer(serializers.ModelSerializer):
         validated_data.pop('expiration_year', None)
         validated_data.pop('card_nickname', None)
         return self._processing_adapter.process_payment(validated_data)
-    
\ No newline at end of file
+    
+
+
+# Historial de cambios (solo lectura, ver accounts.audit)
+class AuditEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditEntry
+        fields = ['id', 'entity_type', 'entity_id', 'action', 'actor', 'source', 'changes', 'created_at']
+        read_only_fields = fields
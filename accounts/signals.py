@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import calendar_feed, capabilities, dashboard, identity, realtime, revocation, search, sync, tenancy
+from .flyweight import BarberFlyweight
+from .models import BarberSchedule, BarberService, CustomUser, Payment, RecurringReservation, Reservation, Service
+
+# Guardados de usuario que no cambian nada de lo que se indexa para búsqueda
+_UNSEARCHABLE_USER_FIELDS = {'last_login', 'password', 'password_recovery_code'}
+
+
+# Las filas nuevas sin barbería toman la de la petición (ver accounts.tenancy)
+@receiver(pre_save, sender=CustomUser)
+@receiver(pre_save, sender=Service)
+@receiver(pre_save, sender=BarberSchedule)
+@receiver(pre_save, sender=Reservation)
+@receiver(pre_save, sender=RecurringReservation)
+@receiver(pre_save, sender=BarberService)
+def assign_current_shop(sender, instance, **kwargs):
+    if instance.shop_id is None and instance._state.adding:
+        instance.shop_id = tenancy.get_current_shop_id()
+
+
+# Guarda barbero, fecha y estado originales: qué día dejó libre una reserva movida
+# y si el cambio fue una cancelación
+@receiver(post_init, sender=Reservation)
+def remember_reservation_slot(sender, instance, **kwargs):
+    # Se lee __dict__ para no disparar la carga de campos diferidos por only()
+    data = instance.__dict__
+    instance._original_slot = (data.get('id_barber_id'), data.get('date'))
+    instance._original_status = data.get('status')
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, **kwargs):
+    original_barber, original_date = getattr(instance, '_original_slot', (None, None))
+    if (original_barber, original_date) != (instance.id_barber_id, instance.date):
+        calendar_feed.invalidate_day(original_barber, original_date)
+    calendar_feed.invalidate_day(instance.id_barber_id, instance.date)
+    dashboard.invalidate(original_barber)
+    dashboard.invalidate(instance.id_barber_id)
+
+    if not created and original_barber is not None and original_barber != instance.id_barber_id:
+        sync.record_reassignment(instance, original_barber)
+
+    original_status = getattr(instance, '_original_status', None)
+    if created:
+        realtime.publish_reservation(instance, 'created')
+    elif instance.status == 'canceled' and original_status != 'canceled':
+        realtime.publish_reservation(instance, 'canceled', original_status)
+    else:
+        realtime.publish_reservation(instance, 'updated', original_status)
+
+    instance._original_slot = (instance.id_barber_id, instance.date)
+    instance._original_status = instance.status
+
+    transaction.on_commit(lambda: search.index_reservation(instance))
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    calendar_feed.invalidate_day(instance.id_barber_id, instance.date)
+    realtime.publish_reservation(instance, 'deleted')
+    dashboard.invalidate(instance.id_barber_id)
+    sync.record_deletion('reservation', instance, instance.id_client_id, instance.id_barber_id)
+    transaction.on_commit(lambda: search.remove('reservation', instance.id))
+
+
+# Los pagos cambian lo cobrado hoy en el dashboard del barbero
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    reservation = identity.related(instance, 'reservation')
+    dashboard.invalidate(reservation.id_barber_id if reservation else None)
+
+
+@receiver(post_save, sender=Service)
+def service_saved(sender, instance, created, **kwargs):
+    # La duración y el nombre del servicio aparecen en los eventos ya generados
+    if not created:
+        calendar_feed.invalidate_all()
+    transaction.on_commit(lambda: search.index_service(instance))
+    capabilities.changed()
+
+
+@receiver(post_delete, sender=Service)
+def service_deleted(sender, instance, **kwargs):
+    sync.record_deletion('service', instance)
+    transaction.on_commit(lambda: search.remove('service', instance.id))
+    capabilities.changed()
+
+
+# Qué servicios hace cada barbero (ver accounts.capabilities)
+@receiver(post_save, sender=BarberService)
+@receiver(post_delete, sender=BarberService)
+def barber_service_changed(sender, instance, **kwargs):
+    BarberFlyweight._cache.pop(instance.barber_id, None)
+    capabilities.changed()
+
+
+@receiver(post_delete, sender=BarberSchedule)
+def barber_schedule_deleted(sender, instance, **kwargs):
+    sync.record_deletion('barber_schedule', instance)
+
+
+# Un usuario desactivado pierde sus tokens (ver accounts.revocation) y un
+# barbero que cambia de rol o de estado cambia el índice de capacidades
+@receiver(post_init, sender=CustomUser)
+def remember_user_active(sender, instance, **kwargs):
+    instance._original_is_active = instance.__dict__.get('is_active')
+    instance._original_role = instance.__dict__.get('role')
+
+
+@receiver(post_save, sender=CustomUser)
+def user_status_changed(sender, instance, created, **kwargs):
+    if not created and instance._original_is_active and not instance.is_active:
+        transaction.on_commit(lambda: revocation.revoke_user(instance.id))
+    if 1 in (instance.role, instance._original_role) and (
+            created or (instance._original_is_active, instance._original_role) != (instance.is_active, instance.role)):
+        capabilities.changed()
+    instance._original_is_active = instance.is_active
+    instance._original_role = instance.role
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= _UNSEARCHABLE_USER_FIELDS:
+        return
+    transaction.on_commit(lambda: search.index_user(instance))
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.remove('user', instance.id))
+    if instance.role == 1:
+        capabilities.changed()
@@ -0,0 +1,9 @@
+# Vistas de login social. Están aparte de accounts.views porque importar
+# allauth/dj_rest_auth es caro: backend.urls las carga en la primera petición
+# que las usa y los workers solo-API (backend.settings_api) no las cargan nunca
+from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
+from dj_rest_auth.registration.views import SocialLoginView
+
+
+class GoogleLogin(SocialLoginView):
+    adapter_class = GoogleOAuth2Adapter
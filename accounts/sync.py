@@ -0,0 +1,77 @@
+"""
+Sincronización incremental para la app móvil (``GET /sync/?since=<token>``).
+
+Reservas, servicios y horarios llevan ``updated_at`` (indexado junto a
+``shop``) y cada borrado deja una ``SyncTombstone``. Con un token se devuelven
+solo las filas cambiadas y los ids borrados desde entonces; sin token (o con
+uno más viejo que la retención de lápidas) se devuelve todo con ``full: true``
+y el cliente reemplaza sus datos.
+
+El token es la hora del servidor firmada, menos un margen (``SAFETY_WINDOW``)
+para no perder filas de transacciones que confirmaron un poco después de
+leer: puede repetirse algún cambio, nunca perderse. El cliente aplica cada
+lote como upsert. Archivar reservas no deja lápida: no es un borrado.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import SyncTombstone
+
+SAFETY_WINDOW = timedelta(seconds=5)
+TOKEN_SALT = 'accounts.sync'
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+
+
+def make_token(moment):
+    return signing.dumps(int(moment.timestamp() * 1000), salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """Momento codificado en el token, o None si no es válido."""
+    try:
+        millis = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(millis, int):
+        return None
+    return datetime.fromtimestamp(millis / 1000, dt_timezone.utc)
+
+
+def next_token():
+    return make_token(timezone.now() - SAFETY_WINDOW)
+
+
+# Lápidas (desde accounts.signals)
+def record_deletion(entity_type, instance, id_client_id=None, id_barber_id=None):
+    SyncTombstone.objects.create(
+        shop_id=instance.shop_id, entity_type=entity_type, entity_id=instance.pk,
+        id_client_id=id_client_id, id_barber_id=id_barber_id,
+    )
+
+
+def record_reassignment(reservation, previous_barber_id):
+    """La reserva dejó de ser del barbero anterior: desaparece de su agenda."""
+    SyncTombstone.objects.create(
+        shop_id=reservation.shop_id, entity_type='reservation', entity_id=reservation.pk,
+        id_barber_id=previous_barber_id,
+    )
+
+
+def changes(queryset, tombstones, entity_type, since):
+    """``(filas cambiadas, ids borrados)`` desde ``since`` (None: todo, sin borrados)."""
+    if since is None:
+        return queryset, []
+    deleted = tombstones.filter(entity_type=entity_type, deleted_at__gte=since).values_list('entity_id', flat=True)
+    return queryset.filter(updated_at__gte=since), deleted
+
+
+def purge_tombstones():
+    """Borra las lápidas fuera de la retención; sus tokens ya piden sincronización completa."""
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=timezone.now() - retention()).delete()
+    return deleted
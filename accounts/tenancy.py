@@ -0,0 +1,115 @@
+"""
+Multi-barbería: resolución del tenant por petición.
+
+La barbería de una petición es la del usuario autenticado; si el usuario no
+tiene barbería (anónimo o admin global) se toma de la cabecera ``X-Shop``
+(slug) o de ``?shop=``. Sin barbería resuelta no se filtra nada, así un
+despliegue de una sola barbería funciona igual que antes (salvo con
+``TENANCY_REQUIRED = True``).
+
+El shop_id resuelto queda en un ContextVar mientras dura la petición: las
+señales ``pre_save`` lo asignan a las filas nuevas y ``TenantScopedViewMixin``
+filtra con él los querysets de los viewsets.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.relations import RelatedField
+
+from . import identity
+from .models import Shop
+
+_current_shop = ContextVar('current_shop', default=None)
+
+SHOP_CACHE_SECONDS = 5 * 60
+
+
+def get_current_shop_id():
+    return _current_shop.get()
+
+
+@contextmanager
+def use_shop(shop_id):
+    """Fija la barbería actual fuera de una petición (comandos, tareas)."""
+    token = _current_shop.set(shop_id)
+    try:
+        yield
+    finally:
+        _current_shop.reset(token)
+
+
+def shop_id_for_slug(slug):
+    key = f'shop:slug:{slug}'
+    shop_id = cache.get(key)
+    if shop_id is None:
+        shop_id = Shop.objects.filter(slug=slug, is_active=True).values_list('id', flat=True).first() or 0
+        cache.set(key, shop_id, SHOP_CACHE_SECONDS)
+    return shop_id or None
+
+
+def resolve_shop_id(request):
+    """shop_id de la petición (None si no aplica). Lanza NotFound si el slug no existe."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.shop_id is not None:
+        return user.shop_id
+
+    slug = request.headers.get('X-Shop') or request.GET.get('shop')
+    if slug:
+        shop_id = shop_id_for_slug(slug)
+        if shop_id is None:
+            raise NotFound('La barbería no existe.')
+        return shop_id
+
+    if getattr(settings, 'TENANCY_REQUIRED', False):
+        raise PermissionDenied('Indica la barbería con la cabecera X-Shop.')
+    return None
+
+
+def is_tenant_model(model):
+    return any(field.name == 'shop' for field in model._meta.concrete_fields)
+
+
+class TenantScopedViewMixin:
+    """
+    Filtra por barbería todo lo que pasa por ``filter_queryset`` (list,
+    retrieve, update, destroy) y restringe las relaciones escribibles del
+    serializador a la misma barbería. ``tenant_lookup`` es la ruta hasta
+    ``shop_id`` para modelos sin barbería propia (pagos, tarjetas).
+    """
+    tenant_lookup = 'shop_id'
+    shop_id = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # Autenticación incluida (JWT)
+        if request.user.is_authenticated:
+            identity.add(request.user)  # Cliente/barbero de la petición sin volver a leerlo
+        self.shop_id = resolve_shop_id(request)
+        self._shop_token = _current_shop.set(self.shop_id)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shop_token', None)
+        if token is not None:
+            _current_shop.reset(token)
+            self._shop_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def scope_to_shop(self, queryset, lookup=None):
+        if self.shop_id is None:
+            return queryset
+        return queryset.filter(**{lookup or self.tenant_lookup: self.shop_id})
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(self.scope_to_shop(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.shop_id is not None and self.request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            # Un cliente no puede reservar con el barbero o servicio de otra barbería
+            for field in serializer.fields.values():
+                queryset = getattr(field, 'queryset', None)
+                if isinstance(field, RelatedField) and queryset is not None and is_tenant_model(queryset.model):
+                    field.queryset = queryset.filter(shop_id=self.shop_id)
+        return serializer
@@ -1,3 +1,1010 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.sqlite.base import WriteQueue
+
+from . import (
+    archive, availability, benchmarks, calendar_feed, capabilities, checks, dashboard, explain, holds, identity,
+    metrics, payroll, realtime, recurrence, revocation, schedule, search, sync, throttling, views,
+)
+from .importer import ShopImporter
+from .models import (
+    ArchivedReservation, AuditEntry, BarberSchedule, BarberService, CustomUser, Payment, PayrollRun,
+    RecurringReservation, Reservation, SearchEntry, Service, Shop,
+)
+from .serializers import BarberScheduleSerializer, ReservationSerializer, ServiceSerializer
+
+
+class TenantTestCase(TestCase):
+    """Una barbería con admin, barbero y cliente."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = Shop.objects.create(name='Centro', slug='centro')
+        cls.admin = CustomUser.objects.create(email='admin@example.com', role=0, shop=cls.shop)
+        cls.barber = CustomUser.objects.create(email='barber@example.com', role=1, shop=cls.shop)
+        cls.client_user = CustomUser.objects.create(email='client@example.com', role=2, shop=cls.shop)
+
+    def setUp(self):
+        cache.clear()
+        revocation._state = revocation._State()
+
+    def get(self, user, path, params=None):
+        api = APIClient()
+        api.force_authenticate(user)
+        return api.get(path, params)
+
+
+class ReservationStreamAuthTests(TenantTestCase):
+    def resolve(self, token):
+        scope = {'query_string': f'token={token}'.encode(), 'headers': []}
+        return async_to_sync(realtime.resolve_keys)(scope)
+
+    def test_valid_token_subscribes(self):
+        token = RefreshToken.for_user(self.client_user).access_token
+        self.assertEqual(self.resolve(token), {f'client:{self.client_user.id}'})
+
+    def test_revoked_token_is_rejected(self):
+        token = RefreshToken.for_user(self.client_user).access_token
+        revocation.revoke_token(token)
+        self.assertIsNone(self.resolve(token))
+
+    def test_user_revocation_is_rejected(self):
+        token = RefreshToken.for_user(self.barber).access_token
+        revocation.revoke_user(self.barber.id)
+        self.assertIsNone(self.resolve(token))
+
+
+class ReservationStreamTenancyTests(TenantTestCase):
+    def resolve(self, user, query=''):
+        token = RefreshToken.for_user(user).access_token
+        scope = {'query_string': f'token={token}{query}'.encode(), 'headers': []}
+        return async_to_sync(realtime.resolve_keys)(scope)
+
+    def test_admin_subscribes_to_own_shop(self):
+        self.assertEqual(self.resolve(self.admin), {realtime.shop_key(self.shop.id)})
+
+    def test_global_admin_chooses_shop(self):
+        other = Shop.objects.create(name='Norte', slug='norte')
+        admin = CustomUser.objects.create(email='global@example.com', role=0)
+        self.assertEqual(self.resolve(admin, '&shop=norte'), {realtime.shop_key(other.id)})
+        self.assertEqual(self.resolve(admin), {realtime.shop_key(None)})
+        self.assertIsNone(self.resolve(admin, '&shop=missing'))
+
+    def test_reservation_published_to_its_shop_only(self):
+        other = Shop.objects.create(name='Norte', slug='norte')
+        service = Service.objects.create(shop=other, category=1, name='Corte', description='-', time=30, price='100.00')
+        barber = CustomUser.objects.create(email='barber@norte.example.com', role=1, shop=other)
+        published = []
+        backend = realtime.get_backend()
+        with mock.patch.object(backend, 'publish', lambda event, keys: published.append(keys)), \
+                self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(shop=other, id_client=self.client_user, id_barber=barber, id_service=service,
+                                       date=timezone.now() + timedelta(days=1))
+        self.assertEqual(len(published), 1)
+        self.assertIn(realtime.shop_key(other.id), published[0])
+        self.assertNotIn(realtime.shop_key(self.shop.id), published[0])
+
+
+class ReservationStreamDeliveryTests(SimpleTestCase):
+    def test_serve_streams_only_subscribed_keys(self):
+        backend = realtime.InProcessBackend()
+        sent = []
+
+        async def scenario():
+            done = asyncio.Event()
+
+            async def receive():
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if message.get('body', b'').startswith(b'id: '):
+                    done.set()
+
+            task = asyncio.ensure_future(realtime.serve({'barber:1'}, receive, send, backend=backend))
+            while not backend.subscriber_count():
+                await asyncio.sleep(0)
+            backend.publish({'event': 'created', 'reservation': {'id': 6, 'status': 'pending'}}, {'barber:2'})
+            backend.publish({'event': 'created', 'reservation': {'id': 7, 'status': 'pending'}}, {'barber:1'})
+            await asyncio.wait_for(task, 5)
+
+        async_to_sync(scenario)()
+        self.assertEqual(sent[0]['status'], 200)
+        events = [message['body'] for message in sent[1:] if message['body'].startswith(b'id: ')]
+        self.assertEqual(len(events), 1)
+        self.assertIn(b'event: reservation.created', events[0])
+        self.assertIn(b'"id":7', events[0])
+        self.assertEqual(backend.subscriber_count(), 0)
+
+
+class ServicesTestCase(TenantTestCase):
+    """Además, dos servicios y un segundo barbero."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cut = Service.objects.create(shop=cls.shop, category=1, name='Corte', description='-', time=30, price='100.00')
+        cls.beard = Service.objects.create(shop=cls.shop, category=1, name='Barba', description='-', time=20, price='50.00')
+        cls.other_barber = CustomUser.objects.create(email='barber2@example.com', role=1, shop=cls.shop)
+
+    def reserve(self, barber, service):
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        return api.post('/reservations/', {
+            'id_barber': barber.id, 'id_service': service.id,
+            'date': (timezone.now() + timedelta(days=1)).replace(microsecond=0).isoformat(),
+        }, format='json')
+
+
+class CapabilityTests(ServicesTestCase):
+    def test_unconfigured_shop_is_permissive(self):
+        self.assertEqual(set(capabilities.barbers_for(self.cut.id)), {self.barber.id, self.other_barber.id})
+
+    def test_configured_shop_uses_overrides(self):
+        BarberService.objects.create(shop=self.shop, barber=self.barber, service=self.cut, duration=45, price='120.00')
+        self.assertEqual(capabilities.barbers_for(self.cut.id), {self.barber.id: capabilities.Terms(45, Decimal('120.00'))})
+        self.assertEqual(capabilities.barbers_for(self.beard.id), {})
+
+    def test_reservation_requires_capability(self):
+        BarberService.objects.create(shop=self.shop, barber=self.barber, service=self.cut)
+        self.assertEqual(self.reserve(self.other_barber, self.cut).status_code, 400)
+        self.assertEqual(self.reserve(self.barber, self.cut).status_code, 201)
+
+    def test_transaction_sees_its_own_changes(self):
+        # Índice ya guardado en la caché antes de que la transacción cambie capacidades
+        capabilities.get_index()
+        index = capabilities.build()
+        cache.set(capabilities.INDEX_KEY % cache.get(capabilities.VERSION_KEY),
+                  (index.services, index.barbers, index.capabilities, index.configured))
+        BarberService.objects.create(shop=self.shop, barber=self.barber, service=self.cut)
+        self.assertEqual(set(capabilities.barbers_for(self.cut.id)), {self.barber.id})
+
+
+class ScheduleTests(TestCase):
+    def test_overlaps(self):
+        base = timezone.now().replace(microsecond=0)
+        intervals = [(base, base + timedelta(minutes=30)), (base + timedelta(hours=1), base + timedelta(hours=2))]
+        self.assertTrue(schedule.overlaps(intervals, base + timedelta(minutes=15), base + timedelta(minutes=45)))
+        self.assertTrue(schedule.overlaps(intervals, base + timedelta(minutes=45), base + timedelta(minutes=75)))
+        self.assertFalse(schedule.overlaps(intervals, base + timedelta(minutes=30), base + timedelta(hours=1)))
+
+
+class AvailabilityTests(ServicesTestCase):
+    def test_free_slots_skip_reservations_and_use_override(self):
+        BarberService.objects.create(shop=self.shop, barber=self.barber, service=self.cut, duration=60)
+        BarberSchedule.objects.create(shop=self.shop, id_barber=self.barber, days=['Lunes'],
+                                      start_time=time(9), end_time=time(12))
+        monday = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber, id_service=self.cut,
+                                   date=timezone.make_aware(datetime.combine(monday, time(10))))
+        with self.settings(AVAILABILITY_STEP_MINUTES=60):
+            slots = availability.free_slots(self.cut.id, monday)
+        terms, starts = slots[self.barber.id]
+        self.assertEqual(terms.duration, 60)
+        self.assertEqual([timezone.localtime(start).time() for start in starts], [time(9), time(11)])
+        self.assertNotIn(self.other_barber.id, slots)
+
+
+class WriteQueueTests(SimpleTestCase):
+    def test_reentrant_for_owner(self):
+        queue = WriteQueue()
+        queue.acquire(1)
+        queue.acquire(1)
+        queue.release()
+        self.assertIsNotNone(queue._owner)
+        queue.release()
+        self.assertIsNone(queue._owner)
+
+    def test_times_out_while_held(self):
+        queue, held, done = WriteQueue(), threading.Event(), threading.Event()
+
+        def hold():
+            queue.acquire(1)
+            held.set()
+            done.wait(5)
+            queue.release()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait(5)
+        try:
+            with self.assertRaises(OperationalError):
+                queue.acquire(0.05)
+        finally:
+            done.set()
+            thread.join()
+        queue.acquire(1)
+        self.assertEqual(queue.acquired, 2)
+        queue.release()
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        metrics._counters.clear()
+        metrics._histograms.clear()
+
+    def test_threaded_increments_are_not_lost(self):
+        def work():
+            for _ in range(10000):
+                metrics.inc('booking_conflicts_total')
+                metrics.observe('email_send_duration_seconds', '', 0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(metrics._counters[('booking_conflicts_total', '')], 80000)
+        self.assertEqual(metrics._histograms[('email_send_duration_seconds', '')][-1], 80000)
+
+    @override_settings(METRICS_TOKEN=None, METRICS_DIR=None)
+    def test_without_token_only_allowed_ips(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secreto', METRICS_DIR=None)
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto', REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryParamValidationTests(TenantTestCase):
+    def test_dashboard_rejects_non_numeric_barber_id(self):
+        response = self.get(self.admin, '/barbers/me/dashboard/', {'barber_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.get(self.admin, '/barbers/me/dashboard/', {'barber_id': self.barber.id})
+        self.assertEqual(response.status_code, 200)
+
+
+class AuditLogTests(TenantTestCase):
+    def test_rejects_non_numeric_ids(self):
+        self.assertEqual(self.get(self.admin, '/audit/', {'entity': 'reservation', 'id': 'abc'}).status_code, 400)
+        self.assertEqual(self.get(self.admin, '/audit/', {'actor': 'abc'}).status_code, 400)
+
+    def test_scoped_to_admin_shop(self):
+        other = Shop.objects.create(name='Norte', slug='norte')
+        AuditEntry.objects.bulk_create([
+            AuditEntry(shop=self.shop, entity_type='user', entity_id=self.client_user.id, action='update', actor=self.barber),
+            AuditEntry(shop=other, entity_type='user', entity_id=self.client_user.id, action='update', actor=self.barber),
+        ])
+        for params in ({'entity': 'user', 'id': self.client_user.id}, {'actor': self.barber.id}):
+            response = self.get(self.admin, '/audit/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), 1)
+
+
+class ArchiveTests(ServicesTestCase):
+    def test_archived_reservations_leave_search_index(self):
+        old = Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                         id_service=self.cut, status='completed',
+                                         date=timezone.now() - timedelta(days=30))
+        SearchEntry.objects.create(shop=self.shop, entity_type='reservation', entity_id=old.id, label='-', tokens='x')
+        self.assertEqual(archive.archive_batch(timezone.now(), 100), (1, 0))
+        self.assertFalse(SearchEntry.objects.filter(entity_type='reservation', entity_id=old.id).exists())
+        self.assertTrue(ArchivedReservation.objects.filter(id=old.id).exists())
+
+    def test_range_reads_see_just_archived_rows(self):
+        day = timezone.localdate() - timedelta(days=30)
+        old = Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                         id_service=self.cut, status='completed',
+                                         date=timezone.make_aware(datetime.combine(day, time(10))))
+        params = {'date_from': day.isoformat(), 'date_to': day.isoformat()}
+        self.assertEqual([row['id'] for row in self.get(self.admin, '/reservations/', params).data], [old.id])
+        self.assertIsNone(archive.watermark(self.shop.id))
+
+        # Otro proceso archiva: nada que invalidar en la caché de este
+        with mock.patch.object(cache, 'delete'):
+            archive.archive_batch(timezone.now(), 100)
+        rows = self.get(self.admin, '/reservations/', params).data
+        self.assertEqual([(row['id'], row['recurrence']) for row in rows], [(old.id, None)])
+        self.assertIsNone(archive.watermark(self.shop.id + 1))
+
+
+class SearchPruneTests(ServicesTestCase):
+    def test_prune_stale_reservations(self):
+        def reservation(days_ago):
+            row = Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                             id_service=self.cut, date=timezone.now() - timedelta(days=days_ago))
+            SearchEntry.objects.create(shop=self.shop, entity_type='reservation', entity_id=row.id, label='-', tokens='x')
+            return row
+
+        recent = reservation(1)
+        reservation(200)
+        SearchEntry.objects.create(shop=self.shop, entity_type='reservation', entity_id=999999, label='-', tokens='x')
+        SearchEntry.objects.create(shop=self.shop, entity_type='service', entity_id=self.cut.id, label='-', tokens='x')
+        with self.settings(SEARCH_RESERVATION_DAYS=90):
+            self.assertEqual(search.prune_stale(), 2)
+        self.assertEqual(
+            set(SearchEntry.objects.values_list('entity_type', 'entity_id')),
+            {('reservation', recent.id), ('service', self.cut.id)},
+        )
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_buckets_are_charged_together(self):
+        buckets = [('throttle:test:ip', 2, 0.001), ('throttle:test:identity', 3, 0.001)]
+        results = [throttling.consume(buckets)[0] for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        # La cubeta de identidad no pagó el intento rechazado
+        allowed, levels = throttling.consume(buckets)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(levels[1], 1, places=2)
+
+    def test_throttle_checks_ip_and_identity(self):
+        throttle = throttling.bucket_throttles('test')[0]()
+        throttle.rates = {'ip': '100/d', 'identity': '2/d'}
+        request = Request(APIRequestFactory().post('/', {'email': 'Cliente@Example.com'}, format='json'),
+                          parsers=[JSONParser()])
+        request.user = AnonymousUser()
+        self.assertEqual([throttle.allow_request(request, None) for _ in range(3)], [True, True, False])
+        self.assertGreater(throttle.wait(), 0)
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    def document(self, best_ms, host=None):
+        return {'meta': {'host': host or benchmarks.host()}, 'results': {'caso[10]': {'best_ms': best_ms}}}
+
+    def test_noise_floor(self):
+        # 0.006 -> 0.012 ms es +100 % pero está por debajo del piso de ruido
+        rows = benchmarks.compare(self.document(0.012), self.document(0.006), threshold=0.25, noise_floor_ms=0.1)
+        self.assertEqual(rows[0][4], 'ok')
+        rows = benchmarks.compare(self.document(2.0), self.document(1.0), threshold=0.25, noise_floor_ms=0.1)
+        self.assertEqual(rows[0][4], 'regression')
+
+    def test_same_host(self):
+        self.assertTrue(benchmarks.same_host(self.document(1.0)))
+        self.assertFalse(benchmarks.same_host(self.document(1.0, host='otra/x86_64/3.11.7')))
+        self.assertFalse(benchmarks.same_host({'results': {}}))
+
+
+class IdentityMapTests(ServicesTestCase):
+    def test_related_field_uses_loaded_instance(self):
+        field = identity.IdentityMapRelatedField(queryset=Service.objects.filter(shop_id=self.shop.id))
+        with identity.scope():
+            identity.add(self.cut)
+            with self.assertNumQueries(0):
+                self.assertIs(field.to_internal_value(self.cut.id), self.cut)
+
+    def test_related_field_checks_filters_in_memory(self):
+        other = Shop.objects.create(name='Norte', slug='norte')
+        field = identity.IdentityMapRelatedField(queryset=Service.objects.filter(shop_id=other.id))
+        with identity.scope():
+            identity.add(self.cut)
+            with self.assertNumQueries(0), self.assertRaises(ValidationError):
+                field.to_internal_value(self.cut.id)
+
+
+class FastListParityTests(ServicesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.make_aware(datetime(2030, 1, 7, 9))
+        Reservation.objects.bulk_create([
+            Reservation(shop=cls.shop, id_client=cls.client_user, id_barber=cls.barber if i % 3 else None,
+                        id_service=(cls.cut, cls.beard)[i % 2], date=start + timedelta(minutes=30 * i),
+                        status=('pending', 'confirmed', 'completed')[i % 3], person_name=f'Cliente {i}')
+            for i in range(12)
+        ])
+        BarberSchedule.objects.create(shop=cls.shop, id_barber=cls.barber, days=['Lunes', 'Martes'],
+                                      start_time=time(9), end_time=time(18))
+
+    def fast(self, path, params=None, pk='id'):
+        response = self.get(self.admin, path, {'fast': '1', **(params or {})})
+        self.assertEqual(response.status_code, 200)
+        return sorted(json.loads(response.content), key=lambda row: row[pk])
+
+    def serialized(self, serializer_class, queryset):
+        data = serializer_class(queryset.order_by('pk'), many=True).data
+        return json.loads(JSONRenderer().render(data))
+
+    def test_reservations_match_serializer(self):
+        self.assertEqual(self.fast('/reservations/'), self.serialized(ReservationSerializer, Reservation.objects.all()))
+
+    def test_sparse_fields_match_serializer(self):
+        fast = self.fast('/reservations/', {'fields': 'id,date,service_name'})
+        expected = [{key: row[key] for key in ('id', 'date', 'service_name')}
+                    for row in self.serialized(ReservationSerializer, Reservation.objects.all())]
+        self.assertEqual(fast, expected)
+
+    def test_services_and_schedules_match_serializer(self):
+        self.assertEqual(self.fast('/services/'), self.serialized(ServiceSerializer, Service.objects.all()))
+        self.assertEqual(self.fast('/barber-schedules/', pk='id_schedule'),
+                         self.serialized(BarberScheduleSerializer, BarberSchedule.objects.all()))
+
+
+class SparseFieldsetTests(ServicesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Reservation.objects.bulk_create([
+            Reservation(shop=cls.shop, id_client=cls.client_user, id_barber=cls.barber, id_service=cls.cut,
+                        date=timezone.now() + timedelta(days=1, hours=i))
+            for i in range(5)
+        ])
+
+    def test_fields_limits_keys_and_queries(self):
+        with self.assertNumQueries(1):
+            response = self.get(self.admin, '/reservations/', {'fields': 'id,service_name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({frozenset(row) for row in response.data}, {frozenset({'id', 'service_name'})})
+        self.assertEqual(response.data[0]['service_name'], 'Corte')
+
+    def test_expand_nests_the_related_object(self):
+        response = self.get(self.admin, '/reservations/', {'fields': 'id,id_service', 'expand': 'id_service'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['id_service']['name'], 'Corte')
+
+
+class CalendarFeedTests(ServicesTestCase):
+    def reservation(self, hours):
+        return Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                          id_service=self.cut, date=timezone.now() + timedelta(hours=hours))
+
+    def test_signed_link_and_conditional_get(self):
+        self.reservation(24)
+        url = f'/barbers/calendar/{calendar_feed.make_token(self.barber.id)}.ics'
+        self.assertEqual(self.client.get(url.replace('.ics', 'x.ics')).status_code, 404)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(b'BEGIN:VEVENT'), 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_saved_reservation_invalidates_its_day(self):
+        self.reservation(24)
+        etag = calendar_feed.get_feed(self.barber.id)['etag']
+        self.reservation(25)
+        feed = calendar_feed.get_feed(self.barber.id)
+        self.assertNotEqual(feed['etag'], etag)
+        self.assertEqual(feed['body'].count(b'BEGIN:VEVENT'), 2)
+
+    def test_admin_link_only_for_barbers_of_the_shop(self):
+        other = Shop.objects.create(name='Norte', slug='norte')
+        foreign = CustomUser.objects.create(email='barber@norte.example.com', role=1, shop=other)
+        path = '/users/me/calendar-link/'
+        response = self.get(self.admin, path, {'barber_id': self.barber.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(calendar_feed.make_token(self.barber.id), response.data['url'])
+        for barber_id in (foreign.id, self.client_user.id):
+            self.assertEqual(self.get(self.admin, path, {'barber_id': barber_id}).status_code, 404)
+        self.assertEqual(self.get(self.admin, path, {'barber_id': 'x'}).status_code, 400)
+
+
+class HoldTests(ServicesTestCase):
+    def start(self):
+        return timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def test_overlapping_holds_cannot_coexist(self):
+        start = self.start()
+        hold = holds.create_hold(self.barber.id, self.cut, start, self.client_user.id)
+        with self.assertRaises(holds.SlotUnavailable):
+            holds.create_hold(self.barber.id, self.beard, start + timedelta(minutes=10), self.admin.id)
+        self.assertTrue(holds.is_held(self.barber.id, start, 30))
+        self.assertFalse(holds.is_held(self.barber.id, start, 30, owner_hold_id=hold['id']))
+
+        holds.release_hold(hold)
+        self.assertFalse(holds.is_held(self.barber.id, start, 30))
+        with self.assertRaises(holds.HoldExpired):
+            holds.get_hold(hold['id'], self.client_user.id)
+
+    def test_confirm_rechecks_the_database(self):
+        start = self.start()
+        hold = holds.create_hold(self.barber.id, self.cut, start, self.client_user.id)
+        Reservation.objects.create(shop=self.shop, id_client=self.admin, id_barber=self.barber,
+                                   id_service=self.beard, date=start + timedelta(minutes=10))
+        with self.assertRaises(holds.SlotUnavailable):
+            holds.confirm_hold(hold, lambda: self.fail('no debe guardar'))
+
+    def test_confirm_creates_the_reservation_and_frees_the_slots(self):
+        start = self.start()
+        hold = holds.create_hold(self.barber.id, self.cut, start, self.client_user.id)
+        reservation = holds.confirm_hold(hold, lambda: Reservation.objects.create(
+            shop=self.shop, id_client=self.client_user, id_barber=self.barber, id_service=self.cut, date=start))
+        self.assertEqual(reservation.date, start)
+        self.assertFalse(holds.is_held(self.barber.id, start, 30))
+        with self.assertRaises(holds.HoldExpired):
+            holds.confirm_hold(hold, lambda: None)
+
+    def test_held_times_are_utc_whatever_the_client_offset(self):
+        day = timezone.now().date() + timedelta(days=2)
+        start = datetime.combine(day, time(10), tzinfo=dt_timezone(timedelta(hours=-3)))  # 13:00 UTC
+        holds.create_hold(self.barber.id, self.cut, start, self.client_user.id)
+        self.assertEqual(holds.held_times(self.barber.id, day), ['13:00'])
+
+        request = APIRequestFactory().get('/', {'date': day.isoformat(), 'id_barber': self.barber.id})
+        self.assertEqual(views.horas_ocupadas(request).data, ['13:00'])
+
+
+class RecurrenceTests(ServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        BarberSchedule.objects.create(shop=self.shop, id_barber=self.barber, days=['Lunes'],
+                                      start_time=time(9), end_time=time(18))
+        self.monday = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+
+    def rule(self, **kwargs):
+        return RecurringReservation.objects.create(
+            shop=self.shop, id_client=self.client_user, id_barber=self.barber, id_service=self.cut,
+            start_date=self.monday, start_time=time(10), **kwargs)
+
+    def test_materializes_up_to_the_horizon_and_skips_busy_slots(self):
+        rule = self.rule(interval_weeks=1)
+        Reservation.objects.create(shop=self.shop, id_client=self.admin, id_barber=self.barber, id_service=self.beard,
+                                   date=timezone.make_aware(datetime.combine(self.monday, time(10, 15))))
+        horizon = self.monday + timedelta(weeks=3)
+        totals = recurrence.materialize(horizon=horizon)
+        self.assertEqual(totals, {'rules': 1, 'created': 3, 'skipped': 1})
+        rule.refresh_from_db()
+        self.assertEqual((rule.materialized_until, rule.skipped), (horizon, 1))
+        # Incremental: una segunda pasada no genera nada
+        self.assertEqual(recurrence.materialize(horizon=horizon)['created'], 0)
+
+    def test_rules_in_one_batch_do_not_share_a_slot(self):
+        self.rule(until=self.monday)
+        self.rule(until=self.monday)
+        totals = recurrence.materialize(horizon=self.monday)
+        self.assertEqual((totals['created'], totals['skipped']), (1, 1))
+        self.assertFalse(RecurringReservation.objects.filter(is_active=True).exists())
+
+    def test_cancel_cancels_future_occurrences(self):
+        rule = self.rule()
+        recurrence.materialize(horizon=self.monday + timedelta(weeks=4))
+        recurrence.cancel(rule)
+        self.assertEqual(set(rule.occurrences.values_list('status', flat=True)), {'canceled'})
+
+
+class SyncTests(ServicesTestCase):
+    def reservation(self, barber):
+        return Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=barber,
+                                          id_service=self.cut, date=timezone.now() + timedelta(days=1))
+
+    def test_full_then_incremental(self):
+        kept, gone = self.reservation(self.barber), self.reservation(self.barber)
+        response = self.get(self.client_user, '/sync/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['full'])
+        self.assertEqual({row['id'] for row in response.data['reservations']['updated']}, {kept.id, gone.id})
+
+        since = sync.make_token(timezone.now())
+        new, gone_id = self.reservation(self.barber), gone.id
+        gone.delete()
+        response = self.get(self.client_user, '/sync/', {'since': since, 'types': 'reservations'})
+        self.assertFalse(response.data['full'])
+        self.assertEqual([row['id'] for row in response.data['reservations']['updated']], [new.id])
+        self.assertEqual(response.data['reservations']['deleted'], [gone_id])
+        self.assertNotIn('services', response.data)
+
+    def test_reassignment_removes_it_from_the_old_barber(self):
+        reservation = self.reservation(self.barber)
+        since = sync.make_token(timezone.now())
+        reservation.id_barber = self.other_barber
+        reservation.save()
+        response = self.get(self.barber, '/sync/', {'since': since, 'types': 'reservations'})
+        self.assertEqual(response.data['reservations'], {'updated': [], 'deleted': [reservation.id]})
+
+    def test_bad_or_expired_token(self):
+        self.assertEqual(self.get(self.client_user, '/sync/', {'since': 'x'}).status_code, 400)
+        old = sync.make_token(timezone.now() - sync.retention() - timedelta(days=1))
+        self.assertTrue(self.get(self.client_user, '/sync/', {'since': old}).data['full'])
+
+
+class UtilizationTests(ServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        BarberSchedule.objects.create(shop=self.shop, id_barber=self.barber, days=['Lunes'],
+                                      start_time=time(9), end_time=time(10))
+        self.monday = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        for start in (time(9), time(9, 50)):  # La segunda pasa 20 minutos del horario
+            Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                       id_service=self.cut, date=timezone.make_aware(datetime.combine(self.monday, start)))
+
+    def test_heatmap_arithmetic(self):
+        from . import utilization
+
+        data = utilization.report(self.monday, self.monday + timedelta(days=13), [self.barber.id])
+        barber, = data['barbers']
+        nine = data['slots'].index('09:00')
+        self.assertEqual(barber['heatmap'][0][nine:nine + 5], [50.0, 50.0, 0.0, 33.3, None])
+        # 60 minutos reservados (20 fuera de horario) sobre 120 de horario en dos lunes
+        self.assertEqual(barber['by_weekday'][:2], [50.0, None])
+        self.assertEqual(barber['utilization'], 50.0)
+        self.assertEqual(barber['minutes_outside_schedule'], 20)
+
+    def test_weekday_names(self):
+        self.assertEqual([schedule.weekday_index(day) for day in ('Miércoles', 'mie', 'Sunday', 8, 'x')],
+                         [2, 2, 6, 1, None])
+
+    def test_view_is_shop_scoped(self):
+        params = {'date_from': self.monday.isoformat(), 'date_to': self.monday.isoformat()}
+        response = self.get(self.admin, '/reports/utilization/', params)
+        self.assertEqual([barber['id'] for barber in response.data['barbers']], [self.barber.id, self.other_barber.id])
+        self.assertEqual(self.get(self.admin, '/reports/utilization/', {**params, 'barber_id': 'a'}).status_code, 400)
+
+    def test_command_takes_a_shop_slug(self):
+        out = io.StringIO()
+        call_command('utilization_report', '--from', self.monday.isoformat(), '--to', self.monday.isoformat(),
+                     '--shop', 'centro', '--json', stdout=out)
+        self.assertEqual(len(json.loads(out.getvalue())['barbers']), 2)
+        with self.assertRaises(CommandError):
+            call_command('utilization_report', '--shop', 'missing', stdout=io.StringIO())
+
+
+class ImporterCapabilityTests(TransactionTestCase):
+    """Fuera de una transacción de test: el índice se invalida solo al confirmar."""
+
+    def test_imported_service_is_bookable(self):
+        cache.clear()
+        shop = Shop.objects.create(name='Centro', slug='centro')
+        barber = CustomUser.objects.create(email='barber@example.com', role=1, shop=shop)
+        capabilities.get_index()  # Índice en caché, todavía sin el servicio
+        with ShopImporter(shop_id=shop.id) as importer:
+            importer.import_services(io.StringIO('name,category,description,time,price\nCorte,1,-,30,100.00\n'))
+        service = Service.objects.get(name='Corte')
+        self.assertTrue(capabilities.can_perform(barber.id, service.id))
+
+
+class ImporterTests(TenantTestCase):
+    USERS = (
+        'email,first_name,last_name,role,salary,password\n'
+        'ana@example.com,Ana,Pérez,1,1000.00,secreta123\n'
+        'ANA@example.com,Ana,Otra,2,,secreta123\n'  # Repetido en el mismo archivo
+        'client@example.com,Ya,Existe,2,,secreta123\n'  # Repetido en la BD
+        'luis@example.com,Luis,Gómez,1,,secreta123\n'  # Barbero sin salario
+        'no-es-un-email,X,Y,2,,secreta123\n'
+    )
+
+    def import_users(self, **kwargs):
+        with ShopImporter(batch_size=2, **kwargs) as importer:
+            importer.import_users(io.StringIO(self.USERS))
+        return importer
+
+    def test_row_errors_and_duplicate_emails(self):
+        importer = self.import_users(shop_id=self.shop.id)
+        self.assertEqual(importer.created['users'], 1)
+        self.assertEqual([(error['line'], list(error['errors'])) for error in importer.errors],
+                         [(3, ['email']), (4, ['email']), (5, ['salary']), (6, ['email'])])
+
+        report = io.StringIO()
+        importer.write_report(report)
+        rows = list(csv.reader(io.StringIO(report.getvalue())))
+        self.assertEqual(rows[0], ['file', 'line', 'field', 'error'])
+        self.assertEqual(rows[1], ['users.csv', '3', 'email', 'Ya existe un usuario con este email.'])
+        self.assertEqual(len(rows), 5)
+
+    def test_rows_get_the_shop_and_are_searchable(self):
+        self.import_users(shop_id=self.shop.id)
+        ana = CustomUser.objects.get(email='ana@example.com')
+        self.assertEqual(ana.shop_id, self.shop.id)
+        self.assertTrue(ana.check_password('secreta123'))
+        self.assertEqual([result['id'] for result in search.search('ana', types=['user'], shop_id=self.shop.id)],
+                         [ana.id])
+        self.assertIn(ana.id, capabilities.get_index().barbers)
+
+    def test_schedules_resolve_barbers_of_the_shop(self):
+        other = Shop.objects.create(name='Norte', slug='norte')
+        CustomUser.objects.create(email='norte@example.com', role=1, shop=other)
+        with ShopImporter(shop_id=self.shop.id) as importer:
+            importer.import_schedules(io.StringIO(
+                'barber_email,days,start_time,end_time\n'
+                'barber@example.com,Lunes|Martes,09:00,18:00\n'
+                'norte@example.com,Lunes,09:00,18:00\n'
+            ))
+        schedule, = BarberSchedule.objects.all()
+        self.assertEqual((schedule.id_barber_id, schedule.shop_id, schedule.days),
+                         (self.barber.id, self.shop.id, ['Lunes', 'Martes']))
+        self.assertEqual([error['line'] for error in importer.errors], [3])
+
+    def test_command_dry_run_writes_nothing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            users, report = os.path.join(directory, 'users.csv'), os.path.join(directory, 'report.csv')
+            with open(users, 'w', encoding='utf-8') as stream:
+                stream.write(self.USERS)
+            call_command('import_shop', users=users, shop='centro', dry_run=True, report=report, stdout=io.StringIO())
+            with open(report, encoding='utf-8') as stream:
+                self.assertEqual(len(stream.readlines()), 5)
+        self.assertFalse(CustomUser.objects.filter(email='ana@example.com').exists())
+        self.assertEqual(search.search('ana', types=['user']), [])
+
+
+class PayrollTests(ServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        CustomUser.objects.filter(id=self.barber.id).update(salary=Decimal('1000.00'))
+        self.period = payroll.month_start(payroll.month_start(timezone.localdate()) - timedelta(days=1))
+        self.day = timezone.make_aware(datetime.combine(self.period + timedelta(days=9), time(10)))
+
+    def completed(self, service, amount=None, method=None, status='completed'):
+        reservation = Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                                 id_service=service, date=self.day, status=status)
+        if method:
+            Payment.objects.create(reservation=reservation, amount=amount, method=method)
+        return reservation
+
+    def line(self, run):
+        return run.lines.get(barber=self.barber)
+
+    def test_cash_and_card_month(self):
+        self.completed(self.cut, Decimal('100.00'), 'cash')
+        self.completed(self.cut, Decimal('100.00'), 'card')
+        self.completed(self.beard)  # Sin pago: cuenta el precio del servicio
+        self.completed(self.cut, Decimal('100.00'), 'cash', status='pending')
+        run, computed = payroll.run_payroll(self.period, self.shop.id, commission_rate=Decimal('0.30'))
+        line = self.line(run)
+        self.assertTrue(computed)
+        self.assertEqual(
+            (line.reservations, line.gross_sales, line.card_sales, line.card_fees, line.commission, line.total),
+            (3, Decimal('250.00'), Decimal('100.00'), Decimal('2.00'), Decimal('74.40'), Decimal('1074.40')),
+        )
+        # El otro barbero no trabajó: solo su salario (ninguno)
+        self.assertEqual(run.lines.get(barber=self.other_barber).total, Decimal('0.00'))
+        self.assertEqual(run.total, Decimal('1074.40'))
+
+    def test_rounding_is_half_up(self):
+        self.completed(self.cut, Decimal('0.25'), 'cash')
+        run, _ = payroll.run_payroll(self.period, self.shop.id, commission_rate=Decimal('0.5'))
+        self.assertEqual(self.line(run).commission, Decimal('0.13'))  # 0.125; ROUND_HALF_EVEN daría 0.12
+
+    def test_closed_month_is_not_recomputed(self):
+        self.completed(self.cut, Decimal('100.00'), 'cash')
+        run, _ = payroll.run_payroll(self.period, self.shop.id, close=True, commission_rate=Decimal('0.30'))
+        self.completed(self.cut, Decimal('100.00'), 'cash')
+        with self.assertNumQueries(3):  # SAVEPOINT, la corrida y RELEASE: no lee reservas
+            again, computed = payroll.run_payroll(self.period, self.shop.id, commission_rate=Decimal('0.50'))
+        self.assertFalse(computed)
+        self.assertEqual((again.id, again.status, again.total), (run.id, 'closed', Decimal('1030.00')))
+        self.assertEqual(self.line(again).reservations, 1)
+
+        payroll.reopen(self.period, self.shop.id)
+        again, computed = payroll.run_payroll(self.period, self.shop.id)
+        self.assertTrue(computed)
+        self.assertEqual((again.commission_rate, self.line(again).reservations), (Decimal('0.3000'), 2))
+
+    def test_current_month_cannot_be_closed(self):
+        with self.assertRaises(payroll.PayrollClosed):
+            payroll.run_payroll(timezone.localdate(), self.shop.id, close=True)
+
+    def test_archived_month(self):
+        self.completed(self.cut, Decimal('100.00'), 'card')
+        self.completed(self.beard, Decimal('50.00'), 'cash')
+        archive.archive_batch(timezone.now(), 1)  # Solo la primera: el mes queda repartido
+        self.assertEqual((Reservation.objects.count(), ArchivedReservation.objects.count()), (1, 1))
+        line = self.line(payroll.run_payroll(self.period, self.shop.id, commission_rate=Decimal('0.30'))[0])
+        self.assertEqual((line.reservations, line.gross_sales, line.card_fees), (2, Decimal('150.00'), Decimal('2.00')))
+
+    def test_command_takes_a_shop_slug(self):
+        self.completed(self.cut, Decimal('100.00'), 'cash')
+        out = io.StringIO()
+        call_command('payroll_run', month=f'{self.period:%Y-%m}', shop='centro', stdout=out)
+        self.assertIn('barber@example.com', out.getvalue())
+        self.assertTrue(PayrollRun.objects.filter(shop=self.shop, period=self.period).exists())
+        with self.assertRaises(CommandError):
+            call_command('payroll_run', shop='missing', stdout=io.StringIO())
+
+
+class ReservationStreamFilterTests(ServicesTestCase):
+    def published(self, action):
+        events = []
+        with mock.patch.object(realtime.get_backend(), 'publish', lambda event, keys: events.append(event)), \
+                self.captureOnCommitCallbacks(execute=True):
+            action()
+        return events
+
+    def delivered(self, status, events):
+        async def collect():
+            subscription = realtime.Subscription({'shop:1'}, status)
+            for event in events:
+                subscription.deliver(event)
+            await asyncio.sleep(0)  # deliver() encola con call_soon_threadsafe
+            return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        return async_to_sync(collect)()
+
+    def test_status_filter_keeps_transitions_out_of_the_set(self):
+        def create(status):
+            return Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=self.barber,
+                                              id_service=self.cut, status=status,
+                                              date=timezone.now() + timedelta(days=1))
+
+        pending, confirmed = create('pending'), create('confirmed')
+
+        def changes():
+            pending.status = 'canceled'
+            pending.save()
+            confirmed.status = 'completed'
+            confirmed.save()
+        events = self.published(changes)
+        self.assertEqual([(event['event'], event['previous_status']) for event in events],
+                         [('canceled', 'pending'), ('updated', 'confirmed')])
+
+        delivered = self.delivered('pending', events)
+        self.assertEqual([(event['event'], event['reservation']['id']) for event in delivered],
+                         [('canceled', pending.id)])
+        self.assertEqual(len(self.delivered(None, events)), 2)
+
+    def test_deploy_check_flags_the_in_process_backend(self):
+        self.assertEqual([warning.id for warning in checks.check_reservation_events_backend(None)], ['accounts.W001'])
+        with override_settings(RESERVATION_EVENTS_BACKEND='myproject.events.RedisBackend'):
+            self.assertEqual(checks.check_reservation_events_backend(None), [])
+
+
+def _form_view(request):
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('panel/form/', _form_view),
+    path('panel/exempt/', csrf_exempt(_form_view)),
+]
+
+
+class WebMiddlewareTests(TenantTestCase):
+    def test_api_routes_skip_session_and_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.get('/services/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertEqual(set(response.cookies), set())
+        client.force_login(self.admin)  # Una cookie de sesión tampoco se lee en la API
+        self.assertFalse(hasattr(client.get('/services/').wsgi_request, 'session'))
+
+    def test_admin_and_allauth_keep_session_and_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        for path in ('/admin/login/', '/accounts/login/'):
+            response = client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertIn('csrftoken', response.cookies, path)
+            self.assertEqual(client.post(path, {'username': 'x', 'password': 'y'}).status_code, 403, path)
+
+        client.force_login(self.admin)
+        response = client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.admin)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_django_views_outside_web_routes_still_check_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertEqual(client.get('/panel/form/').status_code, 200)
+        self.assertEqual(client.post('/panel/form/').status_code, 403)
+        self.assertEqual(client.post('/panel/exempt/').status_code, 200)
+
+
+class StartupImportTests(SimpleTestCase):
+    """En un proceso nuevo: este ya tiene todo importado."""
+
+    PROBE = (
+        'import json, sys, django\n'
+        'django.setup()\n'
+        'from django.urls import resolve\n'
+        'views = [resolve(path).view_name for path in sys.argv[1:]]\n'
+        'print(json.dumps({"views": views, "modules": sorted(sys.modules)}))\n'
+    )
+    DEFERRED = ('allauth.urls', 'accounts.admin', 'accounts.social_views', 'numpy')
+
+    def probe(self, settings_module, *paths):
+        """Vistas resueltas y cuáles de ``DEFERRED`` quedaron importadas."""
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+        result = subprocess.run([sys.executable, '-c', self.PROBE, *paths], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout.splitlines()[-1])
+        return data['views'], {name for name in self.DEFERRED if name in data['modules']}
+
+    def test_api_profile_resolves_without_web_modules(self):
+        views, loaded = self.probe('backend.settings_api', '/reservations/', '/services/', '/sync/', '/api/token/')
+        self.assertEqual(views, ['reservation-list', 'service-list', 'sync', 'token_obtain_pair'])
+        self.assertEqual(loaded, set())
+
+    def test_full_profile_defers_admin_and_allauth_urls(self):
+        self.assertEqual(self.probe('backend.settings', '/reservations/')[1], set())
+        _, loaded = self.probe('backend.settings', '/reservations/', '/accounts/login/', '/admin/')
+        self.assertEqual(loaded, {'allauth.urls', 'accounts.admin'})
+
+
+class ExplainAuditTests(TestCase):
+    PROBES = {
+        'test.description': lambda seed: list(Service.objects.filter(description='Explain')),
+        'test.pk': lambda seed: list(Service.objects.filter(pk=1)),
+    }
+
+    def findings(self, name):
+        _, queries = explain.capture(self.PROBES[name], None)
+        return [(kind, table) for sql in queries for kind, table, _, _ in explain.explain(sql)]
+
+    def test_full_scan_is_flagged_and_primary_key_lookup_is_not(self):
+        self.assertIn((explain.FULL_SCAN, 'accounts_service'), self.findings('test.description'))
+        self.assertEqual(self.findings('test.pk'), [])
+
+    def test_candidate_index_for_unindexed_filter(self):
+        _, (sql,) = explain.capture(self.PROBES['test.description'], None)
+        _, table, alias, _ = explain.explain(sql)[0]
+        self.assertEqual(explain.candidate_index(sql, explain.FULL_SCAN, table, alias), 'accounts_service(description)')
+
+    def test_command_fails_only_on_findings_missing_from_baseline(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(explain, 'probes', lambda: self.PROBES):
+            baseline = os.path.join(directory, 'baseline.json')
+            with open(baseline, 'w') as handle:
+                json.dump({'sqlite': []}, handle)
+            with self.assertRaisesMessage(CommandError, 'test.description|full_scan|accounts_service'):
+                call_command('explain_audit', baseline=baseline, reservations=16, stdout=io.StringIO())
+
+            call_command('explain_audit', baseline=baseline, reservations=16, save_baseline=True, stdout=io.StringIO())
+            out = io.StringIO()
+            call_command('explain_audit', baseline=baseline, reservations=16, stdout=out)
+        self.assertIn('Sin recorridos nuevos.', out.getvalue())
+
+
+class DashboardTests(ServicesTestCase):
+    NOW = datetime(2030, 1, 7, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('django.utils.timezone.now', return_value=self.NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def book(self, hour, service, status, barber=None, days=0, **fields):
+        return Reservation.objects.create(shop=self.shop, id_client=self.client_user, id_barber=barber or self.barber,
+                                          id_service=service, status=status,
+                                          date=self.NOW.replace(hour=hour) + timedelta(days=days), **fields)
+
+    def test_today_numbers_in_one_query(self):
+        done = self.book(9, self.cut, 'completed')
+        Payment.objects.create(reservation=done, amount=Decimal('90.00'), method='cash')
+        self.book(10, self.beard, 'canceled')
+        following = self.book(14, self.cut, 'pending', person_name='Ana')
+        self.book(15, self.beard, 'confirmed')
+        self.book(10, self.cut, 'pending', days=1)
+        self.book(13, self.cut, 'confirmed', barber=self.other_barber)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            data = dashboard.get_dashboard(self.barber.id)
+        self.assertEqual(data, {
+            'today_total': 3, 'today_completed': 1, 'today_remaining': 2, 'pending_confirmations': 2,
+            'booked_minutes': 80, 'expected_today': '250.00', 'takings_today': '90.00',
+            'next_client': {'id': following.id, 'date': '2030-01-07T14:00:00Z', 'name': 'Ana',
+                            'phone_number': '0000000000', 'service': 'Corte'},
+            'date': '2030-01-07',
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard.get_dashboard(self.barber.id), data)
+
+    def test_empty_day_and_payment_invalidation(self):
+        reservation = self.book(9, self.cut, 'completed')
+        data = dashboard.get_dashboard(self.barber.id)
+        self.assertEqual((data['takings_today'], data['booked_minutes'], data['next_client']), ('0.00', 30, None))
+
+        Payment.objects.create(reservation=reservation, amount=Decimal('100.00'), method='card')
+        self.assertEqual(dashboard.get_dashboard(self.barber.id)['takings_today'], '100.00')
+        self.assertEqual(dashboard.get_dashboard(self.other_barber.id)['today_total'], 0)
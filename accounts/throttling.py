@@ -0,0 +1,167 @@
+"""
+Throttling por token bucket compartido entre workers.
+
+Las tasas se configuran en ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` con
+las claves ``<scope>_ip`` y ``<scope>_identity`` (formato DRF, p. ej.
+``'10/hour'``: cubeta de 10 fichas que se rellena a 10 por hora). Si una
+clave no está configurada ese límite no se aplica.
+
+Las dos cubetas de una petición (IP e identidad) se comprueban juntas: con la
+caché de Redis es una sola llamada EVALSHA que lee, rellena y descuenta ambas
+de forma atómica, y solo descuenta si las dos tienen ficha. Con otras cachés
+(LocMem en desarrollo) se usa get_many/set_many protegido por un lock del
+proceso: es atómico solo dentro de ese proceso, no entre workers.
+"""
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache, caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# KEYS: cubetas; ARGV: capacidad y recarga por segundo de cada una, luego el TTL
+TOKEN_BUCKET_LUA = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local ttl = ARGV[#KEYS * 2 + 1]
+local levels = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local refill = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if tokens == nil then
+        tokens = capacity
+        ts = now
+    end
+    tokens = math.min(capacity, tokens + (now - ts) * refill)
+    if tokens < 1 then
+        allowed = 0
+    end
+    levels[i] = tokens
+end
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if allowed == 1 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, ttl)
+    result[i + 1] = tostring(tokens)
+end
+return result
+"""
+
+_local_lock = threading.Lock()
+_redis_script = None
+
+
+def _redis_client():
+    """Cliente de redis-py detrás de la caché por defecto, o None si no es Redis."""
+    default = caches['default']
+    backend = type(default).__module__
+    if backend == 'django.core.cache.backends.redis':
+        return default._cache.get_client(write=True)
+    if backend.startswith('django_redis'):
+        return default.client.get_client(write=True)
+    return None
+
+
+def consume(buckets):
+    """
+    Intenta sacar una ficha de cada cubeta de ``buckets`` (``[(clave,
+    capacidad, recarga por segundo), ...]``); solo las descuenta si todas
+    tienen. Devuelve ``(permitido, [fichas restantes de cada cubeta])``.
+    """
+    global _redis_script
+    ttl = max(int(capacity / refill) for _, capacity, refill in buckets) + 1
+    client = _redis_client()
+    if client is not None:
+        if _redis_script is None:
+            _redis_script = client.register_script(TOKEN_BUCKET_LUA)
+        args = [value for _, capacity, refill in buckets for value in (capacity, refill)]
+        allowed, *levels = _redis_script(
+            keys=[cache.make_and_validate_key(key) for key, _, _ in buckets],
+            args=args + [ttl],
+            client=client,
+        )
+        return bool(allowed), [float(tokens) for tokens in levels]
+
+    # Sin Redis: atómico solo dentro del proceso
+    with _local_lock:
+        now = time.time()
+        stored = cache.get_many([key for key, _, _ in buckets])
+        levels = []
+        for key, capacity, refill in buckets:
+            tokens, stamp = stored.get(key) or (capacity, now)
+            levels.append(min(capacity, tokens + (now - stamp) * refill))
+        allowed = all(tokens >= 1 for tokens in levels)
+        if allowed:
+            levels = [tokens - 1 for tokens in levels]
+        cache.set_many({key: (tokens, now) for (key, _, _), tokens in zip(buckets, levels)}, ttl)
+    return allowed, levels
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base: las subclases definen ``scope``; ``kinds`` son las cubetas que se comprueban juntas."""
+    scope = None
+    kinds = ('ip', 'identity')
+    identity_field = 'email'
+
+    def __init__(self):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        self.rates = {kind: rates.get(f'{self.scope}_{kind}') for kind in self.kinds}
+        self.wait_seconds = None
+
+    @staticmethod
+    def parse_rate(rate):
+        num, period = rate.split('/')
+        seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), int(num) / seconds
+
+    def get_identity(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        value = request.data.get(self.identity_field) if hasattr(request, 'data') else None
+        if not value:
+            return None
+        return str(value).strip().lower()
+
+    def get_cache_key(self, request, kind):
+        if kind == 'ip':
+            ident = self.get_ident(request)
+        else:
+            ident = self.get_identity(request)
+            if ident is None:
+                return None
+        digest = hashlib.sha1(ident.encode()).hexdigest()[:20]  # No guardar emails en claro
+        return f'throttle:{self.scope}:{kind}:{digest}'
+
+    def allow_request(self, request, view):
+        buckets = []
+        for kind, rate in self.rates.items():
+            key = self.get_cache_key(request, kind) if rate else None
+            if key is not None:
+                buckets.append((key, *self.parse_rate(rate)))
+        if not buckets:
+            return True
+
+        allowed, levels = consume(buckets)
+        if not allowed:
+            self.wait_seconds = max(
+                (1 - tokens) / refill for (_, _, refill), tokens in zip(buckets, levels) if tokens < 1
+            )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def bucket_throttles(scope, identity_field='email'):
+    """Throttle por IP y por identidad para ``scope``, listo para ``throttle_classes``."""
+    name = ''.join(part.title() for part in scope.split('_'))
+    return [type(f'{name}Throttle', (TokenBucketThrottle,), {'scope': scope, 'identity_field': identity_field})]
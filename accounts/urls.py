@@ -3,35 +3,60 @@ from rest_framework.routers import DefaultRouter
 
 from accounts.views import (
     UserViewSet, BarberScheduleViewSet,
-    ServiceViewSet, ReservationViewSet,
-    PaymentViewSet, UserCardViewSet,
-    GoogleLogin,  # 👈 Importamos la vista personalizada para login con Google
+    ServiceViewSet, BarberServiceViewSet, ReservationViewSet,
+    PaymentViewSet, UserCardViewSet, RecurringReservationViewSet,
     home, logout_view
 )
 from .views import user_profile
 from .views import register_social_user 
 from .views import horas_ocupadas
+from .views import barber_calendar
+from .views import search_view
+from .views import utilization_report
+from .views import audit_log
+from .views import sync_view
+from .views import barber_dashboard
+from .views import slot_holds, slot_hold_detail, confirm_slot_hold
+from .views import service_availability, first_available
+from .metrics import metrics_view
 
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'barber-schedules', BarberScheduleViewSet, basename='barberschedule')
 router.register(r'services', ServiceViewSet)
+router.register(r'barber-services', BarberServiceViewSet, basename='barberservice')
 router.register(r'reservations', ReservationViewSet)
 router.register(r'payments', PaymentViewSet, basename='payment')
 router.register(r'cards', UserCardViewSet, basename='usercard')
+router.register(r'recurrences', RecurringReservationViewSet, basename='recurrence')
 
-urlpatterns = [
-    path('', home),  # Vista HTML de prueba
-    path('logout/', logout_view),  # Vista personalizada para cerrar sesión
-
-    # API de login social con Google
-    path('accounts/google/login/token/', GoogleLogin.as_view(), name='google_login_token'),
+# Rutas de la API (también las sirve backend.urls_api en los workers solo-API).
+# El login con Google está en backend.urls para cargarlo bajo demanda
+api_urlpatterns = [
     path('usuarios/social/', register_social_user),
     path('users/me/', user_profile),
+    path('barbers/me/dashboard/', barber_dashboard, name='barber-dashboard'),  # Resumen del día del barbero
+    path('search/', search_view, name='search'),  # Búsqueda indexada (?q=, ?type=user,service,reservation)
+    path('barbers/calendar/<str:token>.ics', barber_calendar, name='barber-calendar'),  # Feed .ics firmado por barbero
+    path('availability/', service_availability, name='availability'),  # Turnos libres de un servicio por barbero
+    path('availability/first/', first_available, name='first-available'),  # Primer turno libre con cualquier barbero capaz
+    path('holds/', slot_holds, name='slot-holds'),  # Reserva provisional de un turno durante el checkout
+    path('holds/<str:hold_id>/', slot_hold_detail, name='slot-hold-detail'),
+    path('holds/<str:hold_id>/confirm/', confirm_slot_hold, name='slot-hold-confirm'),
+    path('sync/', sync_view, name='sync'),  # Cambios desde ?since=<token> para la app offline
+    path('reports/utilization/', utilization_report, name='utilization-report'),  # Ocupación por franja (?date_from=&date_to=)
+    path('audit/', audit_log, name='audit-log'),  # Historial de cambios (?entity=&id= o ?actor=)
+    path('metrics', metrics_view, name='metrics'),  # Formato de texto de Prometheus
     
 
     # Rutas REST
     path('', include(router.urls)),
 ]
 
+urlpatterns = [
+    path('', home),  # Vista HTML de prueba
+    path('logout/', logout_view),  # Vista personalizada para cerrar sesión
+    *api_urlpatterns,
+]
+
@@ -0,0 +1,140 @@
+"""
+Mapa de ocupación para planificar capacidad: barbero × día de la semana ×
+franja de 15 minutos.
+
+Se leen las reservas del rango con un solo ``values_list`` (barbero, fecha,
+duración del servicio) y se reparten en un tensor de NumPy de minutos
+reservados; la capacidad sale de los ``BarberSchedule`` multiplicada por las
+veces que cada día de la semana cae en el rango. La ocupación es
+reservados / capacidad en porcentaje (None donde el barbero no trabaja).
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import BarberSchedule, CustomUser, Reservation
+from .schedule import weekday_index
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEKDAYS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+ACTIVE_STATUSES = ('pending', 'confirmed', 'completed')
+
+def _minutes_per_slot(start_minute, end_minute):
+    """Minutos de [start, end) que caen en cada franja del día (vector de SLOTS_PER_DAY)."""
+    edges = np.arange(SLOTS_PER_DAY) * SLOT_MINUTES
+    return np.clip(np.minimum(edges + SLOT_MINUTES, end_minute) - np.maximum(edges, start_minute), 0, SLOT_MINUTES)
+
+
+def _local_offsets(seconds):
+    """Desfase UTC -> hora local de cada instante, calculado una vez por hora distinta."""
+    hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+    zone = timezone.get_current_timezone()
+    offsets = np.array([
+        int(datetime.fromtimestamp(int(hour) * 3600, zone).utcoffset().total_seconds())
+        for hour in hours
+    ], dtype=np.int64)
+    return offsets[inverse]
+
+
+def compute(date_from, date_to, barber_ids=None, shop_id=None):
+    """
+    Ocupación entre ``date_from`` y ``date_to`` (fechas, ambas incluidas).
+    Devuelve ``(barber_ids, booked, capacity)`` con tensores de minutos de
+    forma (barberos, 7, SLOTS_PER_DAY).
+    """
+    barbers = CustomUser.objects.filter(role=1)
+    if barber_ids:
+        barbers = barbers.filter(id__in=barber_ids)
+    if shop_id is not None:
+        barbers = barbers.filter(shop_id=shop_id)
+    ids = list(barbers.order_by('id').values_list('id', flat=True))
+    position = {barber_id: index for index, barber_id in enumerate(ids)}
+    shape = (len(ids), 7, SLOTS_PER_DAY)
+
+    # Capacidad: minutos de horario por franja × veces que el día cae en el rango
+    days = (date_to - date_from).days + 1
+    occurrences = np.bincount((np.arange(days) + date_from.weekday()) % 7, minlength=7)
+    capacity = np.zeros(shape)
+    schedules = BarberSchedule.objects.filter(id_barber_id__in=ids).values_list(
+        'id_barber_id', 'days', 'start_time', 'end_time')
+    for barber_id, schedule_days, start, end in schedules:
+        minutes = _minutes_per_slot(start.hour * 60 + start.minute, end.hour * 60 + end.minute)
+        for day in schedule_days or []:
+            index = weekday_index(day)
+            if index is not None:
+                capacity[position[barber_id], index] += minutes * occurrences[index]
+    np.minimum(capacity, SLOT_MINUTES * occurrences[None, :, None], out=capacity)  # Horarios solapados
+
+    # Reservas: una sola consulta
+    start_at = timezone.make_aware(datetime.combine(date_from, time.min))
+    end_at = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    # La fecha se pide como texto (UTC, "YYYY-MM-DD HH:MM:SS...") y la parsea
+    # NumPy de una vez: convertir cada fila a datetime aware es lo más caro
+    rows = list(
+        Reservation.objects
+        .filter(id_barber_id__in=ids, status__in=ACTIVE_STATUSES, date__gte=start_at, date__lt=end_at)
+        .annotate(date_text=Cast('date', CharField()))
+        .values_list('id_barber_id', 'date_text', 'id_service__time')
+    )
+    booked = np.zeros(len(ids) * 7 * SLOTS_PER_DAY)
+    if rows:
+        barber_col, dates, durations = zip(*rows)
+        barber_index = np.searchsorted(ids, np.asarray(barber_col, dtype=np.int64))  # ids va ordenado
+        seconds = np.array([text[:19] for text in dates], dtype='datetime64[s]').astype(np.int64)
+        local = seconds + _local_offsets(seconds)
+        weekday = (local // 86400 + 3) % 7  # 1970-01-01 fue jueves
+        start_minute = (local % 86400) // 60
+        end_minute = start_minute + np.asarray(durations, dtype=np.int64)
+
+        # Cada reserva se reparte entre las franjas que cubre (puede pasar de medianoche)
+        first_slot = start_minute // SLOT_MINUTES
+        for step in range(int(np.max((end_minute - 1) // SLOT_MINUTES - first_slot)) + 1):
+            slot = first_slot + step
+            covered = np.clip(
+                np.minimum(end_minute, (slot + 1) * SLOT_MINUTES) - np.maximum(start_minute, slot * SLOT_MINUTES),
+                0, SLOT_MINUTES,
+            )
+            flat = (barber_index * 7 + (weekday + slot // SLOTS_PER_DAY) % 7) * SLOTS_PER_DAY + slot % SLOTS_PER_DAY
+            booked += np.bincount(flat, weights=covered, minlength=booked.size)
+    return ids, booked.reshape(shape), capacity
+
+
+def _percent(booked, capacity):
+    """booked / capacity en %, NaN donde no hay horario (puede pasar de 100 con sobrecupo)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(capacity > 0, np.round(booked / capacity * 100, 1), np.nan)
+
+
+def report(date_from, date_to, barber_ids=None, shop_id=None):
+    ids, booked, capacity = compute(date_from, date_to, barber_ids, shop_id)
+    heatmap = _percent(booked, capacity)
+    by_weekday = _percent(booked.sum(axis=2), capacity.sum(axis=2))
+    overall = _percent(booked.sum(axis=(1, 2)), capacity.sum(axis=(1, 2)))
+    outside = booked.sum(axis=(1, 2)) - np.where(capacity > 0, booked, 0).sum(axis=(1, 2))
+
+    def clean(values):
+        return [None if np.isnan(value) else float(value) for value in values]
+
+    names = dict(CustomUser.objects.filter(id__in=ids).values_list('id', 'first_name'))
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'slot_minutes': SLOT_MINUTES,
+        'weekdays': WEEKDAYS,
+        'slots': [f'{minute // 60:02d}:{minute % 60:02d}' for minute in range(0, 24 * 60, SLOT_MINUTES)],
+        'barbers': [
+            {
+                'id': barber_id,
+                'name': names.get(barber_id, ''),
+                'utilization': None if np.isnan(overall[index]) else float(overall[index]),
+                'by_weekday': clean(by_weekday[index]),
+                'minutes_outside_schedule': int(outside[index]),
+                'heatmap': [clean(row) for row in heatmap[index]],
+            }
+            for index, barber_id in enumerate(ids)
+        ],
+    }
@@ -1,21 +1,42 @@
 # accounts/views.py
+from datetime import datetime, time, timedelta
+from itertools import chain
+
 from rest_framework import status, viewsets, serializers
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from django.shortcuts import render, redirect
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.http import parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_GET
 from django.contrib.auth import logout
 from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import CustomUser, BarberSchedule, Service, Reservation, Payment, UserCard
+from .models import (
+    CustomUser, BarberSchedule, Service, BarberService, Reservation, Payment, UserCard, ArchivedReservation,
+    RecurringReservation, SyncTombstone, AuditEntry,
+)
 from .serializers import (
-    CustomUserSerializer, BarberScheduleSerializer, ServiceSerializer,
-    ReservationSerializer, PaymentSerializer, UserCardSerializer
+    CustomUserSerializer, BarberScheduleSerializer, ServiceSerializer, BarberServiceSerializer,
+    ReservationSerializer, PaymentSerializer, UserCardSerializer, RecurringReservationSerializer,
+    AuditEntrySerializer,
 )
 from accounts.permissions import IsAdmin, UserPermissionsHelper
-
-from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
-from dj_rest_auth.registration.views import SocialLoginView
+from . import (
+    archive, audit, availability, calendar_feed, capabilities, dashboard, holds, recurrence, revocation, search,
+    sync,
+)
+from .audit import AuditedViewMixin
+from .tenancy import TenantScopedViewMixin, resolve_shop_id, use_shop
+from .fastlist import FastListMixin
+from .flyweight import ServiceFlyweight
+from .throttling import bucket_throttles
 
 def home(request):
     return render(request, 'home.html')
@@ -24,10 +45,44 @@ def logout_view(request):
     logout(request)
     return redirect('/')
 
-class GoogleLogin(SocialLoginView):
-    adapter_class = GoogleOAuth2Adapter
+# Cierre de sesión de la app (JWT): revoca el access token usado y el refresh que se envíe
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def jwt_logout(request):
+    refresh = request.data.get('refresh')
+    if refresh:
+        try:
+            refresh = RefreshToken(refresh)
+        except TokenError:
+            return Response({'error': 'El refresh token no es válido.'}, status=400)
+        revocation.revoke_token(refresh)
+    revocation.revoke_token(request.auth)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SparseFieldsetsViewMixin:
+    """
+    Ajusta el queryset a los campos que el serializador va a devolver
+    (``?fields=`` / ``?expand=``): select_related solo de las relaciones
+    usadas y only() con las columnas necesarias.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'get_queryset_plan'):
+            return queryset
+
+        related, only, complete = serializer.get_queryset_plan(queryset.model)
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        if complete:
+            queryset = queryset.only(*sorted(only))
+        return queryset
 
-class BarberScheduleViewSet(viewsets.ModelViewSet):
+class BarberScheduleViewSet(TenantScopedViewMixin, FastListMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     serializer_class = BarberScheduleSerializer
     queryset = BarberSchedule.objects.all()
 
@@ -42,10 +97,14 @@ class BarberScheduleViewSet(viewsets.ModelViewSet):
             schedules = BarberSchedule.objects.filter(id_barber=barber_id)
         else:
             schedules = BarberSchedule.objects.all()
-        serializer = self.get_serializer(schedules, many=True)
+        if self.use_fast_list():
+            response = self.fast_list_response(self.filter_queryset(schedules))
+            if response is not None:
+                return response
+        serializer = self.get_serializer(self.filter_queryset(schedules), many=True)
         return Response(serializer.data)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(TenantScopedViewMixin, AuditedViewMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
 
@@ -70,10 +129,30 @@ class UserViewSet(viewsets.ModelViewSet):
             request.user, data=request.data, partial=True
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.audited_save(serializer)
         return Response(serializer.data)
     
-    @action(detail=False, methods=['post'], url_path='update-password-by-email', permission_classes=[AllowAny])
+    @action(detail=False, methods=['get'], url_path='me/calendar-link', permission_classes=[IsAuthenticated])
+    def calendar_link(self, request):
+        """Enlace firmado al feed .ics del barbero (un admin puede pedir el de otro con ?barber_id=)."""
+        barber_id = request.user.id
+        if request.user.role == 0 and request.query_params.get('barber_id'):
+            try:
+                barber_id = int(request.query_params['barber_id'])
+            except ValueError:
+                return Response({'error': 'barber_id debe ser un número.'}, status=400)
+            # El enlace expone la agenda con nombres de clientes: solo barberos de la misma barbería
+            barbers = CustomUser.objects.filter(id=barber_id, role=1, shop_id=resolve_shop_id(request))
+            if not barbers.exists():
+                return Response({'detail': 'El barbero no existe.'}, status=status.HTTP_404_NOT_FOUND)
+        elif request.user.role != 1:
+            return Response({'detail': 'Solo los barberos tienen agenda.'}, status=status.HTTP_403_FORBIDDEN)
+
+        path = reverse('barber-calendar', args=[calendar_feed.make_token(barber_id)])
+        return Response({'url': request.build_absolute_uri(path)})
+
+    @action(detail=False, methods=['post'], url_path='update-password-by-email', permission_classes=[AllowAny],
+            throttle_classes=bucket_throttles('password_update'))
     def update_password_by_email(self, request):
         email = request.data.get('email')
         new_password = request.data.get('password')
@@ -86,8 +165,11 @@ class UserViewSet(viewsets.ModelViewSet):
 
         try:
             user = CustomUser.objects.get(email=email)
+            before = audit.snapshot(user)
             user.password = make_password(new_password)  # Hashea la contraseña
             user.save()
+            audit.record(user, 'update', before, actor=request.user)
+            revocation.revoke_user(user.id)  # Los tokens emitidos con la contraseña vieja dejan de valer
             return Response({'detail': 'Contraseña actualizada correctamente.'}, status=status.HTTP_200_OK)
         except CustomUser.DoesNotExist:
             return Response({'detail': 'No se encontró un usuario con ese correo.'}, status=status.HTTP_404_NOT_FOUND)
@@ -98,17 +180,25 @@ class UserViewSet(viewsets.ModelViewSet):
         if response:
             return response
         serializer.save()
+        audit.record(serializer.instance, 'create', actor=self.request.user)
 
     def perform_update(self, serializer):
         user = self.get_object()
         if self.request.user.role != 0:
             for field in ['is_active', 'role', 'salary']:
                 serializer.validated_data.pop(field, None)
-        serializer.save()
+        self.audited_save(serializer)
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(TenantScopedViewMixin, FastListMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
+    # cached_details en el listado rápido: se carga el flyweight con la misma fila
+    fast_method_fields = {
+        'cached_details': (
+            ('id', 'name', 'price', 'time'),
+            lambda row: ServiceFlyweight.prime(row['id'], row['name'], row['price'], row['time']),
+        ),
+    }
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -121,8 +211,28 @@ class ServiceViewSet(viewsets.ModelViewSet):
             return Service.objects.filter(category=category)
         return super().get_queryset()
 
+# Qué servicios hace cada barbero: lo gestiona el admin, lo puede leer cualquiera
+class BarberServiceViewSet(TenantScopedViewMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
+    queryset = BarberService.objects.all()
+    serializer_class = BarberServiceSerializer
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            return [AllowAny()]
+        return [IsAdmin()]
+
+    def get_queryset(self):
+        queryset = BarberService.objects.select_related('service')
+        barber_id = self.request.query_params.get('barber_id')
+        if barber_id:
+            queryset = queryset.filter(barber_id=barber_id)
+        service_id = self.request.query_params.get('service_id')
+        if service_id:
+            queryset = queryset.filter(service_id=service_id)
+        return queryset
+
 # Sección de vistas para las reservas y pagos
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(TenantScopedViewMixin, AuditedViewMixin, FastListMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
     permission_classes = [AllowAny]
@@ -132,33 +242,85 @@ class ReservationViewSet(viewsets.ModelViewSet):
         if self.request.method == 'PATCH':
             return Reservation.objects.all()
 
-        user = self.request.user
+        return self.scope_queryset(Reservation.objects.all())
+
+    def scope_queryset(self, queryset):
+        """Filtra reservas (calientes o archivadas) según el usuario y los parámetros."""
+        queryset = self.scope_to_user(queryset)
         status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+
+        date_from, date_to = self.get_date_range()
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lt=date_to)
+
+        return queryset
+
+    def scope_to_user(self, queryset):
+        """Lo que puede ver el usuario (también lo usa /sync/ con las lápidas)."""
+        user = self.request.user
         barber_id_param = self.request.query_params.get('barber_id')
 
         if user.is_authenticated:
             if user.role == 0:  # Admin
-                queryset = Reservation.objects.all()
+                pass
             elif user.role == 1:  # Barbero
-                queryset = Reservation.objects.filter(id_barber=user)
+                queryset = queryset.filter(id_barber=user)
             elif user.role == 2:  # Cliente
-                queryset = Reservation.objects.filter(id_client=user)
+                queryset = queryset.filter(id_client=user)
             else:
-                queryset = Reservation.objects.none()
+                queryset = queryset.none()
         else:
             if barber_id_param:
                 try:
-                    barber = CustomUser.objects.get(id=barber_id_param, role=1)
-                    queryset = Reservation.objects.filter(id_barber=barber)
+                    barber = self.scope_to_shop(CustomUser.objects.all()).get(id=barber_id_param, role=1)
+                    queryset = queryset.filter(id_barber=barber)
                 except CustomUser.DoesNotExist:
-                    queryset = Reservation.objects.none()
+                    queryset = queryset.none()
             else:
-                queryset = Reservation.objects.none()
+                queryset = queryset.none()
+        return queryset
 
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
+    def get_date_range(self):
+        """Lee ?date_from= / ?date_to= (fecha o fecha-hora ISO; date_to es inclusivo para fechas)."""
+        def parse(name, end=False):
+            value = self.request.query_params.get(name)
+            if not value:
+                return None
+            # La fecha sola primero: parse_datetime también la acepta, como medianoche
+            day = parse_date(value)
+            if day is not None:
+                parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+            else:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    raise serializers.ValidationError({name: 'Formato inválido, usa YYYY-MM-DD.'})
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            return parsed
+        return parse('date_from'), parse('date_to', end=True)
 
-        return queryset
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        barber, service, date = data.get('id_barber'), data.get('id_service'), data.get('date')
+        # Un turno que otro cliente tiene en checkout (hold) no se puede reservar directamente
+        if barber and service and date and holds.is_held(barber.id, date, service.time):
+            raise holds.conflict('reservation')
+        self.audited_save(serializer)
+
+    def list(self, request, *args, **kwargs):
+        # Solo se consulta el archivo si el rango pedido llega a datos archivados
+        if request.query_params.get('date_from') or request.query_params.get('date_to'):
+            date_from, _ = self.get_date_range()
+            if archive.needs_archive(date_from, self.shop_id):
+                hot = self.filter_queryset(self.get_queryset())
+                cold = self.filter_queryset(self.scope_queryset(ArchivedReservation.objects.all()))
+                rows = sorted(chain(cold, hot), key=lambda row: (row.date is None, row.date, row.id))
+                return Response(self.get_serializer(rows, many=True).data)
+        return super().list(request, *args, **kwargs)
 
  
 
@@ -207,20 +369,46 @@ def partial_update(self, request, *args, **kwargs):
             # Llamamos a la implementación base que hace el update
             return super().partial_update(request, *args, **kwargs)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(TenantScopedViewMixin, AuditedViewMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    tenant_lookup = 'reservation__shop_id'
 
     def get_queryset(self):
         return Payment.objects.all()
 
-class UserCardViewSet(viewsets.ModelViewSet):
+class UserCardViewSet(TenantScopedViewMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     queryset = UserCard.objects.all()
     serializer_class = UserCardSerializer
+    tenant_lookup = 'user__shop_id'
 
     def get_queryset(self):
         return UserCard.objects.all()
 
+# Citas fijas: se crean/cancelan aquí; las reservas las genera accounts.recurrence
+class RecurringReservationViewSet(TenantScopedViewMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
+    serializer_class = RecurringReservationSerializer
+    queryset = RecurringReservation.objects.all()
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']  # Cambiar una cita fija = cancelar y crear otra
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = RecurringReservation.objects.select_related('id_service')
+        if user.role == 1:
+            return queryset.filter(id_barber=user)
+        if user.role == 2:
+            return queryset.filter(id_client=user)
+        return queryset
+
+    def perform_create(self, serializer):
+        rule = serializer.save(id_client=self.request.user)
+        # Las primeras ocurrencias se generan ya; el resto, el job incremental
+        recurrence.materialize_rules([rule], recurrence.horizon_date())
+
+    def perform_destroy(self, instance):
+        recurrence.cancel(instance)
+
 
 
 @api_view(['GET'])
@@ -239,6 +427,7 @@ def user_profile(request):
 
 
 @api_view(['POST'])
+@throttle_classes(bucket_throttles('social_register'))
 def register_social_user(request):
     email = request.data.get('email')
     name = request.data.get('name')
@@ -259,6 +448,7 @@ def register_social_user(request):
             'is_active': True,
             'password': password,
             'phone_number': '0000000000',
+            'shop_id': resolve_shop_id(request),
         }
     )
 
@@ -271,7 +461,165 @@ def register_social_user(request):
 
     return Response({'message': 'Usuario creado correctamente'}, status=status.HTTP_201_CREATED)
     
+# Resumen del día del barbero (un admin puede ver el de otro con ?barber_id=)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def barber_dashboard(request):
+    barber_id = request.user.id
+    if request.user.role == 0 and request.GET.get('barber_id'):
+        try:
+            barber_id = int(request.GET['barber_id'])
+        except ValueError:
+            return Response({'error': 'barber_id debe ser un número.'}, status=400)
+        shop_id = resolve_shop_id(request)
+        if shop_id is not None and not CustomUser.objects.filter(id=barber_id, shop_id=shop_id).exists():
+            return Response({'detail': 'El barbero no existe.'}, status=status.HTTP_404_NOT_FOUND)
+    elif request.user.role != 1:
+        return Response({'detail': 'Solo los barberos tienen dashboard.'}, status=status.HTTP_403_FORBIDDEN)
+
+    data = dashboard.get_dashboard(barber_id)
+    if data is None:
+        return Response({'detail': 'El barbero no existe.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data)
+
+# Búsqueda de clientes, servicios y reservas recientes para recepción
 @api_view(['GET'])
+@permission_classes([IsAdmin])
+def search_view(request):
+    query = request.GET.get('q', '')
+    if len(query.strip()) < 2:
+        return Response({'error': 'El parámetro q debe tener al menos 2 caracteres.'}, status=400)
+
+    types = request.GET.get('type')
+    types = set(types.split(',')) if types else None
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 50)
+    except ValueError:
+        limit = 20
+    return Response(search.search(query, types=types, limit=limit, shop_id=resolve_shop_id(request)))
+
+# Sincronización incremental para la app: solo lo cambiado/borrado desde el token
+SYNC_TYPES = ('reservations', 'services', 'barber_schedules')
+
+@api_view(['GET'])
+def sync_view(request):
+    since = None
+    if request.GET.get('since'):
+        since = sync.read_token(request.GET['since'])
+        if since is None:
+            return Response({'error': 'Token de sincronización inválido.'}, status=400)
+        if since < timezone.now() - sync.retention():
+            since = None  # Sus lápidas ya se purgaron: sincronización completa
+    types = request.GET.get('types')
+    types = set(types.split(',')) & set(SYNC_TYPES) if types else set(SYNC_TYPES)
+    token = sync.next_token()  # Antes de leer: lo que cambie durante la lectura entra en la siguiente
+
+    # Mismo alcance que ReservationViewSet (rol del usuario, ?barber_id= anónimo y barbería)
+    scope = ReservationViewSet(request=request, format_kwarg=None, kwargs={})
+    scope.shop_id = resolve_shop_id(request)
+    tombstones = scope.scope_to_shop(SyncTombstone.objects.all())
+    sources = {
+        'reservations': (
+            'reservation', ReservationSerializer,
+            scope.scope_to_user(Reservation.objects.select_related('id_barber', 'id_client', 'id_service')),
+            scope.scope_to_user(tombstones),
+        ),
+        'services': ('service', ServiceSerializer, Service.objects.all(), tombstones),
+        'barber_schedules': ('barber_schedule', BarberScheduleSerializer, BarberSchedule.objects.all(), tombstones),
+    }
+
+    data = {'token': token, 'full': since is None}
+    for name in SYNC_TYPES:
+        if name not in types:
+            continue
+        entity_type, serializer_class, queryset, entity_tombstones = sources[name]
+        rows, deleted = sync.changes(scope.scope_to_shop(queryset), entity_tombstones, entity_type, since)
+        rows = list(rows)
+        if entity_type == 'service':
+            for service in rows:  # cached_details sin una consulta por servicio
+                ServiceFlyweight.prime(service.id, service.name, service.price, service.time)
+        updated = serializer_class(rows, many=True, context={'request': request}).data
+        # Una reserva reasignada y vuelta a cambiar va solo en updated
+        changed_ids = {row.pk for row in rows}
+        data[name] = {'updated': updated, 'deleted': sorted(set(deleted) - changed_ids)}
+    return Response(data)
+
+# Historial de cambios (accounts.audit): ?entity=reservation|payment|user&id= o ?actor=
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def audit_log(request):
+    try:
+        limit = min(int(request.GET.get('limit', 100)), 500)
+    except ValueError:
+        return Response({'error': 'limit debe ser un número.'}, status=400)
+    entity, entity_id, actor = request.GET.get('entity'), request.GET.get('id'), request.GET.get('actor')
+    try:
+        entity_id = int(entity_id) if entity_id else None
+        actor = int(actor) if actor else None
+    except ValueError:
+        return Response({'error': 'id y actor deben ser números.'}, status=400)
+    # Siempre dentro de una barbería: los índices del historial empiezan por shop
+    shop_id = resolve_shop_id(request)
+    if entity and entity_id is not None:
+        if entity not in dict(AuditEntry.ENTITY_CHOICES):
+            return Response({'error': 'entity debe ser reservation, payment o user.'}, status=400)
+        entries = audit.for_entity(shop_id, entity, entity_id)
+    elif actor is not None:
+        entries = audit.by_actor(shop_id, actor, parse_datetime(request.GET.get('since', '')))
+    else:
+        return Response({'error': 'Indica entity e id, o actor.'}, status=400)
+
+    audit.flush()  # Lo que este proceso aún tiene en el buffer también cuenta
+    return Response(AuditEntrySerializer(entries[:limit], many=True).data)
+
+# Mapa de ocupación barbero × día de la semana × franja de 15 min (planificación)
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def utilization_report(request):
+    date_from = parse_date(request.GET.get('date_from', ''))
+    date_to = parse_date(request.GET.get('date_to', ''))
+    if date_from is None or date_to is None:
+        return Response({'error': 'Los parámetros date_from y date_to (YYYY-MM-DD) son obligatorios.'}, status=400)
+    if date_to < date_from:
+        return Response({'error': 'date_to debe ser posterior a date_from.'}, status=400)
+    if (date_to - date_from).days > 366:
+        return Response({'error': 'El rango máximo es de un año.'}, status=400)
+
+    barber_ids = None
+    if request.GET.get('barber_id'):
+        try:
+            barber_ids = [int(value) for value in request.GET['barber_id'].split(',')]
+        except ValueError:
+            return Response({'error': 'barber_id debe ser una lista de ids separada por comas.'}, status=400)
+    from . import utilization  # NumPy se importa con el primer informe, no al arrancar el worker
+    return Response(utilization.report(date_from, date_to, barber_ids, shop_id=resolve_shop_id(request)))
+
+# Feed iCalendar del barbero; la firma del enlace hace de autenticación
+@require_GET
+def barber_calendar(request, token):
+    barber_id = calendar_feed.read_token(token)
+    if barber_id is None:
+        raise Http404
+
+    feed = calendar_feed.get_feed(barber_id)
+    if_none_match = request.headers.get('If-None-Match')
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if if_none_match is not None:
+        not_modified = feed['etag'] in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    else:
+        not_modified = bool(if_modified_since) and if_modified_since >= parse_http_date_safe(feed['last_modified'])
+
+    if not_modified:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(feed['body'], content_type='text/calendar; charset=utf-8')
+    response['ETag'] = feed['etag']
+    response['Last-Modified'] = feed['last_modified']
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+@api_view(['GET'])
+@throttle_classes(bucket_throttles('horas_ocupadas'))
 def horas_ocupadas(request):
     date_str = request.GET.get('date')
     barber_id = request.GET.get('id_barber')
@@ -285,6 +633,150 @@ def horas_ocupadas(request):
         return Response({'error': 'Formato de fecha inválido, usa YYYY-MM-DD'}, status=400)
 
     reservations = Reservation.objects.filter(date__date=date, id_barber=barber_id)
+    shop_id = resolve_shop_id(request)
+    if shop_id is not None:
+        reservations = reservations.filter(shop_id=shop_id)
     horas = [res.date.strftime("%H:%M") for res in reservations]
+    # Turnos que otros clientes tienen en checkout (holds vigentes)
+    horas += [hora for hora in holds.held_times(barber_id, date) if hora not in horas]
+
+    return Response(horas)
+
+
+# Turnos libres de un servicio con los barberos que lo hacen (ver accounts.availability)
+def _availability_service(request):
+    """Servicio activo de ?service= en la barbería de la petición, o una Response de error."""
+    try:
+        service_id = int(request.GET.get('service', ''))
+    except ValueError:
+        return None, Response({'error': 'El parámetro service (id del servicio) es obligatorio.'}, status=400)
+    service = capabilities.get_index().services.get(service_id)
+    shop_id = resolve_shop_id(request)
+    if service is None or (shop_id is not None and service[0] != shop_id):
+        return None, Response({'error': 'El servicio no existe.'}, status=404)
+    return service_id, None
 
-    return Response(horas)  
\ No newline at end of file
+
+def _availability_days(request, default, maximum):
+    try:
+        days = int(request.GET.get('days', default))
+    except ValueError:
+        days = 0
+    return days if 1 <= days <= maximum else None
+
+
+@api_view(['GET'])
+@throttle_classes(bucket_throttles('availability'))
+def service_availability(request):
+    """?service=&date=YYYY-MM-DD[&days=][&id_barber=]: turnos libres por barbero."""
+    service_id, error = _availability_service(request)
+    if error:
+        return error
+    day = parse_date(request.GET.get('date', ''))
+    if day is None:
+        return Response({'error': 'El parámetro date (YYYY-MM-DD) es obligatorio.'}, status=400)
+    days = _availability_days(request, 1, 14)
+    if days is None:
+        return Response({'error': 'days debe estar entre 1 y 14.'}, status=400)
+    barber_ids = None
+    if request.GET.get('id_barber'):
+        try:
+            barber_ids = {int(value) for value in request.GET['id_barber'].split(',')}
+        except ValueError:
+            return Response({'error': 'id_barber debe ser una lista de ids separada por comas.'}, status=400)
+
+    slots = availability.free_slots(service_id, day, days, barber_ids)
+    return Response({
+        'service': service_id,
+        'barbers': [
+            {'id_barber': barber_id, 'duration': terms.duration, 'price': str(terms.price),
+             'slots': [start.isoformat() for start in starts]}
+            for barber_id, (terms, starts) in sorted(slots.items())
+        ],
+    })
+
+
+@api_view(['GET'])
+@throttle_classes(bucket_throttles('availability'))
+def first_available(request):
+    """?service=[&from=fecha o fecha-hora][&days=]: primer turno libre con cualquier barbero que lo haga."""
+    service_id, error = _availability_service(request)
+    if error:
+        return error
+    after = None
+    if request.GET.get('from'):
+        after = parse_datetime(request.GET['from'])
+        if after is None:
+            day = parse_date(request.GET['from'])
+            if day is None:
+                return Response({'error': 'from debe ser una fecha o fecha-hora ISO.'}, status=400)
+            after = datetime.combine(day, time.min)
+        if timezone.is_naive(after):
+            after = timezone.make_aware(after)
+        after = max(after, timezone.now())
+    days = _availability_days(request, 14, 60)
+    if days is None:
+        return Response({'error': 'days debe estar entre 1 y 60.'}, status=400)
+
+    found = availability.first_available(service_id, after, days)
+    if found is None:
+        return Response({'detail': 'No hay turnos libres en el rango.'}, status=status.HTTP_404_NOT_FOUND)
+    barber_id, start, terms = found
+    return Response({
+        'service': service_id, 'id_barber': barber_id, 'date': start.isoformat(),
+        'duration': terms.duration, 'price': str(terms.price),
+    })
+
+
+# Reservas provisionales (holds) durante el checkout: POST crea el hold,
+# DELETE lo suelta y POST .../confirm/ lo convierte en reserva
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def slot_holds(request):
+    barber_id = request.data.get('id_barber')
+    service_id = request.data.get('id_service')
+    start = parse_datetime(str(request.data.get('date') or ''))
+    if not barber_id or not service_id or start is None:
+        return Response({'error': 'Parámetros requeridos: id_barber, id_service, date (fecha-hora ISO)'}, status=400)
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if start <= timezone.now():
+        return Response({'error': 'El turno debe ser futuro.'}, status=400)
+
+    shop_id = resolve_shop_id(request)
+    barbers = CustomUser.objects.filter(id=barber_id, role=1, is_active=True)
+    services = Service.objects.filter(id=service_id, active_service=True)
+    if shop_id is not None:
+        barbers, services = barbers.filter(shop_id=shop_id), services.filter(shop_id=shop_id)
+    service = services.first()
+    if service is None or not barbers.exists():
+        return Response({'error': 'El barbero o el servicio no existen.'}, status=400)
+    if not capabilities.can_perform(barber_id, service.id):
+        return Response({'error': 'El barbero no realiza este servicio.'}, status=400)
+
+    hold = holds.create_hold(int(barber_id), service, start, request.user.id)
+    return Response(hold, status=status.HTTP_201_CREATED)
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def slot_hold_detail(request, hold_id):
+    holds.release_hold(holds.get_hold(hold_id, request.user.id))
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirm_slot_hold(request, hold_id):
+    hold = holds.get_hold(hold_id, request.user.id)
+    serializer = ReservationSerializer(data={
+        'id_barber': hold['barber_id'],
+        'id_service': hold['service_id'],
+        'date': hold['start'],
+        'person_name': request.data.get('person_name'),
+        'pay': request.data.get('pay', False),
+    }, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    with use_shop(resolve_shop_id(request)):
+        reservation = holds.confirm_hold(hold, serializer.save)
+    audit.record(reservation, 'create', actor=request.user)
+    return Response(ReservationSerializer(reservation, context={'request': request}).data,
+                    status=status.HTTP_201_CREATED)
@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Se importa después de inicializar Django (usa modelos y settings)
+from accounts.realtime import ReservationEventStream  # noqa: E402
+
+reservation_events = ReservationEventStream()
+
+
+async def application(scope, receive, send):
+    # Stream SSE de reservas; el resto de rutas las atiende Django
+    if scope['type'] == 'http' and scope['path'] == '/events/reservations/':
+        return await reservation_events(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,40 @@
+"""
+Rutas que importan su vista (o sus URLs) en la primera petición que las usa
+y no al arrancar el worker.
+"""
+from django.urls import URLResolver
+from django.urls.resolvers import RoutePattern
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """Como ``View.as_view()`` pero importando la clase al primer uso."""
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True  # Igual que APIView.as_view()
+    return wrapper
+
+
+class _LazyURLConf:
+    def __init__(self, loader):
+        self.loader = loader
+
+    @cached_property
+    def urlpatterns(self):
+        return self.loader()
+
+
+def lazy_include(route, loader, app_name=None, namespace=None):
+    """
+    Como ``path(route, include(...))`` pero ``loader()`` (que devuelve la
+    lista de patrones) solo se llama cuando una petición empieza por
+    ``route`` o cuando se construye el índice de ``reverse()``.
+    """
+    return URLResolver(RoutePattern(route), _LazyURLConf(loader), app_name=app_name, namespace=namespace)
@@ -0,0 +1,85 @@
+"""
+Middleware por ruta. La API se autentica con JWT en DRF: sesión, CSRF, auth de
+Django, mensajes y clickjacking (``WEB_MIDDLEWARE``) solo hacen falta en el
+admin, allauth y las vistas HTML (``WEB_ROUTE_PREFIXES`` y ``WEB_ROUTE_PATHS``).
+El ``AccountMiddleware`` de allauth se queda en ``MIDDLEWARE``: allauth no
+arranca si no lo encuentra ahí.
+
+``RouteMiddlewareDispatcher`` arma esa cadena igual que
+``BaseHandler.load_middleware`` (con sus ``process_view``,
+``process_template_response`` y ``process_exception``) y la ejecuta solo en las
+rutas web; en el resto pasa directo al siguiente paso de ``MIDDLEWARE``.
+Fuera de ellas, una vista de Django que no sea de DRF (ni ``csrf_exempt``)
+pasa igual por ``CsrfViewMiddleware``: una vista de formularios que no se
+añada a las rutas web no queda sin protección CSRF.
+El costo por petición se mide con ``manage.py bench_middleware``.
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.module_loading import import_string
+
+CSRF_MIDDLEWARE = 'django.middleware.csrf.CsrfViewMiddleware'
+
+
+class RouteMiddlewareDispatcher:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.web_paths = frozenset(getattr(settings, 'WEB_ROUTE_PATHS', ()))
+        self.web_prefixes = tuple(getattr(settings, 'WEB_ROUTE_PREFIXES', ()))
+
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        handler = get_response
+        for middleware_path in reversed(getattr(settings, 'WEB_MIDDLEWARE', ())):
+            middleware = import_string(middleware_path)
+            try:
+                instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, 'process_view'):
+                self._view_middleware.insert(0, instance.process_view)
+            if hasattr(instance, 'process_template_response'):
+                self._template_response_middleware.append(instance.process_template_response)
+            if hasattr(instance, 'process_exception'):
+                self._exception_middleware.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.web_handler = handler
+        self._csrf = CsrfViewMiddleware(get_response) if CSRF_MIDDLEWARE in getattr(settings, 'WEB_MIDDLEWARE', ()) else None
+
+    def is_web_route(self, request):
+        path = request.path_info
+        return path in self.web_paths or path.startswith(self.web_prefixes)
+
+    def __call__(self, request):
+        if self.is_web_route(request):
+            return self.web_handler(request)
+        return self.get_response(request)
+
+    # Ganchos de la cadena web; BaseHandler los llama en todas las rutas
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_web_route(request):
+            for process_view in self._view_middleware:
+                response = process_view(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+        elif self._csrf is not None and not getattr(view_func, 'csrf_exempt', False):
+            # Las vistas de DRF son csrf_exempt; el resto no se sirve sin CSRF
+            return self._csrf.process_view(request, view_func, view_args, view_kwargs)
+        return None
+
+    def process_template_response(self, request, response):
+        if self.is_web_route(request):
+            for process_template_response in self._template_response_middleware:
+                response = process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_web_route(request):
+            for process_exception in self._exception_middleware:
+                response = process_exception(request, exception)
+                if response is not None:
+                    return response
+        return None
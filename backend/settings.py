@@ -14,10 +14,14 @@ from datetime import timedelta
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Cargar variables del archivo .env (una sola vez y antes de leer REDIS_URL, etc.)
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -39,7 +43,7 @@ INSTALLED_APPS = [
     'accounts',         # Agrega la aplicación de cuentas
     
     'corsheaders',
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',  # Sin autodiscover al arrancar (ver backend.urls)
     'django.contrib.auth',
     'rest_framework.authtoken',
     'django.contrib.contenttypes',
@@ -69,38 +73,151 @@ SOCIALACCOUNT_PROVIDERS = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # ✅ Aquí sí va
+        'accounts.revocation.RevocableJWTAuthentication',  # JWT + lista de revocación (accounts.revocation)
     ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',  # ✅ Esto está bien
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
-    )
+    ),
+    # Token bucket de accounts.throttling: <scope>_ip / <scope>_identity
+    'DEFAULT_THROTTLE_RATES': {
+        'horas_ocupadas_ip': '60/min',
+        'availability_ip': '60/min',
+        'password_recovery_ip': '10/hour',
+        'password_recovery_identity': '3/hour',
+        'validate_recovery_ip': '20/hour',
+        'validate_recovery_identity': '5/hour',
+        'social_register_ip': '20/hour',
+        'social_register_identity': '5/hour',
+        'password_update_ip': '10/hour',
+        'password_update_identity': '5/hour',
+    },
 }
 
+# Caché compartida entre workers (throttling, feeds .ics, etc.). Sin REDIS_URL
+# se usa la caché en memoria de cada proceso
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+# Listado rápido (sin serializadores por fila) para reservas, servicios y horarios.
+# Con False solo se usa cuando el cliente envía ?fast=1
+FAST_LIST_MODE = False
+
+# Días hacia atrás que incluye el feed .ics de cada barbero
+BARBER_ICS_PAST_DAYS = 30
+
+# Reservas completadas/canceladas más viejas que esto pasan al archivo (manage.py archive_reservations)
+RESERVATION_ARCHIVE_DAYS = 180
+
+# Segundos que se cachea /barbers/me/dashboard/ (se invalida al cambiar reservas o pagos)
+DASHBOARD_CACHE_SECONDS = 10
+
+# Días hacia atrás de reservas que entran en el índice de /search/; las que
+# salen de la ventana se borran con manage.py rebuild_search_index --prune
+SEARCH_RESERVATION_DAYS = 90
+
+# Días que se guardan las lápidas de borrados para /sync/; un token más viejo
+# recibe una sincronización completa (manage.py purge_sync_tombstones)
+SYNC_TOMBSTONE_DAYS = 30
+
+# Multi-barbería: con True toda petición sin barbería (usuario sin shop y sin
+# cabecera X-Shop) se rechaza en vez de ver todas las barberías
+TENANCY_REQUIRED = False
+
+# Segundos que dura una reserva provisional de turno (hold) durante el checkout.
+# Los holds viven en la caché: con varios workers hace falta REDIS_URL
+SLOT_HOLD_SECONDS = 300
+
+# Días hacia adelante en los que las citas fijas ya tienen su reserva creada
+# (manage.py materialize_recurrences, p. ej. una vez al día)
+RECURRENCE_HORIZON_DAYS = 28
+
+# Cada cuántos minutos puede empezar un turno en /availability/ (accounts.availability)
+AVAILABILITY_STEP_MINUTES = 15
+
+# Historial de cambios (accounts.audit): se escribe por lotes desde un hilo al
+# llegar a AUDIT_BATCH_SIZE entradas o cada AUDIT_FLUSH_SECONDS
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_SECONDS = 2.0
+AUDIT_ASYNC = True
+
+# Línea base de manage.py bench_suite (micro-benchmarks); solo es comparable en
+# la misma máquina. La del repositorio es de referencia: contra la de otra
+# máquina el comando no falla. Para usarlo como gate, BENCH_BASELINE apunta a
+# una generada en esa máquina con --save-baseline
+BENCH_BASELINE = os.getenv('BENCH_BASELINE', BASE_DIR / 'benchmarks' / 'baseline.json')
+
+# Hallazgos conocidos de manage.py explain_audit (recorridos completos, B-trees
+# temporales) por motor; un hallazgo nuevo hace fallar el comando
+EXPLAIN_BASELINE = BASE_DIR / 'benchmarks' / 'explain_baseline.json'
+
+# Comisión de los barberos sobre lo cobrado (menos la comisión de tarjeta) en la
+# nómina mensual (manage.py payroll_run). Cada corrida guarda la que usó
+PAYROLL_COMMISSION_RATE = '0.30'
+
+# Métricas Prometheus (/metrics). METRICS_DIR: directorio compartido por los
+# workers de la máquina (p. ej. en tmpfs) para sumar sus contadores.
+# Con METRICS_TOKEN el scrape debe enviar "Authorization: Bearer <token>"; sin
+# él, /metrics solo responde a las IPs de METRICS_ALLOWED_IPS
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Pub/sub de eventos de reservas para el stream SSE (/events/reservations/ en ASGI).
+# El de memoria solo sirve con un único proceso que atiende todo; con más procesos
+# hace falta uno compartido (manage.py check --deploy avisa con accounts.W001)
+RESERVATION_EVENTS_BACKEND = 'accounts.realtime.InProcessBackend'
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=365),  # ⚠️ o más, pero no infinito por seguridad
     "REFRESH_TOKEN_LIFETIME": timedelta(days=365),
     "ROTATE_REFRESH_TOKENS": True,
-    "BLACKLIST_AFTER_ROTATION": True,
+    "BLACKLIST_AFTER_ROTATION": True,  # Lo aplica accounts.revocation (sin la app token_blacklist)
     "UPDATE_LAST_LOGIN": True,
+    "TOKEN_REFRESH_SERIALIZER": "accounts.revocation.RevocableTokenRefreshSerializer",
 }
+
+# Revocación de JWT (accounts.revocation): filtro de Bloom por proceso delante de
+# la caché compartida; cada cuántos segundos se leen las revocaciones de otros workers
+REVOCATION_REFRESH_SECONDS = 5
+REVOCATION_BLOOM_CAPACITY = 100_000
+REVOCATION_BLOOM_ERROR_RATE = 0.001
 AUTH_USER_MODEL = 'accounts.CustomUser' #Se cambia el modelo de usuario por el creado en accounts
 
 
 MIDDLEWARE = [
+    'accounts.metrics.MetricsMiddleware',  # Primero: mide la petición completa (ver /metrics)
+    'accounts.identity.IdentityMapMiddleware',  # Objetos leídos una sola vez por petición
     'corsheaders.middleware.CorsMiddleware',    
+    # allauth exige verlo en MIDDLEWARE (falla al arrancar si no); es barato
     "allauth.account.middleware.AccountMiddleware",
 
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'backend.middleware.RouteMiddlewareDispatcher',  # WEB_MIDDLEWARE solo en las rutas web
+]
+
+# Middleware de sesión/formularios: solo lo necesitan el admin, allauth y las
+# vistas HTML; la API (JWT) se lo salta (ver backend.middleware)
+WEB_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+WEB_ROUTE_PREFIXES = ('/admin/', '/accounts/')  # Admin y allauth (incluye el login con Google)
+WEB_ROUTE_PATHS = ('/', '/logout/')  # home y logout_view
+
+# El admin busca sesión, auth y mensajes en MIDDLEWARE; están en WEB_MIDDLEWARE
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -126,12 +243,33 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite de producción (backend.sqlite): WAL, pragmas por conexión, BEGIN IMMEDIATE
+# en las transacciones y cola de escritura en el proceso para que las reservas
+# simultáneas esperen turno en vez de fallar con "database is locked".
+# Es opcional: se activa con SQLITE_PROFILE=production en el entorno del
+# despliegue; sin la variable se usa la configuración de fábrica de Django.
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'  # Con WAL no se corrompe; solo se pueden perder las últimas transacciones si se cae la máquina
+        'PRAGMA busy_timeout=5000;'  # Espera entre procesos (ms)
+        'PRAGMA cache_size=-20000;'  # ~20 MB de páginas en memoria por conexión
+        'PRAGMA mmap_size=134217728;'  # 128 MB
+        'PRAGMA temp_store=MEMORY'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'write_queue_timeout': 30,  # Segundos en la cola antes de rendirse
+}
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'default')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update(ENGINE='backend.sqlite', OPTIONS=SQLITE_PRODUCTION_OPTIONS)
 
 
 # Password validation
@@ -191,9 +329,6 @@ ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_USER_MODEL_USERNAME_FIELD = None
 
 
-# Cargar variables del archivo .env
-load_dotenv()
-
 # Ahora puedes acceder a las variables de entorno
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
@@ -206,15 +341,5 @@ EMAIL_USE_TLS = True
 
 # 🌐 CORS
 CORS_ALLOW_ALL_ORIGINS = True  # Permite cualquier origen (Flutter Web en local)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-shop')  # Cabecera de la barbería (accounts.tenancy)
 ALLOWED_HOSTS = ['*']
-# Cargar variables del archivo .env
-load_dotenv()
-# Ahora puedes acceder a las variables de entorno
-EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
-EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
-
-# Configuración de correo
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
\ No newline at end of file
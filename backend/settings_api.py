@@ -0,0 +1,41 @@
+"""
+Perfil para workers que solo sirven la API REST (JWT):
+
+    DJANGO_SETTINGS_MODULE=backend.settings_api gunicorn backend.wsgi
+
+No instala el admin, allauth (ni el proveedor de Google), sesiones ni
+mensajes, y usa backend.urls_api. Arranca más rápido y carga menos módulos
+(ver ``manage.py bench_startup``). El admin y el login social se sirven desde
+workers con ``backend.settings``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE
+
+_WEB_ONLY_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'django.contrib.sites',
+    'allauth',
+)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if not app.startswith(_WEB_ONLY_APPS)]
+
+# La API se autentica con JWT en DRF: sin sesión no hacen falta auth/CSRF/mensajes de Django
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in ('allauth.account.middleware.AccountMiddleware', 'backend.middleware.RouteMiddlewareDispatcher')
+]
+WEB_MIDDLEWARE = []
+
+AUTHENTICATION_BACKENDS = ('django.contrib.auth.backends.ModelBackend',)
+
+ROOT_URLCONF = 'backend.urls_api'
+
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'DIRS': [],
+    'APP_DIRS': True,
+    'OPTIONS': {'context_processors': ['django.template.context_processors.request']},
+}]
@@ -0,0 +1,15 @@
+"""
+Backend SQLite para producción en tiendas de un solo local
+(``ENGINE: 'backend.sqlite'``).
+
+Es el backend de Django más una cola de escritura en el proceso: las
+transacciones (que abren con ``BEGIN IMMEDIATE`` vía ``transaction_mode``) y
+las escrituras sueltas en autocommit esperan su turno en orden de llegada en
+vez de chocar dentro de SQLite y fallar con ``database is locked``. Entre
+procesos sigue mandando el ``busy_timeout`` de SQLite. Los pragmas (WAL,
+``synchronous``, caché, mmap) van en ``OPTIONS['init_command']``; ver
+``SQLITE_PRODUCTION_OPTIONS`` en settings y ``manage.py bench_sqlite_writes``.
+
+No está activo por defecto: un despliegue lo elige con la variable de entorno
+``SQLITE_PROFILE=production``.
+"""
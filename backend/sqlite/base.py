@@ -0,0 +1,143 @@
+import threading
+import time
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class WriteQueue:
+    """
+    Turno de escritura por archivo de BD, en orden de llegada. Reentrante
+    para el hilo que lo tiene: Django abre una conexión por hilo.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._owner = None
+        self._depth = 0
+        self.acquired = 0
+        self.contended = 0
+        self.waited = 0.0
+
+    def acquire(self, timeout):
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return
+            self._waiting.append(me)
+            start = time.monotonic()
+            if self._owner is not None or self._waiting[0] != me:
+                self.contended += 1
+            turn = self._condition.wait_for(lambda: self._owner is None and self._waiting[0] == me, timeout)
+            self._waiting.remove(me)
+            if not turn:
+                self._condition.notify_all()
+                raise OperationalError(f'database is locked: más de {timeout}s en la cola de escritura')
+            self._owner, self._depth = me, 1
+            self.acquired += 1
+            self.waited += time.monotonic() - start
+
+    def release(self):
+        with self._condition:
+            if self._owner != threading.get_ident():
+                return
+            self._depth -= 1
+            if not self._depth:
+                self._owner = None
+                self._condition.notify_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(name):
+    with _queues_lock:
+        return _queues.setdefault(str(name), WriteQueue())
+
+
+class QueuedCursorWrapper(base.SQLiteCursorWrapper):
+    """Las escrituras en autocommit (fuera de una transacción) pasan por la cola."""
+
+    write_queue = None
+    queue_timeout = None
+
+    def _queued(self, query):
+        return (
+            self.write_queue is not None
+            and not self.connection.in_transaction
+            and query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        )
+
+    def execute(self, query, params=None):
+        if not self._queued(query):
+            return super().execute(query, params)
+        self.write_queue.acquire(self.queue_timeout)
+        try:
+            return super().execute(query, params)
+        finally:
+            self.write_queue.release()
+
+    def executemany(self, query, param_list):
+        if not self._queued(query):
+            return super().executemany(query, param_list)
+        self.write_queue.acquire(self.queue_timeout)
+        try:
+            return super().executemany(query, param_list)
+        finally:
+            self.write_queue.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    write_queue = None
+    _holds_write_queue = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.write_queue_timeout = kwargs.pop('write_queue_timeout', 30)
+        enabled = kwargs.pop('write_queue', True) and not self.is_in_memory_db()
+        self.write_queue = write_queue(self.settings_dict['NAME']) if enabled else None
+        return kwargs
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=QueuedCursorWrapper)
+        cursor.write_queue, cursor.queue_timeout = self.write_queue, self.write_queue_timeout
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        if self.write_queue is None:
+            return super()._start_transaction_under_autocommit()
+        self.write_queue.acquire(self.write_queue_timeout)
+        self._holds_write_queue = True
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._release_write_queue()
+            raise
+
+    def _release_write_queue(self):
+        if self._holds_write_queue:
+            self._holds_write_queue = False
+            self.write_queue.release()
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._release_write_queue()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._release_write_queue()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._release_write_queue()
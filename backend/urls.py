@@ -1,16 +1,34 @@
+from importlib import import_module
+
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView  # ← AÑADE ESTO
 
+from accounts.views import jwt_logout
+
+from .lazy_urls import lazy_include, lazy_view
+
+
+# El admin se registra (autodiscover) con la primera petición a /admin/ o el
+# primer reverse(), no al arrancar: INSTALLED_APPS usa SimpleAdminConfig
+def admin_urls():
+    admin.autodiscover()
+    return admin.site.get_urls()
+
 
 urlpatterns = [
-    path("accounts/", include("allauth.urls")),
-    path('admin/', admin.site.urls),
+    lazy_include("accounts/", lambda: import_module("allauth.urls").urlpatterns),
+    lazy_include('admin/', admin_urls, app_name='admin', namespace=admin.site.name),
+
+    # API de login social con Google
+    path('accounts/google/login/token/', lazy_view('accounts.social_views.GoogleLogin'), name='google_login_token'),
+
     path('', include('accounts.urls')),
     path('emails/', include('emails.urls')),
 
     # 🔐 Rutas para login con JWT
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),     # ← Login
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),     # ← Refrescar token
+    path('api/token/logout/', jwt_logout, name='token_logout'),     # ← Cerrar sesión (revoca los tokens)
     
 ]
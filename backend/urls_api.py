@@ -0,0 +1,15 @@
+# URLs de los workers solo-API (backend.settings_api): sin admin, allauth ni vistas HTML
+from django.urls import path, include
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from accounts.urls import api_urlpatterns
+from accounts.views import jwt_logout
+
+urlpatterns = [
+    path('', include(api_urlpatterns)),
+    path('emails/', include('emails.urls')),
+
+    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/logout/', jwt_logout, name='token_logout'),
+]
@@ -7,6 +7,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 from accounts.models import Reservation, CustomUser
+from accounts.metrics import track_email
+from accounts.throttling import bucket_throttles
 
 # Email para la cancelación de citas
 class AppointmentCancellationEmailView(APIView):
@@ -54,7 +56,8 @@ class AppointmentCancellationEmailView(APIView):
             [customer_email],  # Enviar al correo del cliente
         )
         email.content_subtype = "html"  # Para que el mensaje sea interpretado como HTML
-        email.send(fail_silently=False)
+        with track_email('cancellation'):
+            email.send(fail_silently=False)
 
         return Response({"message": "Correo de cancelación enviado."}, status=status.HTTP_200_OK)
 
@@ -98,12 +101,15 @@ class AppointmentConfirmationEmailView(APIView):
             [customer_email],  # Enviar al correo del cliente
         )
         email.content_subtype = "html"  # Para que el mensaje sea interpretado como HTML
-        email.send(fail_silently=False)
+        with track_email('confirmation'):
+            email.send(fail_silently=False)
 
         return Response({"message": "Correo de confirmación enviado."}, status=status.HTTP_200_OK)
 
 # Email para la recuperación de contraseña
 class PasswordRecoveryCodeView(APIView):
+    throttle_classes = bucket_throttles('password_recovery')
+
     def post(self, request):
         email = request.data.get("email")
         
@@ -150,13 +156,16 @@ class PasswordRecoveryCodeView(APIView):
             [email],
         )
         email.content_subtype = "html"  # Para que el mensaje sea interpretado como HTML
-        email.send(fail_silently=False)
+        with track_email('password_recovery'):
+            email.send(fail_silently=False)
 
         return Response({"detail": "Código enviado a tu correo."}, status=status.HTTP_200_OK)
 
 
 # Email para validar el código de recuperación de contraseña  
 class ValidateRecoveryCodeView(APIView):
+        throttle_classes = bucket_throttles('validate_recovery')
+
         def post(self, request):
             email = request.data.get("email")
             code = request.data.get("code")